@@ -5,8 +5,8 @@ This file contains all the application initialization logic.
 import os
 import sys
 import logging
-from flask import Flask
-from flask_login import LoginManager
+from flask import Flask, request, jsonify, redirect, flash
+from flask_login import LoginManager, login_url
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
@@ -36,6 +36,9 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # Fix for SSL behind
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'c1a4f89c0e3e44b88ac44f3458f0d391')  # Use env var or fallback
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# 'inline' runs /extract in the request; 'background' queues it for api/worker.py
+app.config['EXTRACT_MODE'] = os.environ.get('EXTRACT_MODE', 'inline')
+
 # Get database URL from environment variables
 db_url = os.environ.get('DATABASE_URL')
 if not db_url:
@@ -61,17 +64,32 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 # Import or initialize extensions
 from api.models import db
 from api.models import User, Transcript, Chat, Message
+from api.migrations import run_migrations
+from api.telemetry import install_telemetry
+from api.scheduler import install_scheduler
+from api.search import install_search_index
 
 # Initialize extensions
 db.init_app(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'  # type: ignore
+install_telemetry(app)
+install_scheduler()
+install_search_index()
 
 # Close database sessions after each request
 @app.teardown_request
 def shutdown_session(exception=None):
     db.session.remove()
 
+@login_manager.unauthorized_handler
+def unauthorized():
+    """Answer JSON clients with 401, as the ASGI entry point does, and send browsers to the login page"""
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({'error': 'Please log in to access this page.'}), 401
+    flash(login_manager.login_message, login_manager.login_message_category)
+    return redirect(login_url(login_manager.login_view, next_url=request.url))
+
 @login_manager.user_loader
 def load_user(user_id):
     try:
@@ -85,6 +103,7 @@ with app.app_context():
     try:
         logger.info("Creating database tables if they don't exist...")
         db.create_all()
+        run_migrations()
         logger.info("Database tables verified.")
     except Exception as e:
         logger.error(f"Database initialization error: {str(e)}")
@@ -93,6 +112,7 @@ with app.app_context():
 
 # Import routes after app is initialized
 from api.routes import *
+from api.commands import *
 
 # Run the application if executed directly
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+"""
+ASGI entry point for TranscriptHub.
+
+POST /api/send_message and JSON requests to POST /extract are served on
+the event loop: the model call is awaited with api.llm_async, so a reply
+being generated holds no thread, and database work and transcript fetches
+run on a bounded pool of threads. Every other request, including HTML form
+posts to /extract, goes to the Flask app unchanged.
+
+Run with an ASGI server instead of the WSGI one, e.g.:
+    uvicorn api.asgi:app --host 0.0.0.0 --port 5000
+
+Requires the optional packages in api/requirements-asgi.txt: httpx, plus
+a2wsgi or uvicorn to serve the Flask routes.
+"""
+import os
+import json
+import asyncio
+import logging
+import contextvars
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from flask_login import current_user
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from youtube_transcript_api._errors import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+from api.app import app as flask_app
+from api.models import db, Chat, Transcript
+from api.chat import start_chat_turn, save_reply, serialize_message
+from api.history import CHAT_MODEL
+from api.llm import LLMError
+from api.llm_async import AsyncLLMClient
+from api.telemetry import attributed_to
+from api.jobs import enqueue_extraction, serialize_job
+from api.transcripts import (
+    extract_video_id, parse_languages, find_existing_transcript, get_transcript_entries,
+    build_transcript, describe_fetch_error, extract_result
+)
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from uvicorn.middleware.wsgi import WSGIMiddleware
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Thread pools, overridable from the environment
+# Database work and transcript fetches; more threads than the engine's pool_size only queue for connections
+ASYNC_BLOCKING_THREADS = int(os.environ.get('ASYNC_BLOCKING_THREADS', 10))
+ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 10))  # Requests passed to the Flask app
+
+class HTTPError(Exception):
+    """Raised by a blocking step to end the request with a JSON error."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def wants_json(scope):
+    """Return True if the request prefers JSON over HTML, as extract() decides."""
+    accept = dict(scope['headers']).get(b'accept', b'').decode('latin-1')
+    return parse_accept_header(accept, MIMEAccept).best_match(['text/html', 'application/json']) == 'application/json'
+
+def logged_in_user_id(scope):
+    """
+    Return the ID of the user logged in for a request, as Flask-Login sees it, or None.
+
+    The request's cookies go through Flask-Login in a request context, so
+    the session cookie and the remember-me cookie are both honoured and
+    the user is loaded by the app's user_loader, exactly as on the Flask
+    routes. Queries the database; run it on the blocking pool.
+
+    Args:
+        scope: The ASGI connection scope
+
+    Returns:
+        The logged-in user's ID, or None
+    """
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']
+               if name in (b'cookie', b'user-agent', b'x-forwarded-for')]
+    client = scope.get('client')
+    with flask_app.test_request_context(scope['path'], method=scope['method'], headers=headers,
+                                        environ_base={'REMOTE_ADDR': client[0] if client else ''}):
+        user = current_user._get_current_object()
+        return user.id if user.is_authenticated else None
+
+async def read_body(receive):
+    """Read the whole request body."""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+def parse_fields(scope, body):
+    """Parse a JSON or form-encoded request body into a dictionary."""
+    content_type = dict(scope['headers']).get(b'content-type', b'').decode('latin-1')
+    if content_type.startswith('application/json'):
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+async def send_json(send, status, data):
+    """Send a complete JSON response."""
+    body = json.dumps(data).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+class AsyncApp:
+    """
+    ASGI app serving the chat and extract endpoints on the event loop, and the Flask app for the rest.
+
+    Args:
+        flask_app: The Flask app
+        blocking_threads: Threads for database work and transcript fetches
+        wsgi_threads: Threads for requests passed to the Flask app
+    """
+    def __init__(self, flask_app, blocking_threads=ASYNC_BLOCKING_THREADS, wsgi_threads=ASYNC_WSGI_THREADS):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads)
+        self.executor = ThreadPoolExecutor(max_workers=blocking_threads, thread_name_prefix='asgi-blocking')
+        self.llm = None
+        self.routes = {
+            ('POST', '/api/send_message'): self.send_message,
+            ('POST', '/extract'): self.extract
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        # HTML form posts to /extract render templates and flash messages, which stay with Flask
+        if handler is not None and (scope['path'] != '/extract' or wants_json(scope)):
+            user_id = await self.run_blocking(logged_in_user_id, scope)
+            if user_id is None:
+                await read_body(receive)
+                await send_json(send, 401, {'error': 'Please log in to access this page.'})
+                return
+            with attributed_to(user_id):
+                await handler(scope, receive, send, user_id)
+            return
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.llm = AsyncLLMClient(executor=self.executor)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.llm is not None:
+                    await self.llm.aclose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def run_blocking(self, function, *args, **kwargs):
+        """
+        Run a blocking function on the thread pool, inside a Flask app context.
+
+        The caller's context variables, such as telemetry attribution, are carried over.
+        """
+        def call():
+            with self.flask_app.app_context():
+                return function(*args, **kwargs)
+
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, context.run, call)
+
+    async def send_message(self, scope, receive, send, user_id):
+        """Async counterpart of routes.send_message()"""
+        data = parse_fields(scope, await read_body(receive))
+        chat_id = data.get('chat_id')
+        message_content = (data.get('message') or data.get('content') or '').strip()
+        if not message_content:
+            await send_json(send, 400, {'error': 'Message is empty'})
+            return
+
+        def begin():
+            chat = db.session.get(Chat, chat_id) if str(chat_id).isdigit() else None
+            if chat is None:
+                raise HTTPError(404, 'Chat not found')
+            if chat.user_id != user_id:
+                raise HTTPError(403, 'You do not have permission to access this chat')
+            return start_chat_turn(chat, db.session.get(Transcript, chat.transcript_id), message_content)
+
+        def finish(turn, content, **options):
+            return serialize_message(save_reply(turn, content, **options))
+
+        try:
+            turn = await self.run_blocking(begin)
+            if turn.cached_reply is not None:
+                ai_message = await self.run_blocking(finish, turn, turn.cached_reply, from_cache=True)
+            else:
+                try:
+                    content = await self.llm_client().chat(turn.prompt(), CHAT_MODEL, purpose='chat')
+                    cacheable = True
+                except LLMError as e:
+                    logger.error(f"Error calling Mistral AI API: {str(e)}")
+                    content = f"Error: Unable to get a response from the AI model. {str(e)}"
+                    cacheable = False
+                ai_message = await self.run_blocking(finish, turn, content, cacheable=cacheable)
+        except HTTPError as e:
+            await send_json(send, e.status, {'error': e.message})
+            return
+        except Exception as e:
+            logger.error(f"Error in async send_message: {str(e)}")
+            await send_json(send, 500, {'error': str(e)})
+            return
+
+        await send_json(send, 200, {'success': True, 'user_message': turn.user_message, 'ai_message': ai_message})
+
+    async def extract(self, scope, receive, send, user_id):
+        """Async counterpart of routes.extract() for JSON clients"""
+        data = parse_fields(scope, await read_body(receive))
+        video_url = (data.get('video_url') or '').strip()
+        video_id = extract_video_id(video_url)
+        if not video_id:
+            await send_json(send, 400, {'error': 'Invalid YouTube URL provided.'})
+            return
+        languages = parse_languages(data.get('languages'))
+        background = data.get('mode', self.flask_app.config['EXTRACT_MODE']) == 'background'
+
+        def existing_transcript_id():
+            transcript = find_existing_transcript(user_id, video_id)
+            return transcript.id if transcript is not None else None
+
+        def enqueue():
+            job_data = serialize_job(enqueue_extraction(user_id, video_url, video_id, languages))
+            job_data['status_url'] = self.url_for('job_status', job_id=job_data['id'])
+            return job_data
+
+        def store(entries):
+            transcript = build_transcript(user_id, video_url, entries, video_id)
+            db.session.add(transcript)
+            db.session.commit()
+            return transcript.id
+
+        try:
+            transcript_id = await self.run_blocking(existing_transcript_id)
+            existing = transcript_id is not None
+            if background and not existing:
+                await send_json(send, 202, await self.run_blocking(enqueue))
+                return
+            if not existing:
+                # The transcript library is synchronous, so the fetch takes a pool thread rather than the loop
+                entries = await self.run_blocking(get_transcript_entries, video_id, languages)
+                transcript_id = await self.run_blocking(store, entries)
+        except HTTPError as e:
+            await send_json(send, e.status, {'error': e.message})
+            return
+        except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
+            await send_json(send, 422, {'error': describe_fetch_error(e)})
+            return
+        except Exception as e:
+            logger.error(f"Error extracting transcript: {str(e)}")
+            await send_json(send, 500, {'error': f'An error occurred: {str(e)}'})
+            return
+
+        await send_json(send, 200, extract_result(transcript_id, video_id, existing,
+                                                  self.url_for('transcript_summary', transcript_id=transcript_id)))
+
+    def llm_client(self):
+        """Return the async model client, creating it if the server did not run the lifespan startup."""
+        if self.llm is None:
+            self.llm = AsyncLLMClient(executor=self.executor)
+        return self.llm
+
+    def url_for(self, endpoint, **values):
+        """Build a path to a Flask endpoint without a request context."""
+        return self.flask_app.url_map.bind('').build(endpoint, values)
+
+app = AsyncApp(flask_app)
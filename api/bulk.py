@@ -0,0 +1,145 @@
+"""
+Bulk transcript extraction for playlists and lists of video URLs.
+
+Transcripts are fetched through a bounded thread pool and the resulting
+Transcript rows are committed in batches instead of one commit per video.
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from api.models import db, Transcript
+from api.transcripts import get_transcript_entries, build_transcript, describe_fetch_error
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Bulk limits, overridable from the environment
+BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', 8))
+BULK_MAX_CONCURRENCY = int(os.environ.get('BULK_MAX_CONCURRENCY', 32))
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 500))
+BULK_COMMIT_BATCH = int(os.environ.get('BULK_COMMIT_BATCH', 50))
+
+def fetch_many(video_ids, fetch, concurrency=BULK_CONCURRENCY):
+    """
+    Run fetch(video_id) for many videos with at most `concurrency` in flight.
+
+    Args:
+        video_ids: Iterable of unique video IDs
+        fetch: Callable taking a video ID and returning its transcript entries
+        concurrency: Maximum number of fetches running at once
+
+    Returns:
+        Dictionary mapping each video ID to an (entries, error) tuple
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(fetch, video_id): video_id for video_id in video_ids}
+        for future in as_completed(futures):
+            video_id = futures[future]
+            try:
+                results[video_id] = (future.result(), None)
+            except Exception as e:
+                results[video_id] = (None, e)
+    return results
+
+def bulk_extract(user_id, items, concurrency=BULK_CONCURRENCY, fetch=None, batch_size=BULK_COMMIT_BATCH):
+    """
+    Extract and save transcripts for many videos, reporting each item separately.
+
+    Each video ID is fetched and saved once even if it appears several times
+    in items, and videos the user already extracted return the existing row.
+    Items that fail are reported with an error while the rest are still saved.
+
+    Args:
+        user_id: Owner of the new Transcript rows
+        items: List of (video_url, video_id) tuples; video_id is None for unparseable URLs
+        concurrency: Maximum number of upstream fetches running at once
+        fetch: Callable taking a video ID and returning entries, defaults to the shared cache
+        batch_size: Number of Transcript rows inserted per commit
+
+    Returns:
+        Dictionary with a per-item 'results' list and 'succeeded'/'failed' counts
+    """
+    fetch = fetch or get_transcript_entries
+    app = current_app._get_current_object()
+
+    # Each worker thread needs its own app context (and so its own session)
+    def fetch_in_context(video_id):
+        with app.app_context():
+            return fetch(video_id)
+
+    unique_ids = list(dict.fromkeys(video_id for _, video_id in items if video_id))
+
+    # Ordered oldest first so the dictionary keeps each video's newest row
+    existing = dict(
+        Transcript.query
+        .with_entities(Transcript.video_id, Transcript.id)
+        .filter(Transcript.user_id == user_id, Transcript.video_id.in_(unique_ids))
+        .order_by(Transcript.created_at)
+        .all()
+    ) if unique_ids else {}
+
+    fetched = fetch_many([video_id for video_id in unique_ids if video_id not in existing],
+                         fetch_in_context, concurrency)
+
+    results = []
+    pending = []
+    first_results = {}
+    duplicates = []
+    for video_url, video_id in items:
+        result = {'video_url': video_url, 'video_id': video_id, 'status': 'error',
+                  'transcript_id': None, 'error': None, 'existing': False}
+        results.append(result)
+
+        if not video_id:
+            result['error'] = 'Invalid YouTube URL provided.'
+            continue
+
+        if video_id in existing:
+            result.update(status='ok', transcript_id=existing[video_id], existing=True)
+            continue
+
+        if video_id in first_results:
+            duplicates.append((result, first_results[video_id]))
+            continue
+        first_results[video_id] = result
+
+        entries, error = fetched[video_id]
+        if error is not None:
+            result['error'] = describe_fetch_error(error)
+            continue
+
+        transcript = build_transcript(user_id, video_url, entries, video_id)
+        db.session.add(transcript)
+        pending.append((result, transcript))
+        if len(pending) >= batch_size:
+            _commit_batch(pending)
+            pending = []
+
+    if pending:
+        _commit_batch(pending)
+
+    # Repeats of a video in the same request share the first occurrence's row
+    for result, first in duplicates:
+        result.update(status=first['status'], transcript_id=first['transcript_id'], error=first['error'])
+
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    return {'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded}
+
+def _commit_batch(pending):
+    try:
+        # Read the new IDs before commit expires the rows
+        db.session.flush()
+        transcript_ids = [transcript.id for _, transcript in pending]
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error saving bulk transcripts: {str(e)}")
+        db.session.rollback()
+        for result, _ in pending:
+            result['error'] = 'Unable to save transcript. Database connection issue.'
+        return
+
+    for (result, _), transcript_id in zip(pending, transcript_ids):
+        result['status'] = 'ok'
+        result['transcript_id'] = transcript_id
@@ -0,0 +1,490 @@
+"""
+Shared transcript fetch caches for TranscriptHub.
+
+Transcripts fetched from YouTube are shared across users. A process-local
+LRU tier answers repeat requests without touching the database, and a
+database tier lets every worker reuse a fetch made by any other worker.
+Videos that have no transcript are remembered the same way, so repeat
+submissions fail without another upstream round trip. Replies to opening
+chat questions are cached per transcript content, model and normalized
+question, so a common question about a popular video is answered once.
+"""
+import os
+import re
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from api.models import db, TranscriptCacheEntry, NegativeCacheEntry, AnswerCacheEntry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache sizing, overridable from the environment
+CACHE_MAX_ENTRIES = int(os.environ.get('TRANSCRIPT_CACHE_SIZE', 256))
+CACHE_TTL_SECONDS = int(os.environ.get('TRANSCRIPT_CACHE_TTL', 7 * 24 * 3600))
+CACHE_DB_MAX_ROWS = int(os.environ.get('TRANSCRIPT_CACHE_DB_ROWS', 50000))
+
+# Seconds a video's list of caption tracks is reused. Track URLs are signed
+# and expire, so the manifest stays in memory and is kept short-lived.
+MANIFEST_TTL_SECONDS = int(os.environ.get('TRANSCRIPT_MANIFEST_TTL', 3600))
+
+# Seconds a failed fetch is remembered, per failure kind (0 disables caching that kind)
+NEGATIVE_CACHE_TTLS = {
+    'no_transcript': int(os.environ.get('NEGATIVE_CACHE_TTL_NO_TRANSCRIPT', 6 * 3600)),
+    'disabled': int(os.environ.get('NEGATIVE_CACHE_TTL_DISABLED', 24 * 3600)),
+    'unavailable': int(os.environ.get('NEGATIVE_CACHE_TTL_UNAVAILABLE', 24 * 3600))
+}
+
+# Answer cache sizing, overridable from the environment
+ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', 512))
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get('ANSWER_CACHE_TTL', 7 * 24 * 3600))
+ANSWER_CACHE_DB_ROWS = int(os.environ.get('ANSWER_CACHE_DB_ROWS', 20000))
+
+# Longer questions are too specific to be asked again word for word
+ANSWER_CACHE_MAX_QUESTION_CHARS = 200
+
+# Prune the database tier once every this many writes
+PRUNE_INTERVAL = 100
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with a time-to-live per entry.
+
+    Args:
+        max_entries: Maximum number of entries kept before evicting the least recently used
+        ttl_seconds: Default lifetime of an entry in seconds
+    """
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entries if full."""
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove key from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class TwoTierCache:
+    """
+    Process-local LRU tier in front of a database table shared by every worker.
+
+    Subclasses set model, the table's row class, and key_columns, the
+    columns a key tuple maps to in order, and convert values with
+    _read_row() and _write_row(). Rows are reused for ttl_seconds from when
+    they were written and the table is trimmed to max_db_rows, least
+    recently used first.
+
+    Args:
+        max_entries: Maximum number of values kept in memory
+        ttl_seconds: Seconds a value is reused
+        max_db_rows: Maximum number of rows in the database tier
+    """
+    model = None
+    key_columns = ()
+    label = 'cache'
+
+    def __init__(self, max_entries, ttl_seconds, max_db_rows):
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.max_db_rows = max_db_rows
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.db_hits = 0
+        self.db_misses = 0
+        self.db_evictions = 0
+        self.db_errors = 0
+
+    def stats(self):
+        """Return hit, miss and eviction counters for both tiers."""
+        with self._lock:
+            database = {
+                'hits': self.db_hits,
+                'misses': self.db_misses,
+                'evictions': self.db_evictions,
+                'errors': self.db_errors,
+                'max_rows': self.max_db_rows
+            }
+        return {
+            'memory': self.memory.stats(),
+            'database': database,
+            'ttl_seconds': self.ttl_seconds
+        }
+
+    def prune(self):
+        """Delete expired rows and trim the database tier to max_db_rows, least recently used first."""
+        model = self.model
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            removed = model.query.filter(model.created_at < cutoff).delete()
+
+            overflow = model.query.count() - self.max_db_rows
+            if overflow > 0:
+                stale_ids = [row.id for row in model.query
+                             .with_entities(model.id)
+                             .order_by(model.last_used_at)
+                             .limit(overflow)]
+                removed += model.query.filter(model.id.in_(stale_ids)).delete(synchronize_session=False)
+
+            db.session.commit()
+            self._count('db_evictions', removed)
+        except Exception as e:
+            logger.error(f"Error pruning {self.label}: {str(e)}")
+            db.session.rollback()
+
+    def _read_row(self, row):
+        """Return the value stored in a row that is being reused."""
+        raise NotImplementedError
+
+    def _write_row(self, row, value):
+        """Store a value in a row."""
+        raise NotImplementedError
+
+    def _get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        value = self._db_get(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    def _set(self, key, value):
+        self.memory.set(key, value)
+        self._db_set(key, value)
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _row_query(self, key):
+        return self.model.query.filter_by(**dict(zip(self.key_columns, key)))
+
+    def _db_get(self, key):
+        try:
+            row = self._row_query(key).first()
+            if row is None:
+                self._count('db_misses')
+                return None
+
+            if row.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+                db.session.delete(row)
+                db.session.commit()
+                self._count('db_misses')
+                self._count('db_evictions')
+                return None
+
+            value = self._read_row(row)
+            row.last_used_at = datetime.utcnow()
+            db.session.commit()
+            self._count('db_hits')
+            return value
+        except Exception as e:
+            logger.error(f"Error reading {self.label}: {str(e)}")
+            db.session.rollback()
+            self._count('db_errors')
+            return None
+
+    def _db_set(self, key, value):
+        try:
+            now = datetime.utcnow()
+            row = self._row_query(key).first()
+            if row is None:
+                row = self.model(**dict(zip(self.key_columns, key)))
+                db.session.add(row)
+            self._write_row(row, value)
+            row.created_at = now
+            row.last_used_at = now
+            db.session.commit()
+        except IntegrityError:
+            # Another worker cached the same key first; keep its row
+            db.session.rollback()
+            return
+        except Exception as e:
+            logger.error(f"Error writing {self.label}: {str(e)}")
+            db.session.rollback()
+            self._count('db_errors')
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % PRUNE_INTERVAL == 0
+        if should_prune:
+            self.prune()
+
+class TranscriptCache(TwoTierCache):
+    """
+    Two-tier cache of raw transcript entries keyed by (video_id, language).
+
+    Entries are lists of {'text', 'start', 'duration'} dictionaries exactly as
+    returned by the transcript API. Callers must treat them as read-only since
+    the same list is handed to every user of the in-process tier.
+    """
+    model = TranscriptCacheEntry
+    key_columns = ('video_id', 'language')
+    label = 'transcript cache'
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS,
+                 max_db_rows=CACHE_DB_MAX_ROWS):
+        super().__init__(max_entries, ttl_seconds, max_db_rows)
+
+    def get(self, video_id, language):
+        """
+        Look up cached transcript entries.
+
+        Args:
+            video_id: The YouTube video ID
+            language: The language preference the entries were fetched for
+
+        Returns:
+            The cached list of entries, or None on a miss
+        """
+        return self._get((video_id, language))
+
+    def set(self, video_id, language, entries):
+        """Store fetched transcript entries in both tiers."""
+        self._set((video_id, language), entries)
+
+    def _read_row(self, row):
+        return json.loads(row.entries)
+
+    def _write_row(self, row, entries):
+        row.entries = json.dumps(entries)
+
+_question_noise = re.compile(r"[^a-z0-9\s]")
+# Politeness and framing that do not change what is being asked
+_question_filler = re.compile(
+    r"\b(please|pls|hey|hi|hello|thanks|thank you|can you|could you|would you|will you|"
+    r"i want you to|i would like you to|tell me|give me|for me|of this video|of the video|"
+    r"in this video|in the video|this video|the video|of this|this)\b"
+)
+
+def normalize_question(question):
+    """
+    Reduce a question to a cache key, so trivially different phrasings match.
+
+    Args:
+        question: The question as typed
+
+    Returns:
+        The normalized question, or None if it is too long to be worth caching
+    """
+    text = _question_noise.sub(' ', question.lower().replace("'", ''))
+    text = ' '.join(_question_filler.sub(' ', text).split())
+    if not text or len(text) > ANSWER_CACHE_MAX_QUESTION_CHARS:
+        return None
+    return text
+
+class AnswerCache(TwoTierCache):
+    """
+    Two-tier TTL and LRU cache of replies keyed by (content_hash, model, question).
+
+    Only replies that depend on nothing but the transcript and the question
+    belong here, i.e. the first question of a chat.
+
+    Args:
+        max_entries: Maximum number of replies kept in memory
+        ttl_seconds: Seconds a reply is reused
+        max_db_rows: Maximum number of rows in the database tier
+    """
+    model = AnswerCacheEntry
+    key_columns = ('content_hash', 'model', 'question')
+    label = 'answer cache'
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 max_db_rows=ANSWER_CACHE_DB_ROWS):
+        super().__init__(max_entries, ttl_seconds, max_db_rows)
+
+    def get(self, digest, model, question):
+        """
+        Look up a cached reply.
+
+        Args:
+            digest: Content hash of the transcript
+            model: The chat model
+            question: The question as normalized by normalize_question()
+
+        Returns:
+            The cached reply, or None on a miss
+        """
+        return self._get((digest, model, question))
+
+    def set(self, digest, model, question, answer):
+        """Store a reply in both tiers."""
+        self._set((digest, model, question), answer)
+
+    def _read_row(self, row):
+        row.hits += 1
+        return row.answer
+
+    def _write_row(self, row, answer):
+        row.answer = answer
+
+class NegativeCache:
+    """
+    Two-tier TTL cache of videos whose transcript cannot be fetched.
+
+    Each video maps to a failure kind, and each kind has its own TTL.
+    Hits are counted per kind as upstream fetches saved.
+
+    Args:
+        ttls: Dictionary mapping failure kind to seconds remembered
+        max_entries: Maximum number of videos kept in memory
+    """
+    def __init__(self, ttls=NEGATIVE_CACHE_TTLS, max_entries=CACHE_MAX_ENTRIES * 4):
+        self.ttls = ttls
+        self.memory = LRUCache(max_entries, max(ttls.values()))
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.saved_fetches = {kind: 0 for kind in ttls}
+        self.db_errors = 0
+
+    def get(self, video_id):
+        """
+        Look up a remembered failure.
+
+        Args:
+            video_id: The YouTube video ID
+
+        Returns:
+            The failure kind, or None if the video is not known to fail
+        """
+        kind = self.memory.get(video_id)
+        if kind is None:
+            kind = self._db_get(video_id)
+        if kind is not None:
+            with self._lock:
+                self.saved_fetches[kind] += 1
+        return kind
+
+    def record(self, video_id, kind):
+        """Remember that fetching a video failed with the given kind."""
+        ttl = self.ttls.get(kind, 0)
+        if ttl <= 0:
+            return
+        self.memory.set(video_id, kind, ttl=ttl)
+
+        try:
+            now = datetime.utcnow()
+            row = NegativeCacheEntry.query.filter_by(video_id=video_id).first()
+            if row is None:
+                row = NegativeCacheEntry(video_id=video_id)
+                db.session.add(row)
+            row.kind = kind
+            row.created_at = now
+            row.expires_at = now + timedelta(seconds=ttl)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return
+        except Exception as e:
+            logger.error(f"Error writing negative cache: {str(e)}")
+            db.session.rollback()
+            with self._lock:
+                self.db_errors += 1
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % PRUNE_INTERVAL == 0
+        if should_prune:
+            self.prune()
+
+    def prune(self):
+        """Delete expired rows from the database tier."""
+        try:
+            NegativeCacheEntry.query.filter(NegativeCacheEntry.expires_at < datetime.utcnow()).delete()
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error pruning negative cache: {str(e)}")
+            db.session.rollback()
+
+    def stats(self):
+        """Return saved upstream fetches per failure kind plus the memory tier counters."""
+        with self._lock:
+            saved = dict(self.saved_fetches)
+            db_errors = self.db_errors
+        return {
+            'memory': self.memory.stats(),
+            'saved_fetches': saved,
+            'db_errors': db_errors,
+            'ttl_seconds': dict(self.ttls)
+        }
+
+    def _db_get(self, video_id):
+        try:
+            row = NegativeCacheEntry.query.filter_by(video_id=video_id).first()
+            if row is None:
+                return None
+            remaining = (row.expires_at - datetime.utcnow()).total_seconds()
+            if remaining <= 0:
+                return None
+            self.memory.set(video_id, row.kind, ttl=remaining)
+            return row.kind
+        except Exception as e:
+            logger.error(f"Error reading negative cache: {str(e)}")
+            db.session.rollback()
+            with self._lock:
+                self.db_errors += 1
+            return None
+
+# Shared instances used by the routes
+transcript_cache = TranscriptCache()
+manifest_cache = LRUCache(CACHE_MAX_ENTRIES, MANIFEST_TTL_SECONDS)
+negative_cache = NegativeCache()
+answer_cache = AnswerCache()
@@ -0,0 +1,200 @@
+"""
+Chat turns, shared by the Flask chat routes and the ASGI app.
+
+A turn saves the user's message, then gathers everything the model call
+needs: the budgeted history and its summary, a cached reply to an opening
+question if there is one, and the transcript passages to send. The model
+call itself is left to the caller, which may block, stream or await it.
+
+The chat list is read here too, a page at a time with its previews.
+"""
+from sqlalchemy import select, func
+from api.models import db, Chat, Message
+from api.cache import answer_cache, normalize_question
+from api.summaries import content_hash
+from api.retrieval import chat_context
+from api.history import chat_history, CHAT_MODEL
+from api.utils import build_chat_messages
+from api.pagination import keyset_query, encode_cursor, PAGE_SIZE
+
+# Latest messages shown under each chat in the chat list
+CHAT_PREVIEW_MESSAGES = 2
+
+def serialize_message(message):
+    """Return the public fields of a chat message as a dictionary."""
+    return {
+        'id': message.id,
+        'content': message.content,
+        'role': message.role,
+        'timestamp': message.timestamp.isoformat(),
+        'from_cache': bool(message.from_cache)
+    }
+
+def answer_cache_key(transcript, history_summary, message_list):
+    """
+    Return the answer cache key for a chat turn, or None if the reply can't be shared.
+
+    Only the opening question of a chat qualifies: later replies depend on the conversation.
+    """
+    if history_summary or len(message_list) != 1:
+        return None
+    question = normalize_question(message_list[0]['content'])
+    if question is None:
+        return None
+    if not transcript.content_hash:
+        transcript.content_hash = content_hash(transcript.content)
+        db.session.commit()
+    return (transcript.content_hash, CHAT_MODEL, question)
+
+class ChatTurn:
+    """
+    One question in a chat, ready for the model call.
+
+    Holds plain data only, so it can be used after the database session closes.
+
+    Args:
+        chat_id: The Chat the turn belongs to
+        user_message: The saved question, as returned by serialize_message()
+        history_summary: Summary of messages no longer sent, or None
+        messages: The conversation to send, as {'role', 'content'} dictionaries
+        cache_key: Answer cache key, or None if the reply can't be shared
+        cached_reply: The reply from the answer cache, or None on a miss
+        context: The transcript text to send, or None when cached_reply is set
+        excerpted: True when context holds only retrieved passages
+    """
+    __slots__ = ('chat_id', 'user_message', 'history_summary', 'messages', 'cache_key',
+                 'cached_reply', 'context', 'excerpted')
+
+    def __init__(self, chat_id, user_message, history_summary, messages, cache_key,
+                 cached_reply, context, excerpted):
+        self.chat_id = chat_id
+        self.user_message = user_message
+        self.history_summary = history_summary
+        self.messages = messages
+        self.cache_key = cache_key
+        self.cached_reply = cached_reply
+        self.context = context
+        self.excerpted = excerpted
+
+    def prompt(self):
+        """Return the message list for the model call."""
+        return build_chat_messages(self.messages, self.context, self.excerpted, self.history_summary)
+
+def start_chat_turn(chat, transcript, content):
+    """
+    Save a user's question and prepare the model call that answers it.
+
+    Args:
+        chat: The Chat, already checked to belong to the user
+        transcript: The chat's Transcript
+        content: The question
+
+    Returns:
+        The ChatTurn
+    """
+    user_message = Message(content=content, role='user', chat_id=chat.id)
+    db.session.add(user_message)
+    db.session.commit()
+
+    # Recent messages within the history budget, plus a summary of older ones
+    history_summary, messages = chat_history(chat, CHAT_MODEL)
+
+    # Opening questions are answered from the cache when possible
+    cache_key = answer_cache_key(transcript, history_summary, messages)
+    cached_reply = answer_cache.get(*cache_key) if cache_key else None
+
+    context, excerpted = None, False
+    if cached_reply is None:
+        # Only the relevant passages of long transcripts are sent
+        context, excerpted = chat_context(transcript, messages)
+
+    turn = ChatTurn(chat.id, serialize_message(user_message), history_summary, messages, cache_key,
+                    cached_reply, context, excerpted)
+    # End the transaction so no database connection is held while the model call runs
+    db.session.commit()
+    return turn
+
+def save_reply(turn, content, from_cache=False, cacheable=True):
+    """
+    Save the assistant's reply to a turn, and cache it if the turn allows.
+
+    Args:
+        turn: The ChatTurn being answered
+        content: The reply text
+        from_cache: The reply came from the answer cache
+        cacheable: The reply is complete and not an error message; an empty
+            reply is never cached
+
+    Returns:
+        The saved Message
+    """
+    ai_message = Message(content=content, role='assistant', chat_id=turn.chat_id, from_cache=from_cache)
+    db.session.add(ai_message)
+    db.session.commit()
+    if turn.cache_key and cacheable and content.strip() and not from_cache:
+        answer_cache.set(*turn.cache_key, content)
+    return ai_message
+
+def list_chats(user_id, cursor=None, limit=PAGE_SIZE):
+    """
+    Return one page of a user's chats, newest first, with message counts and previews.
+
+    The page, each chat's message count and its last CHAT_PREVIEW_MESSAGES
+    messages come from a single statement: the page of chats joined to
+    its messages, ranked and counted per chat by window functions. Only the
+    previewed message bodies are read.
+
+    Args:
+        user_id: Owner of the chats
+        cursor: (created_at, id) of the last chat already shown, or None
+        limit: Chats per page
+
+    Returns:
+        (chats, next_cursor): chats are dictionaries with id, title,
+        created_at, transcript_id, message_count and messages, the previewed
+        {'role', 'content'} messages oldest first
+    """
+    page = keyset_query(
+        Chat.query
+        .with_entities(Chat.id, Chat.title, Chat.created_at, Chat.transcript_id)
+        .filter(Chat.user_id == user_id),
+        Chat.created_at, Chat.id, cursor, limit
+    ).cte('chat_page')
+
+    # Ranked and counted on keys only, in one pass over the page's messages;
+    # bodies are read for the previews alone
+    ranked = (select(Message.id, Message.chat_id,
+                     func.row_number().over(partition_by=Message.chat_id,
+                                            order_by=(Message.timestamp.desc(), Message.id.desc()))
+                     .label('position'),
+                     func.count(Message.id).over(partition_by=Message.chat_id).label('message_count'))
+              .where(Message.chat_id.in_(select(page.c.id)))
+              .subquery('ranked'))
+    preview = (select(ranked.c.chat_id, ranked.c.position, ranked.c.message_count, Message.role, Message.content)
+               .join(Message, Message.id == ranked.c.id)
+               .where(ranked.c.position <= CHAT_PREVIEW_MESSAGES)
+               .subquery('preview'))
+    rows = db.session.execute(
+        select(page, preview.c.message_count, preview.c.role, preview.c.content)
+        .outerjoin(preview, preview.c.chat_id == page.c.id)
+        .order_by(page.c.created_at.desc(), page.c.id.desc(), preview.c.position.desc())
+    ).all()
+
+    chats = []
+    for row in rows:
+        if not chats or chats[-1]['id'] != row.id:
+            chats.append({
+                'id': row.id,
+                'title': row.title,
+                'created_at': row.created_at,
+                'transcript_id': row.transcript_id,
+                'message_count': row.message_count or 0,
+                'messages': []
+            })
+        if row.role is not None:
+            chats[-1]['messages'].append({'role': row.role, 'content': row.content})
+
+    if len(chats) <= limit:
+        return chats, None
+    last = chats[limit - 1]
+    return chats[:limit], encode_cursor(last['created_at'], last['id'])
@@ -0,0 +1,147 @@
+"""
+Maintenance commands for TranscriptHub.
+
+Run with the Flask CLI, for example:
+    flask --app api.app backfill-segments
+"""
+import click
+from sqlalchemy import text, bindparam, LargeBinary
+from api.app import app, db
+from api.models import Transcript, Message
+from api.segments import Segments
+from api.transcripts import extract_video_id
+from api.search import index_transcript, unindexed_transcript_ids, SearchUnavailableError
+from api.compression import compress_text, decompress_text, is_compressed, COMPRESSION_MIN_BYTES
+
+@app.cli.command('backfill-segments')
+@click.option('--batch-size', default=500, show_default=True, help='Rows updated per commit.')
+def backfill_segments(batch_size):
+    """Store packed segments for transcripts saved before segments existed."""
+    last_id = 0
+    updated = 0
+    while True:
+        rows = (Transcript.query
+                .with_entities(Transcript.id, Transcript.content)
+                .filter(Transcript.id > last_id, Transcript.segments.is_(None))
+                .order_by(Transcript.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+
+        for transcript_id, content in rows:
+            packed = Segments.from_content(content).pack()
+            Transcript.query.filter_by(id=transcript_id).update(
+                {'segments': packed}, synchronize_session=False
+            )
+        db.session.commit()
+
+        last_id = rows[-1].id
+        updated += len(rows)
+        click.echo(f"Backfilled segments for {updated} transcripts")
+
+    click.echo(f"Done, {updated} transcripts updated")
+
+@app.cli.command('backfill-video-ids')
+@click.option('--batch-size', default=500, show_default=True, help='Rows updated per commit.')
+def backfill_video_ids(batch_size):
+    """Store the normalized video_id for transcripts saved before the column existed."""
+    last_id = 0
+    updated = 0
+    unparseable = 0
+    while True:
+        rows = (Transcript.query
+                .with_entities(Transcript.id, Transcript.video_url)
+                .filter(Transcript.id > last_id, Transcript.video_id.is_(None))
+                .order_by(Transcript.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+
+        for transcript_id, video_url in rows:
+            video_id = extract_video_id(video_url)
+            if video_id is None:
+                unparseable += 1
+                continue
+            Transcript.query.filter_by(id=transcript_id).update(
+                {'video_id': video_id}, synchronize_session=False
+            )
+            updated += 1
+        db.session.commit()
+
+        last_id = rows[-1].id
+        click.echo(f"Backfilled video IDs for {updated} transcripts")
+
+    click.echo(f"Done, {updated} transcripts updated, {unparseable} URLs could not be parsed")
+
+@app.cli.command('compress-content')
+@click.option('--batch-size', default=500, show_default=True, help='Rows rewritten per commit.')
+def compress_content(batch_size):
+    """Compress transcript and message bodies written before compression was enabled."""
+    for model in (Transcript, Message):
+        table = db.engine.dialect.identifier_preparer.quote(model.__table__.name)
+        # Read the raw stored bytes, bypassing CompressedText
+        select_batch = text(f"SELECT id, content FROM {table} WHERE id > :last_id ORDER BY id LIMIT :limit")
+        update_row = text(f"UPDATE {table} SET content = :content WHERE id = :id").bindparams(
+            bindparam('content', type_=LargeBinary)
+        )
+
+        last_id = 0
+        scanned = 0
+        compressed = 0
+        bytes_before = 0
+        bytes_after = 0
+        while True:
+            rows = db.session.execute(select_batch, {'last_id': last_id, 'limit': batch_size}).all()
+            if not rows:
+                break
+
+            for row_id, raw in rows:
+                size = len(raw.encode('utf-8')) if isinstance(raw, str) else len(raw)
+                if is_compressed(raw) or size < COMPRESSION_MIN_BYTES:
+                    continue
+                packed = compress_text(decompress_text(raw))
+                db.session.execute(update_row, {'id': row_id, 'content': packed})
+                compressed += 1
+                bytes_before += size
+                bytes_after += len(packed)
+            db.session.commit()
+
+            last_id = rows[-1][0]
+            scanned += len(rows)
+            click.echo(f"{model.__table__.name}: scanned {scanned}, compressed {compressed}")
+
+        saved = bytes_before - bytes_after
+        ratio = bytes_before / bytes_after if bytes_after else 1
+        click.echo(f"{model.__table__.name}: {compressed} rows compressed, "
+                   f"{bytes_before} -> {bytes_after} bytes ({saved} saved, {ratio:.1f}x)")
+
+@app.cli.command('index-transcripts')
+@click.option('--batch-size', default=500, show_default=True, help='Rows indexed per commit.')
+def index_transcripts(batch_size):
+    """Add transcripts saved before full-text search existed to the search index."""
+    last_id = 0
+    indexed = 0
+    while True:
+        try:
+            transcript_ids = unindexed_transcript_ids(last_id, batch_size)
+        except SearchUnavailableError as e:
+            raise click.ClickException(str(e))
+        if not transcript_ids:
+            break
+
+        rows = (Transcript.query
+                .with_entities(Transcript.id, Transcript.user_id, Transcript.content)
+                .filter(Transcript.id.in_(transcript_ids))
+                .all())
+        connection = db.session.connection()
+        for transcript_id, user_id, content in rows:
+            index_transcript(connection, transcript_id, user_id, content)
+        db.session.commit()
+
+        last_id = transcript_ids[-1]
+        indexed += len(rows)
+        click.echo(f"Indexed {indexed} transcripts")
+
+    click.echo(f"Done, {indexed} transcripts added to the search index")
@@ -0,0 +1,89 @@
+"""
+Transparent compression of large text columns.
+
+CompressedText stores short values as plain UTF-8 and compresses values
+above a size threshold with zlib, or zstd when it is installed and
+CONTENT_COMPRESSION=zstd. Compressed values start with a NUL byte plus a
+codec tag. Text that itself starts with NUL is always compressed, whatever
+its size, so a plain value is never mistaken for a compressed one. Rows
+written as TEXT before compression existed come back from the driver as
+str and are read unchanged.
+"""
+import os
+import zlib
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression settings, overridable from the environment
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+COMPRESSION_CODEC = os.environ.get('CONTENT_COMPRESSION', 'zlib')
+
+ZLIB_MARKER = b'\x00z'
+ZSTD_MARKER = b'\x00s'
+
+def compress_text(value):
+    """
+    Encode text for storage, compressing it when it is above the size threshold.
+
+    Text starting with NUL is compressed at any size, since a plain value
+    starting with NUL would read back as a compressed one.
+
+    Args:
+        value: The text to store
+
+    Returns:
+        UTF-8 bytes, or a marker followed by the compressed bytes
+    """
+    data = value.encode('utf-8')
+    if len(data) < COMPRESSION_MIN_BYTES and not data.startswith(b'\x00'):
+        return data
+    if COMPRESSION_CODEC == 'zstd' and zstandard is not None:
+        return ZSTD_MARKER + zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(data)
+    return ZLIB_MARKER + zlib.compress(data, COMPRESSION_LEVEL)
+
+def decompress_text(raw):
+    """
+    Decode a stored value back to text.
+
+    Args:
+        raw: Bytes, memoryview or str as returned by the database driver
+
+    Returns:
+        The original text
+    """
+    if isinstance(raw, str):
+        return raw
+    data = bytes(raw)
+    if data.startswith(ZLIB_MARKER):
+        return zlib.decompress(data[len(ZLIB_MARKER):]).decode('utf-8')
+    if data.startswith(ZSTD_MARKER):
+        if zstandard is None:
+            raise RuntimeError("Content was compressed with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data[len(ZSTD_MARKER):]).decode('utf-8')
+    return data.decode('utf-8')
+
+def is_compressed(raw):
+    """Return True if a stored value is already compressed."""
+    if isinstance(raw, str):
+        return False
+    return bytes(raw[:1]) == b'\x00'
+
+class CompressedText(TypeDecorator):
+    """Text column stored as binary, compressed above COMPRESSION_MIN_BYTES."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
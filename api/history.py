@@ -0,0 +1,122 @@
+"""
+Token-budgeted conversation history for chat.
+
+Each chat turn sends the model the most recent messages that fit in the
+history budget of the chat model. Older messages are folded into a rolling
+summary stored on the Chat row, so they are summarized once rather than
+resent on every turn, and only messages newer than the summary are loaded.
+"""
+import os
+import logging
+from api.models import db, Message
+from api.llm import estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+from api.utils import summarize_chat_history
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Chat model, overridable from the environment
+CHAT_MODEL = os.environ.get('CHAT_MODEL', 'mistral-large-latest')
+
+# History budgets in tokens, overridable from the environment
+CHAT_HISTORY_TOKENS = int(os.environ.get('CHAT_HISTORY_TOKENS', 3000))
+# Per-model budgets as "model=tokens,model=tokens"
+CHAT_HISTORY_MODEL_TOKENS = os.environ.get('CHAT_HISTORY_MODEL_TOKENS', 'mistral-large-latest=4000,mistral-small-latest=2000')
+# Share of the budget kept verbatim after folding, so a fold is not needed on every turn
+CHAT_HISTORY_KEEP_RATIO = float(os.environ.get('CHAT_HISTORY_KEEP_RATIO', 0.5))
+
+def parse_budgets(value):
+    """
+    Parse per-model history budgets.
+
+    Args:
+        value: A "model=tokens,model=tokens" string
+
+    Returns:
+        Dictionary mapping a model name to its budget in tokens
+    """
+    budgets = {}
+    for item in (value or '').split(','):
+        model, _, tokens = item.partition('=')
+        try:
+            budgets[model.strip()] = int(tokens)
+        except ValueError:
+            if item.strip():
+                logger.warning(f"Ignoring invalid chat history budget: {item.strip()}")
+    return budgets
+
+HISTORY_BUDGETS = parse_budgets(CHAT_HISTORY_MODEL_TOKENS)
+
+def history_budget(model=CHAT_MODEL):
+    """Return the history budget in tokens for a model."""
+    return HISTORY_BUDGETS.get(model, CHAT_HISTORY_TOKENS)
+
+def message_tokens(message):
+    """Estimate the prompt tokens of one {'role', 'content'} message."""
+    return estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+def split_history(messages, budget):
+    """
+    Split messages into those to fold into the summary and those to send as is.
+
+    The newest messages are kept while they fit in the budget; the latest
+    message is always kept. The kept part starts with a user message.
+
+    Args:
+        messages: {'role', 'content'} dictionaries, oldest first
+        budget: Token budget for the kept messages
+
+    Returns:
+        (older, recent) lists
+    """
+    start = len(messages)
+    used = 0
+    while start > 0:
+        cost = message_tokens(messages[start - 1])
+        if used + cost > budget and start < len(messages):
+            break
+        used += cost
+        start -= 1
+    # The conversation sent after the system prompt must open with the user
+    while start < len(messages) - 1 and messages[start]['role'] != 'user':
+        start += 1
+    return messages[:start], messages[start:]
+
+def chat_history(chat, model=CHAT_MODEL):
+    """
+    Return the conversation to send with a chat turn, folding old messages first if needed.
+
+    Args:
+        chat: The Chat row; its latest message is the question being answered
+        model: The chat model, which sets the budget
+
+    Returns:
+        (summary, messages) where summary is the rolling summary of earlier
+        messages or None, and messages are {'role', 'content'} dictionaries
+    """
+    query = Message.query.filter_by(chat_id=chat.id)
+    if chat.summarized_through:
+        query = query.filter(Message.id > chat.summarized_through)
+    rows = query.order_by(Message.timestamp, Message.id).all()
+    messages = [{'role': row.role, 'content': row.content} for row in rows]
+
+    budget = history_budget(model)
+    if sum(message_tokens(message) for message in messages) <= budget:
+        return chat.history_summary, messages
+
+    # Fold down to part of the budget so the next turns fit without another fold
+    older, recent = split_history(messages, int(budget * CHAT_HISTORY_KEEP_RATIO))
+    if not older:
+        return chat.history_summary, recent
+
+    try:
+        summary = summarize_chat_history(chat.history_summary, older, model)
+        chat.history_summary = summary
+        chat.summarized_through = rows[len(older) - 1].id
+        db.session.commit()
+        logger.info(f"Chat {chat.id}: folded {len(older)} messages into the history summary")
+    except Exception as e:
+        # Send the recent messages anyway; the fold is retried on the next turn
+        logger.error(f"Error summarizing history of chat {chat.id}: {str(e)}")
+        db.session.rollback()
+    return chat.history_summary, recent
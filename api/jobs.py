@@ -0,0 +1,305 @@
+"""
+Database-backed job queue for transcript extraction.
+
+/extract can enqueue a job instead of doing the work inline. Worker
+processes (api/worker.py) claim jobs with row locking and run them as
+fetch -> store -> summarize stages. Each stage is committed before the
+next starts, so a retried job resumes at the stage that failed.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from youtube_transcript_api._errors import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+from api.models import db, Job, Transcript
+from api.transcripts import get_transcript_entries, build_transcript, describe_fetch_error, find_existing_transcript
+from api.summaries import get_transcript_summary
+from api.telemetry import attributed_to
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Queue tuning, overridable from the environment
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 5))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 600))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get('JOB_HEARTBEAT_SECONDS', JOB_LEASE_SECONDS / 4))
+JOB_MAX_RUNTIME_SECONDS = int(os.environ.get('JOB_MAX_RUNTIME_SECONDS', JOB_LEASE_SECONDS * 3))
+
+SUMMARY_FALLBACK = "Summary could not be generated automatically."
+
+def enqueue_extraction(user_id, video_url, video_id, languages=None):
+    """
+    Queue a transcript extraction for a user.
+
+    Args:
+        user_id: ID of the user who submitted the video
+        video_url: The URL as submitted
+        video_id: The parsed YouTube video ID
+        languages: Caption language preference, most preferred first
+
+    Returns:
+        The committed Job
+    """
+    job = Job(
+        kind='extract',
+        payload=json.dumps({'video_url': video_url, 'video_id': video_id, 'languages': languages}),
+        max_attempts=JOB_MAX_ATTEMPTS,
+        user_id=user_id
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def enqueue_summary(user_id, transcript_id):
+    """
+    Queue generating a transcript's summary, unless it is already queued or running.
+
+    The job starts at the summarize stage of an extraction job.
+
+    Args:
+        user_id: ID of the user who owns the transcript
+        transcript_id: ID of the Transcript to summarize
+
+    Returns:
+        The pending Job
+    """
+    job = (Job.query
+           .filter(Job.kind == 'summary', Job.transcript_id == transcript_id, Job.user_id == user_id,
+                   Job.status.in_(('queued', 'running')))
+           .order_by(Job.id.desc())
+           .first())
+    if job is not None:
+        return job
+    job = Job(
+        kind='summary',
+        stage='summarize',
+        payload=json.dumps({'transcript_id': transcript_id}),
+        max_attempts=JOB_MAX_ATTEMPTS,
+        user_id=user_id,
+        transcript_id=transcript_id
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def is_runnable(job):
+    """Return True if claim_job() would pick a job up now."""
+    now = datetime.utcnow()
+    if job.status == 'queued':
+        return job.run_after is None or job.run_after <= now
+    return (job.status == 'running' and job.locked_at is not None
+            and job.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS))
+
+def claim_job(worker_id):
+    """
+    Claim the next runnable job for a worker.
+
+    Runnable jobs are queued jobs whose retry delay has passed, plus running
+    jobs whose worker stopped renewing its lease. On PostgreSQL the candidate
+    row is locked with SKIP LOCKED so concurrent workers pick different jobs;
+    the claim itself is a compare-and-set on updated_at, which keeps it safe
+    on databases without row locks. Reclaiming a job uses up one of its
+    attempts, and a job out of attempts is given up instead of run again.
+
+    Args:
+        worker_id: Identifier recorded in Job.locked_by
+
+    Returns:
+        The claimed Job, or None if nothing is runnable
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_LEASE_SECONDS)
+
+    candidate = (Job.query
+                 .with_entities(Job.id, Job.status, Job.updated_at)
+                 .filter(db.or_(
+                     db.and_(Job.status == 'queued', Job.run_after <= now),
+                     db.and_(Job.status == 'running', Job.locked_at < stale)
+                 ))
+                 .order_by(Job.run_after, Job.id)
+                 .with_for_update(skip_locked=True)
+                 .first())
+    if candidate is None:
+        db.session.rollback()
+        return None
+
+    values = {
+        'status': 'running',
+        'locked_by': worker_id,
+        'locked_at': now,
+        'updated_at': now
+    }
+    reclaimed = candidate.status == 'running'
+    if reclaimed:
+        # The previous worker crashed or hung: that run counts as an attempt
+        values['attempts'] = Job.attempts + 1
+        values['error'] = 'The worker running this job stopped responding'
+    claimed = (Job.query
+               .filter(Job.id == candidate.id, Job.updated_at == candidate.updated_at)
+               .update(values, synchronize_session=False))
+    db.session.commit()
+
+    if not claimed:
+        return None
+    job = db.session.get(Job, candidate.id)
+    if reclaimed and job.attempts >= job.max_attempts:
+        # A job that takes down every worker running it is not run again
+        _give_up(job, job.error)
+        return None
+    return job
+
+@contextmanager
+def lease_heartbeat(job):
+    """
+    Keep renewing a claimed job's lease while it runs.
+
+    A stage can outlast JOB_LEASE_SECONDS, e.g. a chunked summary waiting on
+    many model calls, so the lease is renewed from a background thread on its
+    own connection every JOB_HEARTBEAT_SECONDS rather than between stages.
+    The renewal only applies while this worker still holds the lease, and
+    stops once the job has run for JOB_MAX_RUNTIME_SECONDS, so a worker
+    stuck in a stage lets its lease lapse and claim_job() reclaims the job.
+
+    Args:
+        job: A Job claimed by claim_job()
+    """
+    engine = db.engine
+    job_id, worker_id = job.id, job.locked_by
+    # The last renewal keeps the lease until the maximum runtime is reached
+    stop_at = time.monotonic() + JOB_MAX_RUNTIME_SECONDS - JOB_LEASE_SECONDS
+    stopped = threading.Event()
+
+    def renew():
+        while not stopped.wait(JOB_HEARTBEAT_SECONDS):
+            if time.monotonic() >= stop_at:
+                logger.warning(f"Job {job_id} has run for {JOB_MAX_RUNTIME_SECONDS}s, letting its lease lapse")
+                return
+            try:
+                with engine.begin() as connection:
+                    connection.execute(update(Job)
+                                       .where(Job.id == job_id, Job.locked_by == worker_id)
+                                       .values(locked_at=datetime.utcnow()))
+            except Exception as e:
+                logger.warning(f"Could not renew the lease of job {job_id}: {str(e)}")
+
+    heartbeat = threading.Thread(target=renew, name=f"job-{job_id}-lease", daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        heartbeat.join()
+
+def run_job(job):
+    """
+    Run a claimed job from its current stage to completion.
+
+    Transient failures put the job back in the queue with exponential
+    backoff until max_attempts is reached. The job's lease is renewed for as
+    long as it runs.
+
+    Args:
+        job: A Job claimed by claim_job()
+    """
+    payload = json.loads(job.payload)
+    with lease_heartbeat(job):
+        _run_stages(job, payload)
+
+def _run_stages(job, payload):
+    try:
+        if job.stage == 'fetch':
+            if find_existing_transcript(job.user_id, payload['video_id']) is None:
+                get_transcript_entries(payload['video_id'], payload.get('languages'))
+            _advance(job, 'store')
+
+        if job.stage == 'store':
+            # Another job or an inline extraction may have saved this video already
+            transcript = find_existing_transcript(job.user_id, payload['video_id'])
+            if transcript is None:
+                entries = get_transcript_entries(payload['video_id'], payload.get('languages'))
+                transcript = build_transcript(job.user_id, payload['video_url'], entries, payload['video_id'])
+                db.session.add(transcript)
+                db.session.flush()
+            job.transcript_id = transcript.id
+            _advance(job, 'summarize')
+
+        if job.stage == 'summarize':
+            transcript = db.session.get(Transcript, job.transcript_id)
+            with attributed_to(job.user_id):
+                summary = get_transcript_summary(transcript)
+            if summary.startswith('Error:'):
+                raise RuntimeError(summary)
+            job.summary = summary
+            job.error = None
+            _finish(job)
+
+    except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
+        db.session.rollback()
+        _fail(job, describe_fetch_error(e))
+    except Exception as e:
+        logger.error(f"Job {job.id} failed in stage {job.stage}: {str(e)}")
+        db.session.rollback()
+        _retry(job, str(e))
+
+def serialize_job(job):
+    """Return the public fields of a job as a dictionary."""
+    payload = json.loads(job.payload)
+    return {
+        'id': job.id,
+        'status': job.status,
+        'stage': job.stage,
+        'attempts': job.attempts,
+        'error': job.error,
+        'video_url': payload.get('video_url'),
+        'transcript_id': job.transcript_id,
+        'summary': job.summary,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None
+    }
+
+def _advance(job, stage):
+    job.stage = stage
+    job.locked_at = datetime.utcnow()
+    db.session.commit()
+
+def _finish(job):
+    job.stage = 'done'
+    job.status = 'done'
+    job.locked_by = None
+    job.locked_at = None
+    db.session.commit()
+
+def _fail(job, message):
+    job.status = 'failed'
+    job.error = message
+    job.locked_by = None
+    job.locked_at = None
+    db.session.commit()
+
+def _retry(job, message):
+    job.attempts += 1
+    job.error = message
+
+    if job.attempts < job.max_attempts:
+        delay = JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+        job.status = 'queued'
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        job.locked_by = None
+        job.locked_at = None
+        db.session.commit()
+    else:
+        _give_up(job, message)
+
+def _give_up(job, message):
+    if job.stage == 'summarize':
+        # The transcript is already saved, so the job still succeeds without a summary
+        job.summary = SUMMARY_FALLBACK
+        _finish(job)
+    else:
+        _fail(job, message)
@@ -0,0 +1,486 @@
+"""
+Shared HTTP client for the Mistral chat completions API.
+
+All model calls go through one requests.Session, so connections (and their
+TLS handshakes) are pooled and reused across calls and threads. Each call
+has connect and read timeouts plus an overall deadline, retries 429 and 5xx
+responses with backoff that honors Retry-After, and is refused immediately
+by a circuit breaker while Mistral keeps failing. Prompts over the token
+budget are refused before they are sent, and every call is reported to an
+optional recorder (see api.telemetry) with its token usage and latency.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Get API key from environment variable
+api_key = os.environ.get("MISTRAL_API_KEY", "nCmZyPuNmY8PfYzg8NyjAE8BpQQKAftB")  # Fallback to hardcoded key if not set
+api_url = os.environ.get("MISTRAL_API_URL", "https://api.mistral.ai/v1/chat/completions")
+
+# Client tuning, overridable from the environment
+LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT', 60))
+LLM_DEADLINE_SECONDS = float(os.environ.get('LLM_DEADLINE_SECONDS', 120))
+LLM_MAX_ATTEMPTS = int(os.environ.get('LLM_MAX_ATTEMPTS', 3))
+LLM_RETRY_BASE_SECONDS = float(os.environ.get('LLM_RETRY_BASE_SECONDS', 1))
+LLM_POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', 10))
+LLM_BREAKER_THRESHOLD = int(os.environ.get('LLM_BREAKER_THRESHOLD', 5))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get('LLM_BREAKER_RESET_SECONDS', 30))
+LLM_MAX_PROMPT_TOKENS = int(os.environ.get('LLM_MAX_PROMPT_TOKENS', 100000))
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Rough characters per token for English text; only used for budgeting
+CHARS_PER_TOKEN = 4
+
+# Tokens of role and formatting framing around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text):
+    """Estimate the number of model tokens in a piece of text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def estimate_prompt_tokens(messages):
+    """Estimate the prompt tokens of a list of {'role', 'content'} messages."""
+    return sum(estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+class LLMError(Exception):
+    """Raised when a model call fails after retries."""
+
+class CircuitOpenError(LLMError):
+    """Raised without calling Mistral while the circuit breaker is open."""
+
+class PromptTooLargeError(LLMError):
+    """Raised without calling Mistral when a prompt is over the token budget."""
+
+class OverloadedError(LLMError):
+    """Raised without calling Mistral when a call would wait too long for a slot (see api.scheduler)."""
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for reset_seconds. Then one trial call is let through: success
+    closes the circuit, failure opens it again.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_seconds: Seconds to stay open before allowing a trial call
+    """
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self):
+        """Return 'closed', 'open' or 'half_open'."""
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """Return True if a call may go ahead."""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            trial_failed = self._trial_running
+            self._trial_running = False
+            self._failures += 1
+            if trial_failed or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state(),
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
+
+def retry_after_seconds(response):
+    """
+    Parse a Retry-After header given in seconds or as an HTTP date.
+
+    Args:
+        response: The requests Response
+
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def start_record(messages, model, purpose, budget):
+    """
+    Begin the telemetry record of a model call.
+
+    Args:
+        messages: The prompt messages, estimated for the budget check
+        model: The Mistral model
+        purpose: Label for the call, such as 'chat' or 'summary'
+        budget: Prompt token budget of the call
+
+    Returns:
+        The record dictionary, completed by complete_record()
+    """
+    return {
+        'model': model,
+        'purpose': purpose,
+        'estimated_prompt_tokens': estimate_prompt_tokens(messages),
+        'budget': budget,
+        'attempts': 0,
+        'queue_ms': None,
+        'first_token_ms': None,
+        'started': time.monotonic()
+    }
+
+def check_budget(record):
+    """Raise PromptTooLargeError if a call's estimated prompt is over its budget."""
+    if record['estimated_prompt_tokens'] > record['budget']:
+        raise PromptTooLargeError(
+            f"The request is too large for the AI model (about {record['estimated_prompt_tokens']} tokens, "
+            f"limit {record['budget']})"
+        )
+
+def complete_record(record, outcome, content='', usage=None, error=None):
+    """Fill in the outcome, latency and token usage of a call's telemetry record."""
+    usage = usage or {}
+    record.update({
+        'outcome': outcome,
+        'latency_ms': round((time.monotonic() - record.pop('started')) * 1000),
+        'usage_reported': bool(usage),
+        # Fall back to local estimates when Mistral sent no usage block
+        'prompt_tokens': usage.get('prompt_tokens', record['estimated_prompt_tokens'] if record['attempts'] else 0),
+        'completion_tokens': usage.get('completion_tokens', estimate_tokens(content) if content else 0),
+        'error': str(error)[:255] if error else None
+    })
+    return record
+
+def outcome_of(error):
+    """Return the telemetry outcome for an LLMError."""
+    if isinstance(error, PromptTooLargeError):
+        return 'over_budget'
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, OverloadedError):
+        return 'shed'
+    return 'error'
+
+class LLMClient:
+    """
+    Pooled, keep-alive client for the chat completions API.
+
+    Args:
+        url: The chat completions endpoint
+        key: The API key sent as a bearer token
+        connect_timeout: Seconds allowed to open a connection
+        read_timeout: Seconds allowed between bytes of a response
+        deadline: Seconds allowed for a whole call, retries included
+        max_attempts: Attempts per call, including the first
+        retry_base: Backoff before the first retry, doubled after each
+        pool_size: Connections kept open to the API host
+        breaker: CircuitBreaker shared by every call of this client
+        max_prompt_tokens: Estimated prompt size above which calls are refused
+        recorder: Callable given a dictionary describing each finished call
+        scheduler: api.scheduler.LLMScheduler each call waits on for a slot, or None
+    """
+    def __init__(self, url=api_url, key=api_key, connect_timeout=LLM_CONNECT_TIMEOUT,
+                 read_timeout=LLM_READ_TIMEOUT, deadline=LLM_DEADLINE_SECONDS,
+                 max_attempts=LLM_MAX_ATTEMPTS, retry_base=LLM_RETRY_BASE_SECONDS,
+                 pool_size=LLM_POOL_SIZE, breaker=None, max_prompt_tokens=LLM_MAX_PROMPT_TOKENS,
+                 recorder=None, scheduler=None):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.breaker = breaker or CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.recorder = recorder
+        self.scheduler = scheduler
+
+        self.session = requests.Session()
+        # Retries are handled here, where they can honor Retry-After and the deadline
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json"
+        })
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def chat(self, messages, model, purpose=None, budget=None, **options):
+        """
+        Run a chat completion and return the assistant's reply.
+
+        Args:
+            messages: List of {'role', 'content'} dictionaries
+            model: The Mistral model to use
+            purpose: Label for the call in telemetry, such as 'chat' or 'summary'
+            budget: Prompt token budget for this call, instead of max_prompt_tokens
+            **options: Extra payload fields such as temperature
+
+        Returns:
+            The reply text
+
+        Raises:
+            PromptTooLargeError: The prompt is over budget and was not sent
+            OverloadedError: Too many calls are waiting and this one was not attempted
+            CircuitOpenError: Mistral has been failing and the call was not attempted
+            LLMError: The call failed after retries or ran out of time
+        """
+        record = self._start_record(messages, model, purpose, budget)
+        try:
+            with self._slot(record):
+                response = self.post({"model": model, "messages": messages, **options}, record=record)
+                try:
+                    data = response.json()
+                    content = data["choices"][0]["message"]["content"]
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    raise LLMError(f"Unexpected response from the AI model: {str(e)}")
+            self._finish_record(record, 'ok', content, data.get("usage"))
+            return content
+        except LLMError as e:
+            self._finish_record(record, outcome_of(e), error=e)
+            raise
+
+    def stream_chat(self, messages, model, purpose=None, budget=None, **options):
+        """
+        Run a chat completion in streaming mode, yielding the reply as it is generated.
+
+        Retries and the circuit breaker apply until the response starts;
+        once tokens are flowing a dropped connection raises LLMError, as
+        does a stream that ends without "data: [DONE]" or with no reply text,
+        so a truncated reply is never taken for a complete one.
+
+        Args:
+            messages: List of {'role', 'content'} dictionaries
+            model: The Mistral model to use
+            purpose: Label for the call in telemetry, such as 'chat'
+            budget: Prompt token budget for this call, instead of max_prompt_tokens
+            **options: Extra payload fields such as temperature
+
+        Yields:
+            Pieces of the reply text in order
+        """
+        record = self._start_record(messages, model, purpose, budget)
+        parts = []
+        usage = None
+        finished = False
+        outcome, error = 'cancelled', None
+        try:
+            # The slot is held until the reply has finished streaming
+            with self._slot(record):
+                response = self.post({"model": model, "messages": messages, "stream": True, **options},
+                                     stream=True, record=record)
+                # Server-sent events are always UTF-8, whatever the Content-Type says
+                response.encoding = 'utf-8'
+                try:
+                    # chunk_size=None hands over each chunk as it arrives instead of filling a buffer first
+                    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                        # Server-sent events: "data: {json}" lines, ending with "data: [DONE]"
+                        if not line or not line.startswith('data:'):
+                            continue
+                        data = line[len('data:'):].strip()
+                        if data == '[DONE]':
+                            finished = True
+                            break
+                        try:
+                            chunk = json.loads(data)
+                            # The last chunk carries the token usage of the whole call
+                            usage = chunk.get("usage") or usage
+                            delta = chunk["choices"][0].get("delta", {}).get("content") if chunk["choices"] else None
+                        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                            raise LLMError(f"Unexpected stream chunk from the AI model: {str(e)}")
+                        if delta:
+                            if not parts:
+                                record['first_token_ms'] = round((time.monotonic() - record['started']) * 1000)
+                            parts.append(delta)
+                            yield delta
+                    if not finished:
+                        raise LLMError("The AI model stream ended before the reply was complete")
+                    if not parts:
+                        raise LLMError("The AI model returned an empty reply")
+                    outcome = 'ok'
+                except requests.RequestException as e:
+                    raise LLMError(f"The AI model stream was interrupted: {str(e)}")
+                finally:
+                    response.close()
+        except LLMError as e:
+            outcome, error = outcome_of(e), e
+            raise
+        except Exception as e:
+            outcome, error = 'error', e
+            raise
+        finally:
+            # 'cancelled' when the consumer stopped reading, e.g. a browser disconnect
+            self._finish_record(record, outcome, ''.join(parts), usage, error)
+
+    def post(self, payload, stream=False, record=None):
+        """
+        POST a payload with timeouts, retries and the circuit breaker applied.
+
+        Args:
+            payload: The JSON request body
+            stream: Leave the response body unread for incremental reading
+            record: Telemetry record of the call, updated with the attempts made
+
+        Returns:
+            The successful requests Response
+        """
+        if record is not None:
+            check_budget(record)
+        if not self.breaker.allow():
+            raise CircuitOpenError("The AI model is temporarily unavailable. Please try again shortly.")
+
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            remaining = self.deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                self._fail()
+                raise LLMError(f"The AI model did not respond within {self.deadline:.0f} seconds")
+
+            error, wait = None, None
+            self._count('calls')
+            if record is not None:
+                record['attempts'] = attempt
+            try:
+                response = self.session.post(
+                    self.url, json=payload, stream=stream,
+                    timeout=(min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+                )
+            except requests.RequestException as e:
+                error = f"Could not reach the AI model: {str(e)}"
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+                if response.status_code not in RETRYABLE_STATUS:
+                    # The request itself was rejected; Mistral is up, so the breaker is not involved
+                    self.breaker.record_success()
+                    detail = response.text[:200]
+                    response.close()
+                    raise LLMError(f"{response.status_code} error from the AI model: {detail}")
+                error = f"{response.status_code} error from the AI model"
+                wait = retry_after_seconds(response)
+                response.close()
+
+            if attempt >= self.max_attempts:
+                self._fail()
+                raise LLMError(error)
+
+            if wait is None:
+                wait = self.retry_base * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+            remaining = self.deadline - (time.monotonic() - started)
+            if wait >= remaining:
+                self._fail()
+                raise LLMError(f"{error}; retrying would exceed the {self.deadline:.0f} second deadline")
+
+            logger.warning(f"{error}, retrying in {wait:.2f}s (attempt {attempt} of {self.max_attempts})")
+            self._count('retries')
+            attempt += 1
+            time.sleep(wait)
+
+    def stats(self):
+        """Return call, retry and circuit breaker counters as a dictionary."""
+        with self._lock:
+            counters = {'calls': self.calls, 'retries': self.retries, 'failures': self.failures}
+        counters['breaker'] = self.breaker.stats()
+        if self.scheduler is not None:
+            counters['scheduler'] = self.scheduler.stats()
+        return counters
+
+    @contextmanager
+    def _slot(self, record):
+        """Hold a scheduler slot for a call, if the client has a scheduler."""
+        if self.scheduler is None:
+            yield
+            return
+        # Calls that would be refused anyway don't wait for a slot
+        check_budget(record)
+        with self.scheduler.slot(record['purpose']) as waited:
+            record['queue_ms'] = round(waited * 1000)
+            yield
+
+    def _start_record(self, messages, model, purpose, budget):
+        return start_record(messages, model, purpose, budget or self.max_prompt_tokens)
+
+    def _finish_record(self, record, outcome, content='', usage=None, error=None):
+        """Complete a call's telemetry record and pass it to the recorder."""
+        if self.recorder is None:
+            return
+        try:
+            self.recorder(complete_record(record, outcome, content, usage, error))
+        except Exception as e:
+            logger.error(f"Error recording LLM call: {str(e)}")
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _fail(self):
+        self._count('failures')
+        self.breaker.record_failure()
+
+# Shared instance used for every model call in this process
+llm_client = LLMClient()
@@ -0,0 +1,211 @@
+"""
+asyncio client for the Mistral chat completions API.
+
+The asyncio counterpart of api.llm.LLMClient, used by the ASGI app in
+api/asgi.py. A call waiting on Mistral holds no thread, so one process can
+keep hundreds of calls in flight. Timeouts, retries, the prompt budget and
+telemetry behave as in LLMClient, and by default the circuit breaker is
+shared with the synchronous client since both talk to the same API.
+
+Requires the optional httpx package.
+"""
+import time
+import random
+import asyncio
+import logging
+import contextvars
+from api.llm import (
+    llm_client, api_key, LLMError, CircuitOpenError, RETRYABLE_STATUS,
+    LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_DEADLINE_SECONDS, LLM_MAX_ATTEMPTS,
+    LLM_RETRY_BASE_SECONDS, LLM_MAX_PROMPT_TOKENS, retry_after_seconds, start_record,
+    check_budget, complete_record, outcome_of
+)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class AsyncLLMClient:
+    """
+    Pooled, keep-alive asyncio client for the chat completions API.
+
+    Create it inside the event loop that will use it, and close it with aclose().
+
+    Args:
+        url: The chat completions endpoint, by default the one of the shared synchronous client
+        key: The API key sent as a bearer token
+        connect_timeout: Seconds allowed to open a connection
+        read_timeout: Seconds allowed between bytes of a response
+        deadline: Seconds allowed for a whole call, retries included
+        max_attempts: Attempts per call, including the first
+        retry_base: Backoff before the first retry, doubled after each
+        max_connections: Connections kept open to the API host
+        breaker: CircuitBreaker, by default the one of the shared synchronous client
+        max_prompt_tokens: Estimated prompt size above which calls are refused
+        recorder: Callable given a dictionary describing each finished call
+        executor: Thread pool the recorder runs on, by default asyncio's
+        scheduler: api.scheduler.LLMScheduler each call waits on, by default the one of the shared synchronous client
+    """
+    def __init__(self, url=None, key=api_key, connect_timeout=LLM_CONNECT_TIMEOUT,
+                 read_timeout=LLM_READ_TIMEOUT, deadline=LLM_DEADLINE_SECONDS,
+                 max_attempts=LLM_MAX_ATTEMPTS, retry_base=LLM_RETRY_BASE_SECONDS,
+                 max_connections=500, breaker=None, max_prompt_tokens=LLM_MAX_PROMPT_TOKENS,
+                 recorder=None, executor=None, scheduler=None):
+        if httpx is None:
+            raise RuntimeError("The async client needs the httpx package: pip install httpx")
+        self.url = url or llm_client.url
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.breaker = breaker or llm_client.breaker
+        self.max_prompt_tokens = max_prompt_tokens
+        self.recorder = recorder if recorder is not None else llm_client.recorder
+        self.executor = executor
+        self.scheduler = scheduler or llm_client.scheduler
+
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {key}", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            trust_env=False
+        )
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def chat(self, messages, model, purpose=None, budget=None, **options):
+        """
+        Run a chat completion and return the assistant's reply.
+
+        Args:
+            messages: List of {'role', 'content'} dictionaries
+            model: The Mistral model to use
+            purpose: Label for the call in telemetry, such as 'chat'
+            budget: Prompt token budget for this call, instead of max_prompt_tokens
+            **options: Extra payload fields such as temperature
+
+        Returns:
+            The reply text
+
+        Raises:
+            PromptTooLargeError: The prompt is over budget and was not sent
+            OverloadedError: Too many calls are waiting and this one was not attempted
+            CircuitOpenError: Mistral has been failing and the call was not attempted
+            LLMError: The call failed after retries or ran out of time
+        """
+        record = start_record(messages, model, purpose, budget or self.max_prompt_tokens)
+        slot = None
+        try:
+            if self.scheduler is not None:
+                # Calls that would be refused anyway don't wait for a slot
+                check_budget(record)
+                slot = await self.scheduler.acquire_async(purpose)
+                record['queue_ms'] = round((slot.granted - slot.enqueued) * 1000)
+            response = await self.post({"model": model, "messages": messages, **options}, record)
+            try:
+                data = response.json()
+                content = data["choices"][0]["message"]["content"]
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise LLMError(f"Unexpected response from the AI model: {str(e)}")
+            await self._finish_record(record, 'ok', content, data.get("usage"))
+            return content
+        except LLMError as e:
+            await self._finish_record(record, outcome_of(e), error=e)
+            raise
+        except asyncio.CancelledError:
+            await self._finish_record(record, 'cancelled')
+            raise
+        finally:
+            if slot is not None:
+                self.scheduler.release(slot)
+
+    async def post(self, payload, record=None):
+        """
+        POST a payload with timeouts, retries and the circuit breaker applied.
+
+        Args:
+            payload: The JSON request body
+            record: Telemetry record of the call, updated with the attempts made
+
+        Returns:
+            The successful httpx Response, already read
+        """
+        if record is not None:
+            check_budget(record)
+        if not self.breaker.allow():
+            raise CircuitOpenError("The AI model is temporarily unavailable. Please try again shortly.")
+
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            remaining = self.deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                self._fail()
+                raise LLMError(f"The AI model did not respond within {self.deadline:.0f} seconds")
+
+            error, wait = None, None
+            self.calls += 1
+            if record is not None:
+                record['attempts'] = attempt
+            try:
+                response = await asyncio.wait_for(self.client.post(self.url, json=payload), remaining)
+            except (httpx.HTTPError, asyncio.TimeoutError) as e:
+                error = f"Could not reach the AI model: {str(e) or type(e).__name__}"
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+                if response.status_code not in RETRYABLE_STATUS:
+                    # The request itself was rejected; Mistral is up, so the breaker is not involved
+                    self.breaker.record_success()
+                    raise LLMError(f"{response.status_code} error from the AI model: {response.text[:200]}")
+                error = f"{response.status_code} error from the AI model"
+                wait = retry_after_seconds(response)
+
+            if attempt >= self.max_attempts:
+                self._fail()
+                raise LLMError(error)
+
+            if wait is None:
+                wait = self.retry_base * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+            remaining = self.deadline - (time.monotonic() - started)
+            if wait >= remaining:
+                self._fail()
+                raise LLMError(f"{error}; retrying would exceed the {self.deadline:.0f} second deadline")
+
+            logger.warning(f"{error}, retrying in {wait:.2f}s (attempt {attempt} of {self.max_attempts})")
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        """Return call, retry and circuit breaker counters as a dictionary."""
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+            'breaker': self.breaker.stats()
+        }
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        await self.client.aclose()
+
+    async def _finish_record(self, record, outcome, content='', usage=None, error=None):
+        if self.recorder is None:
+            return
+        try:
+            # The recorder writes to the database, which must not block the event loop
+            record = complete_record(record, outcome, content, usage, error)
+            context = contextvars.copy_context()
+            await asyncio.get_running_loop().run_in_executor(self.executor, context.run, self.recorder, record)
+        except Exception as e:
+            logger.error(f"Error recording LLM call: {str(e)}")
+
+    def _fail(self):
+        self.failures += 1
+        self.breaker.record_failure()
@@ -0,0 +1,132 @@
+"""
+Schema migrations for TranscriptHub.
+
+db.create_all() creates missing tables but never alters existing ones.
+Each migration below runs once, in version order, and is recorded in the
+schema_migration table. A database created fresh by create_all() already
+has the latest schema, so migrations check before they alter anything.
+"""
+import logging
+from sqlalchemy import inspect, text, LargeBinary
+from sqlalchemy.exc import IntegrityError
+from api.models import db, SchemaMigration
+from api.search import create_search_index
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a function as the migration for a schema version."""
+    def register(function):
+        MIGRATIONS.append((version, description, function))
+        return function
+    return register
+
+def add_column(table, column):
+    """Add a column to an existing table unless it is already there."""
+    existing = {col['name'] for col in inspect(db.engine).get_columns(table)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=db.engine.dialect)
+    preparer = db.engine.dialect.identifier_preparer
+    db.session.execute(text(
+        f"ALTER TABLE {preparer.quote(table)} ADD COLUMN {preparer.quote(column.name)} {column_type}"
+    ))
+
+@migration(1, "Add packed segments to transcript")
+def add_transcript_segments():
+    add_column('transcript', db.Column('segments', db.LargeBinary))
+
+def convert_text_to_binary(table, column_name):
+    """
+    Change a text column to a binary one, keeping its contents as UTF-8.
+
+    SQLite columns accept any value type, so only PostgreSQL needs altering.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    columns = {col['name']: col['type'] for col in inspect(db.engine).get_columns(table)}
+    if isinstance(columns[column_name], LargeBinary):
+        return
+    preparer = db.engine.dialect.identifier_preparer
+    table, column_name = preparer.quote(table), preparer.quote(column_name)
+    db.session.execute(text(
+        f"ALTER TABLE {table} ALTER COLUMN {column_name} TYPE BYTEA USING convert_to({column_name}, 'UTF8')"
+    ))
+
+@migration(2, "Store transcript and message content as compressible binary")
+def compress_content_columns():
+    convert_text_to_binary('transcript', 'content')
+    convert_text_to_binary('message', 'content')
+
+def add_index(table, name, columns):
+    """Create an index on an existing table unless it is already there."""
+    existing = {index['name'] for index in inspect(db.engine).get_indexes(table)}
+    if name in existing:
+        return
+    preparer = db.engine.dialect.identifier_preparer
+    column_list = ', '.join(preparer.quote(column) for column in columns)
+    db.session.execute(text(
+        f"CREATE INDEX {preparer.quote(name)} ON {preparer.quote(table)} ({column_list})"
+    ))
+
+@migration(3, "Add normalized video_id to transcript")
+def add_transcript_video_id():
+    # Existing rows are filled in by `flask --app api.app backfill-video-ids`
+    add_column('transcript', db.Column('video_id', db.String(16)))
+    add_index('transcript', 'ix_transcript_user_video', ['user_id', 'video_id'])
+
+@migration(4, "Add content hash to transcript for shared summaries")
+def add_transcript_content_hash():
+    # Older rows get their hash the first time their summary is requested
+    add_column('transcript', db.Column('content_hash', db.String(64)))
+
+@migration(5, "Add chat retrieval index to transcript")
+def add_transcript_search_index():
+    # Older rows are indexed the first time they are chatted about
+    add_column('transcript', db.Column('search_index', db.LargeBinary))
+
+@migration(6, "Add rolling history summary to chat")
+def add_chat_history_summary():
+    add_column('chat', db.Column('history_summary', db.LargeBinary))
+    add_column('chat', db.Column('summarized_through', db.Integer))
+
+@migration(7, "Flag chat messages served from the answer cache")
+def add_message_from_cache():
+    add_column('message', db.Column('from_cache', db.Boolean))
+
+@migration(8, "Record scheduler queue wait of model calls")
+def add_llm_call_queue_ms():
+    add_column('llm_call', db.Column('queue_ms', db.Integer))
+
+@migration(9, "Index transcripts for keyset pagination of the library")
+def add_transcript_user_created_index():
+    add_index('transcript', 'ix_transcript_user_created', ['user_id', 'created_at', 'id'])
+
+@migration(10, "Create full-text index of transcripts")
+def add_transcript_fulltext_index():
+    # Existing rows are indexed by `flask --app api.app index-transcripts`
+    create_search_index()
+
+@migration(11, "Index chats and messages for the chat list, chat page and history")
+def add_chat_message_indexes():
+    add_index('chat', 'ix_chat_user_created', ['user_id', 'created_at', 'id'])
+    add_index('chat', 'ix_chat_transcript', ['transcript_id'])
+    add_index('message', 'ix_message_chat_timestamp', ['chat_id', 'timestamp', 'id'])
+
+def run_migrations():
+    """Apply every migration that has not been recorded yet."""
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+    for version, description, function in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        try:
+            function()
+            db.session.add(SchemaMigration(version=version, description=description))
+            db.session.commit()
+            logger.info(f"Applied migration {version}: {description}")
+        except IntegrityError:
+            # Another worker applied it at the same time
+            db.session.rollback()
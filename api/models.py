@@ -4,6 +4,7 @@ Database models for TranscriptHub application.
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from api.compression import CompressedText
 
 # Initialize SQLAlchemy without binding to an app yet (this happens in app.py)
 db = SQLAlchemy()
@@ -20,10 +21,18 @@ class Transcript(db.Model):
     """Transcript model for storing YouTube video transcripts."""
     id = db.Column(db.Integer, primary_key=True)
     video_url = db.Column(db.String(255), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    video_id = db.Column(db.String(16))  # Normalized by extract_video_id(), NULL for unparseable legacy URLs
+    content = db.deferred(db.Column(CompressedText, nullable=False))  # Loaded on access, not in list queries
+    segments = db.deferred(db.Column(db.LargeBinary))  # Packed api.segments.Segments, loaded on access
+    content_hash = db.Column(db.String(64))  # SHA-256 of content, keys the shared Summary table
+    search_index = db.deferred(db.Column(db.LargeBinary))  # Packed api.retrieval.RetrievalIndex for chat
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     chats = db.relationship('Chat', backref='transcript', lazy=True)
+    __table_args__ = (
+        db.Index('ix_transcript_user_video', 'user_id', 'video_id'),
+        db.Index('ix_transcript_user_created', 'user_id', 'created_at', 'id'),
+    )
 
 class Chat(db.Model):
     """Chat model for conversations about transcripts."""
@@ -32,12 +41,113 @@ class Chat(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     transcript_id = db.Column(db.Integer, db.ForeignKey('transcript.id'), nullable=False)
+    history_summary = db.deferred(db.Column(CompressedText))  # Rolling summary of messages no longer sent to the model
+    summarized_through = db.Column(db.Integer)  # Id of the last message folded into history_summary
     messages = db.relationship('Message', backref='chat', lazy=True, cascade='all, delete-orphan')
+    __table_args__ = (
+        db.Index('ix_chat_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_chat_transcript', 'transcript_id'),
+    )
 
 class Message(db.Model):
     """Message model for storing conversation messages."""
     id = db.Column(db.Integer, primary_key=True)
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(CompressedText, nullable=False)
     role = db.Column(db.String(10), nullable=False)  # 'user' or 'assistant'
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False)
\ No newline at end of file
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False)
+    from_cache = db.Column(db.Boolean, default=False)  # Assistant reply served from the answer cache
+    __table_args__ = (db.Index('ix_message_chat_timestamp', 'chat_id', 'timestamp', 'id'),)
+
+class TranscriptCacheEntry(db.Model):
+    """Shared cache of raw transcript fetches, reused across users."""
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(32), nullable=False)
+    language = db.Column(db.String(32), nullable=False)
+    entries = db.Column(db.Text, nullable=False)  # JSON list of {'text', 'start', 'duration'}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    __table_args__ = (db.UniqueConstraint('video_id', 'language', name='uq_transcript_cache_video_language'),)
+
+class Job(db.Model):
+    """Background extraction or summary job, drained by api/worker.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False, default='extract')
+    status = db.Column(db.String(16), nullable=False, default='queued')  # 'queued', 'running', 'done' or 'failed'
+    stage = db.Column(db.String(16), nullable=False, default='fetch')  # 'fetch', 'store', 'summarize' or 'done'
+    payload = db.Column(db.Text, nullable=False)  # JSON arguments for the job
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    error = db.Column(db.Text)
+    summary = db.Column(db.Text)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64))
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    transcript_id = db.Column(db.Integer, db.ForeignKey('transcript.id'))
+    __table_args__ = (db.Index('ix_job_status_run_after', 'status', 'run_after'),)
+
+class FlightLease(db.Model):
+    """Cross-worker lease so only one process runs a given upstream call at a time."""
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(128), unique=True, nullable=False)
+    holder = db.Column(db.String(64), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    result = db.Column(db.Text)  # JSON result left for waiting workers
+
+class SchemaMigration(db.Model):
+    """Record of a schema migration from api/migrations.py that has been applied."""
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class NegativeCacheEntry(db.Model):
+    """Video whose transcript fetch recently failed in a way retrying won't fix."""
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(32), unique=True, nullable=False)
+    kind = db.Column(db.String(32), nullable=False)  # 'no_transcript', 'disabled' or 'unavailable'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class Summary(db.Model):
+    """Model-generated summary, shared by every transcript with the same content."""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    content = db.Column(CompressedText, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('content_hash', 'model', name='uq_summary_hash_model'),)
+
+class AnswerCacheEntry(db.Model):
+    """Cached reply to a first question about a transcript, shared across users."""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    question = db.Column(db.String(255), nullable=False)  # Normalized by api.cache.normalize_question()
+    answer = db.Column(CompressedText, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    __table_args__ = (db.UniqueConstraint('content_hash', 'model', 'question', name='uq_answer_cache_key'),)
+
+class LLMCall(db.Model):
+    """Telemetry for one model call: tokens, latency, retries and outcome."""
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # None for calls not made for a user
+    purpose = db.Column(db.String(32))  # 'chat', 'history', 'summary', 'summary_part' or 'summary_combine'
+    model = db.Column(db.String(64), nullable=False)
+    outcome = db.Column(db.String(16), nullable=False)  # 'ok', 'error', 'cancelled', 'circuit_open', 'over_budget' or 'shed'
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    estimated_prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    usage_reported = db.Column(db.Boolean, nullable=False, default=False)  # False when token counts are local estimates
+    latency_ms = db.Column(db.Integer, nullable=False, default=0)
+    first_token_ms = db.Column(db.Integer)  # Streaming calls only
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    queue_ms = db.Column(db.Integer)  # Wait for a scheduler slot; None when the call was not scheduled
+    error = db.Column(db.String(255))
+    __table_args__ = (db.Index('ix_llm_call_user_created', 'user_id', 'created_at'),)
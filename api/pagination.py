@@ -0,0 +1,84 @@
+"""
+Keyset pagination for per-user lists.
+
+Lists are ordered newest first on (created_at, id) and each page continues
+from a cursor naming the last row of the previous one. Unlike OFFSET, a
+deep page costs the same index range scan as the first, and rows added in
+the meantime don't shift the pages being read.
+"""
+import os
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+# Page sizes, overridable from the environment
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+
+def encode_cursor(created_at, row_id):
+    """Return the cursor of a row, as passed back in ?before=."""
+    return f"{created_at.isoformat()}_{row_id}"
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor made by encode_cursor().
+
+    Args:
+        cursor: The cursor string, or None
+
+    Returns:
+        (created_at, id), or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+    created_at, _, row_id = cursor.rpartition('_')
+    try:
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        return None
+
+def page_size(value):
+    """Clamp a requested page size, falling back to PAGE_SIZE."""
+    return min(max(value or PAGE_SIZE, 1), MAX_PAGE_SIZE)
+
+def keyset_query(query, created_column, id_column, cursor=None, limit=PAGE_SIZE):
+    """
+    Restrict a query to one page, newest first, and one row more telling whether another page follows.
+
+    Args:
+        query: The filtered query
+        created_column: The creation timestamp column to order on
+        id_column: The primary key column, breaking ties between equal timestamps
+        cursor: (created_at, id) of the last row already shown, or None for the first page
+        limit: Rows per page
+
+    Returns:
+        The query, for callers that embed the page in a larger statement
+    """
+    if cursor is not None:
+        created_at, row_id = cursor
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+    return query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)
+
+def keyset_page(query, created_column, id_column, cursor=None, limit=PAGE_SIZE):
+    """
+    Fetch one page of a query, newest first.
+
+    Args:
+        query: The filtered query; its rows need the created_column and id_column attributes
+        created_column: The creation timestamp column to order on
+        id_column: The primary key column, breaking ties between equal timestamps
+        cursor: (created_at, id) of the last row already shown, or None for the first page
+        limit: Rows per page
+
+    Returns:
+        (rows, next_cursor), where next_cursor is None on the last page
+    """
+    # One row more than the page tells whether another page follows
+    rows = keyset_query(query, created_column, id_column, cursor, limit).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
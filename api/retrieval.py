@@ -0,0 +1,196 @@
+"""
+Retrieval of relevant transcript passages for chat.
+
+Each transcript is cut into timestamped chunks of consecutive segments and
+indexed with BM25 when it is saved. A chat turn then sends the model only
+the chunks that best match the question, with their [MM:SS] markers,
+instead of the whole transcript. Short transcripts are still sent whole.
+"""
+import os
+import re
+import json
+import math
+import zlib
+import heapq
+import logging
+from collections import Counter
+from api.models import db
+from api.llm import estimate_tokens, CHARS_PER_TOKEN
+from api.segments import load_segments
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Retrieval settings, overridable from the environment
+CHAT_CONTEXT_MODE = os.environ.get('CHAT_CONTEXT_MODE', 'retrieval')  # 'retrieval' or 'full'
+RETRIEVAL_CHUNK_TOKENS = int(os.environ.get('RETRIEVAL_CHUNK_TOKENS', 250))
+RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', 6))
+RETRIEVAL_FULL_CONTEXT_TOKENS = int(os.environ.get('RETRIEVAL_FULL_CONTEXT_TOKENS', 6000))
+
+INDEX_VERSION = 1
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_token_pattern = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do does
+for from had has have he her him his how i if in into is it its just like me my no not now
+of on or our out she so some than that the their them then there these they this to up us
+was we were what when where which who why will with would you your yeah um uh okay oh
+""".split())
+
+def tokenize(text):
+    """Lowercase text and split it into index terms, dropping stopwords."""
+    return [token for token in _token_pattern.findall(text.lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+class RetrievalIndex:
+    """
+    BM25 index over the chunks of one transcript.
+
+    Args:
+        chunks: List of (lo, hi) segment ranges, in order
+        lengths: Number of index terms in each chunk
+        postings: Dictionary mapping a term to a flat [chunk, tf, chunk, tf, ...] list
+    """
+    __slots__ = ('chunks', 'lengths', 'postings')
+
+    def __init__(self, chunks, lengths, postings):
+        self.chunks = chunks
+        self.lengths = lengths
+        self.postings = postings
+
+    @classmethod
+    def build(cls, segments, chunk_tokens=RETRIEVAL_CHUNK_TOKENS):
+        """
+        Chunk a transcript's segments and index the chunks.
+
+        Args:
+            segments: api.segments.Segments of the transcript
+            chunk_tokens: Approximate size of each chunk in tokens
+
+        Returns:
+            The RetrievalIndex
+        """
+        max_chars = chunk_tokens * CHARS_PER_TOKEN
+        chunks = []
+        lo = 0
+        size = 0
+        for index in range(len(segments)):
+            segment_size = segments.offsets[index + 1] - segments.offsets[index]
+            if size and size + segment_size > max_chars:
+                chunks.append((lo, index))
+                lo, size = index, 0
+            size += segment_size
+        if lo < len(segments):
+            chunks.append((lo, len(segments)))
+
+        lengths = []
+        postings = {}
+        for chunk_id, (lo, hi) in enumerate(chunks):
+            terms = Counter()
+            for index in range(lo, hi):
+                terms.update(tokenize(segments.text_at(index)))
+            lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                postings.setdefault(term, []).extend((chunk_id, count))
+        return cls(chunks, lengths, postings)
+
+    @classmethod
+    def unpack(cls, data):
+        """Load an index from bytes produced by pack()."""
+        stored = json.loads(zlib.decompress(bytes(data)))
+        if stored.get('v') != INDEX_VERSION:
+            raise ValueError("Unsupported retrieval index version")
+        return cls([tuple(chunk) for chunk in stored['chunks']], stored['lengths'], stored['postings'])
+
+    def pack(self):
+        """Serialize the index to compressed bytes for the Transcript.search_index column."""
+        data = {'v': INDEX_VERSION, 'chunks': self.chunks, 'lengths': self.lengths, 'postings': self.postings}
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), 6)
+
+    def search(self, query, k=RETRIEVAL_TOP_K):
+        """
+        Rank chunks against a query with BM25.
+
+        Args:
+            query: The question text
+            k: Maximum number of chunks to return
+
+        Returns:
+            Up to k chunk ids, best match first
+        """
+        count = len(self.chunks)
+        if not count:
+            return []
+        average_length = (sum(self.lengths) / count) or 1
+
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            frequency = len(posting) // 2
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for position in range(0, len(posting), 2):
+                chunk_id, tf = posting[position], posting[position + 1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores, key=scores.get)
+
+def load_index(transcript, segments=None):
+    """
+    Return the RetrievalIndex for a Transcript row, building and storing it if missing.
+
+    Args:
+        transcript: The Transcript
+        segments: The transcript's Segments, if the caller already loaded them
+
+    Returns:
+        The RetrievalIndex
+    """
+    if transcript.search_index:
+        try:
+            return RetrievalIndex.unpack(transcript.search_index)
+        except ValueError:
+            pass
+
+    index = RetrievalIndex.build(segments or load_segments(transcript))
+    try:
+        transcript.search_index = index.pack()
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error storing retrieval index: {str(e)}")
+        db.session.rollback()
+    return index
+
+def chat_context(transcript, messages, k=RETRIEVAL_TOP_K):
+    """
+    Choose the transcript text to send with a chat turn.
+
+    Args:
+        transcript: The Transcript being discussed
+        messages: The conversation so far, as {'role', 'content'} dictionaries
+        k: Number of chunks to retrieve
+
+    Returns:
+        (context, excerpted) where excerpted is True when only retrieved chunks are included
+    """
+    content = transcript.content
+    if CHAT_CONTEXT_MODE != 'retrieval' or estimate_tokens(content) <= RETRIEVAL_FULL_CONTEXT_TOKENS:
+        return content, False
+
+    # The latest question, plus the one before it for follow-ups like "what about the second one?"
+    questions = [message['content'] for message in messages if message['role'] == 'user'][-2:]
+    segments = load_segments(transcript)
+    index = load_index(transcript, segments)
+    chunk_ids = index.search(' '.join(questions), k)
+    if not chunk_ids:
+        # Nothing matched; the opening of the video is the best general context
+        chunk_ids = list(range(min(k, len(index.chunks))))
+
+    # In video order, so the model sees the passages as they happened
+    passages = [segments.render(*index.chunks[chunk_id]) for chunk_id in sorted(chunk_ids)]
+    return "\n...\n".join(passages), True
@@ -3,16 +3,34 @@ Route definitions for the TranscriptHub application.
 """
 import os
 import json
+import time
 import logging
-from flask import render_template, request, redirect, url_for, flash, jsonify
+from flask import render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import NoTranscriptFound, TranscriptsDisabled
+from youtube_transcript_api._errors import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
 from urllib.parse import urlparse, parse_qs
+from sqlalchemy.orm import undefer
 from api.app import app, db
-from api.models import User, Transcript, Chat, Message
-from api.utils import get_chat_response, summarize_transcript
+from api.models import User, Transcript, Chat, Message, Job
+from api.utils import get_chat_response, stream_chat_response
+from api.chat import start_chat_turn, save_reply, serialize_message, list_chats
+from api.history import history_budget, message_tokens, CHAT_MODEL
+from api.telemetry import usage_report, attributed_to
+from api.llm import llm_client
+from api.summaries import find_summary, summary_flight
+from api.cache import transcript_cache, negative_cache, answer_cache
+from api import sources
+from api.transcripts import (get_transcript_entries, build_transcript, fetch_playlist_video_ids, fetch_flight,
+                             parse_languages, extract_video_id, find_existing_transcript, list_transcripts,
+                             describe_fetch_error, extract_result)
+from api.jobs import enqueue_extraction, enqueue_summary, is_runnable, serialize_job, SUMMARY_FALLBACK
+from api.worker import run_jobs_locally
+from api.pagination import decode_cursor, page_size
+from api.search import search_transcripts, SearchUnavailableError, SEARCH_MAX_PAGES
+from api.segments import parse_timestamp
+from api.segment_query import query_segments, segment_page_size
+from api.bulk import bulk_extract, BULK_CONCURRENCY, BULK_MAX_CONCURRENCY, BULK_MAX_ITEMS
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -46,49 +64,24 @@ def safe_db_query(query_function, default_return=None, log_prefix="Database erro
             
         return default_return
 
-# Helper function to extract YouTube video ID from URLs
-def extract_video_id(url):
+# Helper function to extract YouTube playlist ID from URLs
+def extract_playlist_id(url):
     """
-    Extract the YouTube video ID from various YouTube URL formats.
+    Extract the YouTube playlist ID from a playlist or watch URL.
     
     Supports:
-    - Standard YouTube URLs: https://www.youtube.com/watch?v=VIDEO_ID
-    - Short YouTube URLs: https://youtu.be/VIDEO_ID
-    - Embed URLs: https://www.youtube.com/embed/VIDEO_ID
-    - Video URLs: https://www.youtube.com/v/VIDEO_ID
-    - Mobile URLs: https://m.youtube.com/watch?v=VIDEO_ID
-    - Playlist URLs: Also extracts video ID from playlist URLs
+    - Playlist URLs: https://www.youtube.com/playlist?list=PLAYLIST_ID
+    - Watch URLs inside a playlist: https://www.youtube.com/watch?v=VIDEO_ID&list=PLAYLIST_ID
     """
     if not url:
         return None
-        
-    # Clean the URL
-    url = url.strip()
-    
-    # Extract using urlparse
-    parsed_url = urlparse(url)
-    
-    # Check for youtu.be domain (short URLs)
-    if parsed_url.netloc in ['youtu.be']:
-        return parsed_url.path.strip('/')
-    
-    # For standard or mobile YouTube domains
-    if any(domain in parsed_url.netloc for domain in ['youtube.com', 'm.youtube.com', 'www.youtube.com']):
-        # Handle /watch path with v parameter
-        if parsed_url.path == '/watch':
-            query = parse_qs(parsed_url.query)
-            return query.get('v', [None])[0]
-            
-        # Handle /embed/ or /v/ paths
-        if '/embed/' in parsed_url.path or '/v/' in parsed_url.path:
-            path_parts = parsed_url.path.split('/')
-            # The ID should be after /embed/ or /v/
-            for i, part in enumerate(path_parts):
-                if part in ['embed', 'v'] and i < len(path_parts) - 1:
-                    return path_parts[i + 1]
     
-    # If all checks fail, return None
-    return None
+    parsed_url = urlparse(url.strip())
+    if 'youtube.com' not in parsed_url.netloc:
+        return None
+    
+    query = parse_qs(parsed_url.query)
+    return query.get('list', [None])[0]
 
 # Route definitions
 @app.route('/')
@@ -107,73 +100,133 @@ def index():
 @app.route('/extract', methods=['POST'])
 @login_required
 def extract():
-    video_url = request.form.get('video_url', '').strip()
+    """Extract a video's transcript and show it, or queue the extraction
+    
+    Clients that prefer JSON get the same responses as the ASGI entry
+    point's /extract: 200 with extract_result(), 202 with the queued job,
+    or a JSON error with status 400, 422 or 500.
+    """
+    wants_json = request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+    fields = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(fields, dict):
+        fields = {}
+    video_url = (fields.get('video_url') or '').strip()
     video_id = extract_video_id(video_url)
 
     if not video_id:
+        if wants_json:
+            return jsonify({'error': 'Invalid YouTube URL provided.'}), 400
         flash('Invalid YouTube URL provided.', 'danger')
         return redirect(url_for('index'))
 
+    # Optional caption language preference, e.g. "de,en"
+    languages = parse_languages(fields.get('languages'))
+
+    background = fields.get('mode', app.config['EXTRACT_MODE']) == 'background'
+
+    # Re-extracting a video returns the transcript the user already has
+    transcript = safe_db_query(
+        lambda: find_existing_transcript(current_user.id, video_id),
+        default_return=None,
+        log_prefix="Error checking for an existing transcript"
+    )
+    existing = transcript is not None
+
+    if background:
+        if existing:
+            if wants_json:
+                return jsonify(extract_result(transcript.id, video_id, True,
+                                              url_for('transcript_summary', transcript_id=transcript.id)))
+            flash('You have already extracted this video.', 'info')
+            return redirect(url_for('dashboard'))
+
+        # Queue the work for api/worker.py instead of holding this worker
+        job = enqueue_extraction(current_user.id, video_url, video_id, languages)
+        if wants_json:
+            job_data = serialize_job(job)
+            job_data['status_url'] = url_for('job_status', job_id=job.id)
+            return jsonify(job_data), 202
+        flash('Your transcript is being extracted. It will appear here when ready.', 'info')
+        return redirect(url_for('dashboard'))
+
     try:
-        # Try with English first
-        try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-        except NoTranscriptFound:
-            # Fallback: try to get any available transcript if English isn't available
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            
-            # Get the first available transcript
-            if transcript_list:
-                transcript = transcript_list[0]
-                transcript_list = transcript.fetch()
-            else:
-                raise NoTranscriptFound(f"No transcripts found for video ID: {video_id}")
-                
-        # Format the transcript with timestamps
-        formatted_entries = []
-        for entry in transcript_list:
-            # Convert timestamp to minutes:seconds format
-            timestamp_seconds = int(entry['start'])
-            minutes = timestamp_seconds // 60
-            seconds = timestamp_seconds % 60
-            timestamp = f"[{minutes:02d}:{seconds:02d}] "
-            
-            # Add formatted entry
-            formatted_entries.append(f"{timestamp}{entry['text']}")
-            
-        transcript_text = "\n".join(formatted_entries)
+        if transcript is None:
+            # Reuse a transcript already fetched for any user
+            transcript_list = get_transcript_entries(video_id, languages)
 
-        # Save to database
-        transcript = Transcript(video_url=video_url, content=transcript_text, user_id=current_user.id)
-        db.session.add(transcript)
-        db.session.commit()
+            # Save to database
+            transcript = build_transcript(current_user.id, video_url, transcript_list, video_id)
+            db.session.add(transcript)
+            db.session.commit()
 
-        # Create an automatic summary
-        try:
-            summary = summarize_transcript(transcript_text)
-        except Exception as e:
-            logger.error(f"Error generating summary: {str(e)}")
-            summary = "Summary could not be generated automatically."
+        summary_url = url_for('transcript_summary', transcript_id=transcript.id)
+        if wants_json:
+            return jsonify(extract_result(transcript.id, video_id, existing, summary_url))
+
+        # Show a stored summary right away; otherwise the page fetches it from summary_url
+        summary = find_summary(transcript.content_hash) if transcript.content_hash else None
 
+        # The page loads the transcript itself a page of lines at a time
         return render_template('result.html', 
-                              transcript=transcript_text, 
-                              video_url=video_url, 
+                              video_url=transcript.video_url, 
+                              video_id=video_id,
                               transcript_id=transcript.id,
-                              summary=summary)
+                              summary=summary,
+                              summary_url=summary_url)
 
-    except NoTranscriptFound:
-        flash('No transcript found for this video.', 'warning')
-    except TranscriptsDisabled:
-        flash('Transcripts are disabled for this video.', 'warning')
+    except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
+        if wants_json:
+            return jsonify({'error': describe_fetch_error(e)}), 422
+        flash(describe_fetch_error(e), 'warning')
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
         logger.error(f"Error extracting transcript: {str(e)}")
         logger.error(f"Traceback: {error_details}")
+        db.session.rollback()
+        if wants_json:
+            return jsonify({'error': f'An error occurred: {str(e)}'}), 500
         flash(f'An error occurred: {str(e)}', 'danger')
 
     return redirect(url_for('index'))
 
+@app.route('/api/bulk_extract', methods=['POST'])
+@login_required
+def bulk_extract_videos():
+    """Extract transcripts for a playlist or a list of video URLs"""
+    data = request.get_json(silent=True) or {}
+    playlist_url = (data.get('playlist_url') or '').strip()
+    video_urls = data.get('video_urls') or []
+    
+    if not playlist_url and not video_urls:
+        return jsonify({'error': 'Missing playlist_url or video_urls'}), 400
+    if not isinstance(video_urls, list):
+        return jsonify({'error': 'video_urls must be a list'}), 400
+    
+    items = [(url, extract_video_id(url) if isinstance(url, str) else None) for url in video_urls]
+    
+    if playlist_url:
+        playlist_id = extract_playlist_id(playlist_url)
+        if not playlist_id:
+            return jsonify({'error': 'Invalid YouTube playlist URL provided.'}), 400
+        try:
+            playlist_video_ids = fetch_playlist_video_ids(playlist_id, BULK_MAX_ITEMS)
+        except Exception as e:
+            logger.error(f"Error listing playlist {playlist_id}: {str(e)}")
+            return jsonify({'error': f'Unable to read playlist: {str(e)}'}), 502
+        items += [(f"https://www.youtube.com/watch?v={video_id}", video_id) for video_id in playlist_video_ids]
+    
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({'error': f'Too many videos, the limit is {BULK_MAX_ITEMS}'}), 400
+    
+    try:
+        concurrency = int(data.get('concurrency', BULK_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency must be an integer'}), 400
+    concurrency = max(1, min(concurrency, BULK_MAX_CONCURRENCY))
+    
+    return jsonify(bulk_extract(current_user.id, items, concurrency))
+
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
@@ -255,8 +308,11 @@ def logout():
 @login_required
 def dashboard():
     try:
-        transcripts = Transcript.query.filter_by(user_id=current_user.id).order_by(Transcript.created_at.desc()).all()
-        return render_template('dashboard.html', transcripts=transcripts)
+        # One page of metadata; the page fetches a body when it is opened
+        cursor = decode_cursor(request.args.get('before'))
+        transcripts, next_cursor = list_transcripts(current_user.id, cursor)
+        return render_template('dashboard.html', transcripts=transcripts, next_cursor=next_cursor,
+                               paged=cursor is not None)
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -273,6 +329,135 @@ def dashboard():
         # Return empty transcripts list
         return render_template('dashboard.html', transcripts=[])
 
+@app.route('/api/transcripts')
+@login_required
+def transcript_list():
+    """Return one page of the current user's transcripts, newest first, without their bodies"""
+    before = request.args.get('before')
+    cursor = decode_cursor(before)
+    if before and cursor is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    transcripts, next_cursor = list_transcripts(current_user.id, cursor, page_size(request.args.get('limit', type=int)))
+    return jsonify({
+        'transcripts': [{
+            'id': t.id,
+            'video_url': t.video_url,
+            'video_id': t.video_id,
+            'created_at': t.created_at.isoformat() if t.created_at else None,
+            'content_url': url_for('transcript_content', transcript_id=t.id)
+        } for t in transcripts],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/transcripts/search')
+@login_required
+def search_transcripts_api():
+    """Search the current user's transcripts, returning ranked hits with matching [MM:SS] lines"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Search query is empty'}), 400
+    
+    page = min(max(request.args.get('page', 1, type=int), 1), SEARCH_MAX_PAGES)
+    try:
+        hits, has_more = search_transcripts(current_user.id, query, page, page_size(request.args.get('limit', 20, type=int)))
+    except SearchUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    for hit in hits:
+        hit['content_url'] = url_for('transcript_content', transcript_id=hit['id'])
+    return jsonify({
+        'query': query,
+        'page': page,
+        'results': hits,
+        'next_page': page + 1 if has_more and page < SEARCH_MAX_PAGES else None
+    })
+
+@app.route('/api/transcripts/<int:transcript_id>')
+@login_required
+def transcript_content(transcript_id):
+    """Return a single transcript body for the dashboard's View, Copy and Download actions"""
+    transcript = Transcript.query.get_or_404(transcript_id)
+    if transcript.user_id != current_user.id:
+        return jsonify({'error': 'You do not have permission to access this transcript'}), 403
+    
+    return jsonify({
+        'id': transcript.id,
+        'video_url': transcript.video_url,
+        'created_at': transcript.created_at.isoformat() if transcript.created_at else None,
+        'content': transcript.content
+    })
+
+@app.route('/api/transcripts/<int:transcript_id>/segments')
+@login_required
+def transcript_segments(transcript_id):
+    """Return a page of transcript lines within a ?from=&to= time window and/or matching ?q=
+    
+    Times are seconds or MM:SS / HH:MM:SS. Pass next_index back as ?from_index=
+    with the same other parameters for the following page.
+    """
+    transcript = Transcript.query.options(undefer(Transcript.segments)).get_or_404(transcript_id)
+    if transcript.user_id != current_user.id:
+        return jsonify({'error': 'You do not have permission to access this transcript'}), 403
+    
+    window = {}
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        window[name] = parse_timestamp(value)
+        if value and window[name] is None:
+            return jsonify({'error': f"Invalid '{name}' time, use seconds or MM:SS"}), 400
+    from_index = request.args.get('from_index', type=int)
+    if from_index is not None and from_index < 0:
+        return jsonify({'error': 'Invalid from_index'}), 400
+    keyword = request.args.get('q', '').strip() or None
+    
+    result = query_segments(transcript, window['from'], window['to'], keyword, from_index,
+                            segment_page_size(request.args.get('limit', type=int)))
+    result['id'] = transcript.id
+    result['query'] = keyword
+    return jsonify(result)
+
+@app.route('/api/transcripts/<int:transcript_id>/summary')
+@login_required
+def transcript_summary(transcript_id):
+    """Return the transcript's stored summary, or queue generating it and answer 202
+    
+    Summaries, which can take many model calls, are never generated in the
+    request. The 202 response's status_url is polled until the summary job
+    finishes; ?job= names the job being polled, so its failure is reported.
+    """
+    transcript = Transcript.query.get_or_404(transcript_id)
+    if transcript.user_id != current_user.id:
+        return jsonify({'error': 'You do not have permission to access this transcript'}), 403
+    
+    summary = find_summary(transcript.content_hash) if transcript.content_hash else None
+    if summary is not None:
+        return jsonify({'id': transcript.id, 'summary': summary})
+    
+    job_id = request.args.get('job', type=int)
+    job = db.session.get(Job, job_id) if job_id else None
+    if job is not None and job.user_id == current_user.id and job.transcript_id == transcript.id:
+        if job.status == 'done' and job.summary and job.summary != SUMMARY_FALLBACK:
+            return jsonify({'id': transcript.id, 'summary': job.summary})
+        if job.status in ('done', 'failed'):
+            return jsonify({'error': SUMMARY_FALLBACK, 'detail': job.error}), 502
+    else:
+        job = enqueue_summary(current_user.id, transcript.id)
+    
+    # Without a worker draining the queue, run the job on a thread of this process,
+    # again whenever a retry of it comes due
+    if app.config['EXTRACT_MODE'] != 'background' and is_runnable(job):
+        run_jobs_locally()
+    
+    response = jsonify({
+        'id': transcript.id,
+        'status': 'pending',
+        'job_id': job.id,
+        'status_url': url_for('transcript_summary', transcript_id=transcript.id, job=job.id)
+    })
+    response.headers['Retry-After'] = '2'
+    return response, 202
+
 @app.route('/create_chat/<int:transcript_id>', methods=['POST'])
 @login_required
 def create_chat(transcript_id):
@@ -326,7 +511,8 @@ def send_message():
         # Get request data
         data = request.json
         chat_id = data.get('chat_id')
-        message_content = data.get('message')
+        # chat.html has always sent 'content'; accept both
+        message_content = data.get('message') or data.get('content')
         
         # Verify ownership of chat
         chat = Chat.query.get_or_404(chat_id)
@@ -336,45 +522,22 @@ def send_message():
         # Get transcript for context
         transcript = Transcript.query.get_or_404(chat.transcript_id)
         
-        # Save the user message
-        user_message = Message(
-            content=message_content,
-            role='user',
-            chat_id=chat_id
-        )
-        db.session.add(user_message)
-        db.session.commit()
+        turn = start_chat_turn(chat, transcript, message_content)
         
-        # Get all messages for context
-        messages = Message.query.filter_by(chat_id=chat_id).order_by(Message.timestamp).all()
-        message_list = [{'role': msg.role, 'content': msg.content} for msg in messages]
-        
-        # Get AI response
-        ai_response_content = get_chat_response(message_list, transcript.content)
-        
-        # Save the AI response
-        ai_message = Message(
-            content=ai_response_content,
-            role='assistant',
-            chat_id=chat_id
-        )
-        db.session.add(ai_message)
-        db.session.commit()
+        if turn.cached_reply is not None:
+            ai_message = save_reply(turn, turn.cached_reply, from_cache=True)
+        else:
+            # Get AI response
+            ai_response_content = get_chat_response(turn.messages, turn.context, CHAT_MODEL,
+                                                    excerpted=turn.excerpted,
+                                                    history_summary=turn.history_summary)
+            ai_message = save_reply(turn, ai_response_content,
+                                    cacheable=not ai_response_content.startswith('Error:'))
         
         return jsonify({
             'success': True,
-            'user_message': {
-                'id': user_message.id,
-                'content': user_message.content,
-                'role': user_message.role,
-                'timestamp': user_message.timestamp.isoformat()
-            },
-            'ai_message': {
-                'id': ai_message.id,
-                'content': ai_message.content,
-                'role': ai_message.role,
-                'timestamp': ai_message.timestamp.isoformat()
-            }
+            'user_message': turn.user_message,
+            'ai_message': serialize_message(ai_message)
         })
     except Exception as e:
         import traceback
@@ -384,9 +547,147 @@ def send_message():
         
         return jsonify({'error': str(e)}), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/stream_message', methods=['POST'])
+@login_required
+def stream_message():
+    """Send a message and stream the AI response back as Server-Sent Events
+    
+    Events: 'user_message' once the message is saved, 'token' for each piece
+    of the reply, then 'done' with the saved reply or 'error'. If the client
+    disconnects or the model fails mid-reply, the partial reply is saved.
+    """
+    data = request.get_json(silent=True) or {}
+    chat_id = data.get('chat_id')
+    message_content = (data.get('message') or data.get('content') or '').strip()
+    if not message_content:
+        return jsonify({'error': 'Message is empty'}), 400
+    
+    # Verify ownership of chat
+    chat = Chat.query.get_or_404(chat_id)
+    if chat.user_id != current_user.id:
+        return jsonify({'error': 'You do not have permission to access this chat'}), 403
+    
+    transcript = Transcript.query.get_or_404(chat.transcript_id)
+    
+    turn = start_chat_turn(chat, transcript, message_content)
+    user_id = current_user.id
+    
+    def generate():
+        # The request's user is no longer loaded once the response is streaming
+        with attributed_to(user_id):
+            parts = []
+            saved = False
+            started = time.monotonic()
+            try:
+                yield sse_event('user_message', turn.user_message)
+                if turn.cached_reply is not None:
+                    yield sse_event('token', {'content': turn.cached_reply})
+                    ai_message = save_reply(turn, turn.cached_reply, from_cache=True)
+                    saved = True
+                    yield sse_event('done', {'ai_message': serialize_message(ai_message)})
+                    return
+                
+                for delta in stream_chat_response(turn.messages, turn.context, CHAT_MODEL,
+                                                  excerpted=turn.excerpted,
+                                                  history_summary=turn.history_summary):
+                    if not parts:
+                        logger.info(f"Chat {chat_id}: first token after {(time.monotonic() - started) * 1000:.0f} ms")
+                    parts.append(delta)
+                    yield sse_event('token', {'content': delta})
+            
+                ai_message = save_reply(turn, ''.join(parts))
+                saved = True
+                yield sse_event('done', {'ai_message': serialize_message(ai_message)})
+            except Exception as e:
+                logger.error(f"Error streaming chat {chat_id}: {str(e)}")
+                db.session.rollback()
+                yield sse_event('error', {'error': str(e), 'partial': bool(parts)})
+            finally:
+                # Keep what was generated if the model failed or the client disconnected mid-reply
+                if not saved and parts:
+                    try:
+                        save_reply(turn, ''.join(parts), cacheable=False)
+                    except Exception as e:
+                        logger.error(f"Error saving partial reply for chat {chat_id}: {str(e)}")
+                        db.session.rollback()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/chats/<int:chat_id>/history')
+@login_required
+def chat_history_status(chat_id):
+    """API endpoint describing what the next turn of a chat will send as history"""
+    chat = Chat.query.get_or_404(chat_id)
+    if chat.user_id != current_user.id:
+        return jsonify({'error': 'You do not have permission to access this chat'}), 403
+    
+    query = Message.query.filter_by(chat_id=chat_id)
+    if chat.summarized_through:
+        query = query.filter(Message.id > chat.summarized_through)
+    unsummarized = [{'role': msg.role, 'content': msg.content} for msg in query.all()]
+    return jsonify({
+        'model': CHAT_MODEL,
+        'budget_tokens': history_budget(CHAT_MODEL),
+        'summary': chat.history_summary,
+        'summarized_through': chat.summarized_through,
+        'unsummarized_messages': len(unsummarized),
+        'unsummarized_tokens': sum(message_tokens(message) for message in unsummarized)
+    })
+
 @app.route('/chats')
 @login_required
 def chats():
-    """Show all chats for the current user"""
-    user_chats = Chat.query.filter_by(user_id=current_user.id).order_by(Chat.created_at.desc()).all()
-    return render_template('chats.html', chats=user_chats)
\ No newline at end of file
+    """Show one page of the current user's chats, newest first, with their latest messages"""
+    cursor = decode_cursor(request.args.get('before'))
+    user_chats, next_cursor = list_chats(current_user.id, cursor)
+    return render_template('chats.html', chats=user_chats, next_cursor=next_cursor, paged=cursor is not None)
+
+@app.route('/api/cache/stats')
+@login_required
+def cache_stats():
+    """Report hit, miss and eviction counters for the shared transcript cache"""
+    stats = transcript_cache.stats()
+    stats['negative'] = negative_cache.stats()
+    stats['answers'] = answer_cache.stats()
+    stats['source'] = sources.transcript_source.stats()
+    stats['flights'] = {
+        'transcript': fetch_flight.stats(),
+        'summary': summary_flight.stats()
+    }
+    return jsonify(stats)
+
+@app.route('/api/llm/stats')
+@login_required
+def llm_stats():
+    """Report model call counters, the circuit breaker and the scheduler's queue"""
+    return jsonify(llm_client.stats())
+
+@app.route('/api/usage')
+@login_required
+def usage():
+    """API endpoint reporting the current user's model calls and tokens per day"""
+    days = min(max(request.args.get('days', 7, type=int), 1), 90)
+    report = safe_db_query(lambda: usage_report(current_user.id, days), default_return=[],
+                           log_prefix="Error building usage report")
+    return jsonify({
+        'days': report,
+        'prompt_tokens': sum(row['prompt_tokens'] for row in report),
+        'completion_tokens': sum(row['completion_tokens'] for row in report)
+    })
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Poll the status of a queued extraction job"""
+    job = Job.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        return jsonify({'error': 'You do not have permission to access this job'}), 403
+    return jsonify(serialize_job(job))
\ No newline at end of file
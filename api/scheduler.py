@@ -0,0 +1,291 @@
+"""
+Scheduler for model calls.
+
+Every call made by the shared LLM clients waits here for a slot before it
+is sent. At most LLM_MAX_IN_FLIGHT calls run at once in the process, and
+one user holds at most LLM_MAX_IN_FLIGHT_PER_USER interactive and
+LLM_MAX_IN_FLIGHT_PER_USER_BACKGROUND background calls of them, so a single
+user's burst cannot push Mistral into rate limiting everyone. The per-user
+limits are separate so a user's own chunked summary, whose parts run as
+that user, never keeps their chat replies waiting. Free slots
+go to interactive calls (chat replies and history summaries) before
+background ones (transcript summaries); within a priority, to the user
+with the fewest calls running, then in arrival order.
+
+A call is shed with OverloadedError instead of queued when the queue is
+full or its expected wait is already past the priority's deadline, and
+when it has waited that long without getting a slot. Threads and asyncio
+tasks share the same slots.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from api.llm import OverloadedError, llm_client
+from api.telemetry import call_user_id
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Scheduling limits, overridable from the environment
+LLM_MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 8))
+LLM_MAX_IN_FLIGHT_PER_USER = int(os.environ.get('LLM_MAX_IN_FLIGHT_PER_USER', 2))
+LLM_MAX_IN_FLIGHT_PER_USER_BACKGROUND = int(os.environ.get('LLM_MAX_IN_FLIGHT_PER_USER_BACKGROUND', 4))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', 200))
+LLM_QUEUE_WAIT_INTERACTIVE = float(os.environ.get('LLM_QUEUE_WAIT_INTERACTIVE', 15))
+LLM_QUEUE_WAIT_BACKGROUND = float(os.environ.get('LLM_QUEUE_WAIT_BACKGROUND', 120))
+
+# Priorities, most urgent first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+# Call purposes someone is waiting on; every other purpose is background work
+INTERACTIVE_PURPOSES = frozenset({'chat', 'history'})
+
+# Weight of the latest call in the moving average of call durations
+DURATION_SMOOTHING = 0.2
+
+def priority_of(purpose):
+    """Return the scheduling priority of a call purpose."""
+    return INTERACTIVE if purpose in INTERACTIVE_PURPOSES else BACKGROUND
+
+class _Waiter:
+    """A call waiting for a slot; wake is called under the scheduler lock once it has one."""
+    __slots__ = ('priority', 'user_id', 'sequence', 'enqueued', 'granted', 'wake')
+
+    def __init__(self, priority, user_id, sequence, wake):
+        self.priority = priority
+        self.user_id = user_id
+        self.sequence = sequence
+        self.enqueued = time.monotonic()
+        self.granted = None
+        self.wake = wake
+
+class LLMScheduler:
+    """
+    Thread-safe admission control for model calls.
+
+    Args:
+        max_in_flight: Calls allowed to run at once
+        max_per_user: Calls one user may have running at once, per priority:
+            a dictionary like max_wait, or one limit for every priority
+        max_queue: Calls allowed to wait at once; later calls are shed
+        max_wait: Seconds a call may wait for a slot, per priority
+        user_resolver: Callable returning the user the current call is made for, or None
+    """
+    def __init__(self, max_in_flight=LLM_MAX_IN_FLIGHT, max_per_user=None,
+                 max_queue=LLM_MAX_QUEUE, max_wait=None, user_resolver=call_user_id):
+        self.max_in_flight = max(1, max_in_flight)
+        if max_per_user is None:
+            max_per_user = {INTERACTIVE: LLM_MAX_IN_FLIGHT_PER_USER, BACKGROUND: LLM_MAX_IN_FLIGHT_PER_USER_BACKGROUND}
+        elif not isinstance(max_per_user, dict):
+            max_per_user = dict.fromkeys(PRIORITY_NAMES, max_per_user)
+        self.max_per_user = {priority: max(1, limit) for priority, limit in max_per_user.items()}
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait or {INTERACTIVE: LLM_QUEUE_WAIT_INTERACTIVE, BACKGROUND: LLM_QUEUE_WAIT_BACKGROUND}
+        self.user_resolver = user_resolver
+
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._sequence = 0
+        self._running = 0
+        # Running calls per (user, priority)
+        self._running_per_user = Counter()
+        # Moving average of how long a call holds its slot, for wait estimates
+        self._duration = None
+
+        self.granted = Counter()
+        self.shed = Counter()
+        self.waited_seconds = Counter()
+        self.max_queue_depth = 0
+
+    @contextmanager
+    def slot(self, purpose):
+        """
+        Hold a slot for a call made from a thread, waiting for one if needed.
+
+        Args:
+            purpose: The call's telemetry purpose, which sets its priority
+
+        Yields:
+            Seconds spent waiting for the slot
+
+        Raises:
+            OverloadedError: The call was shed
+        """
+        event = threading.Event()
+        waiter = self._enqueue(purpose, event.set)
+        if waiter.granted is None:
+            event.wait(self.max_wait[waiter.priority])
+            self._settle(waiter)
+        try:
+            yield waiter.granted - waiter.enqueued
+        finally:
+            self._release(waiter)
+
+    async def acquire_async(self, purpose):
+        """
+        Wait for a slot for a call made from an asyncio task.
+
+        Args:
+            purpose: The call's telemetry purpose, which sets its priority
+
+        Returns:
+            The slot, to hand back with release(); its wait in seconds is slot.granted - slot.enqueued
+
+        Raises:
+            OverloadedError: The call was shed
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(purpose, wake)
+        if waiter.granted is None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.max_wait[waiter.priority])
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter.granted is None:
+                        self._waiting.remove(waiter)
+                        raise
+                self._release(waiter)
+                raise
+            self._settle(waiter)
+        return waiter
+
+    def release(self, waiter):
+        """Hand back a slot taken with acquire_async()."""
+        self._release(waiter)
+
+    def stats(self):
+        """Return slot, queue and shedding counters as a dictionary."""
+        with self._lock:
+            queued = Counter(waiter.priority for waiter in self._waiting)
+            return {
+                'in_flight': self._running,
+                'max_in_flight': self.max_in_flight,
+                'max_per_user': {name: self.max_per_user[priority] for priority, name in PRIORITY_NAMES.items()},
+                'queued': {name: queued[priority] for priority, name in PRIORITY_NAMES.items()},
+                'max_queue_depth': self.max_queue_depth,
+                'granted': {name: self.granted[priority] for priority, name in PRIORITY_NAMES.items()},
+                'shed': dict(self.shed),
+                'avg_wait_ms': {
+                    name: round(self.waited_seconds[priority] / self.granted[priority] * 1000)
+                    if self.granted[priority] else 0
+                    for priority, name in PRIORITY_NAMES.items()
+                },
+                'avg_call_ms': round(self._duration * 1000) if self._duration is not None else None
+            }
+
+    def _enqueue(self, purpose, wake):
+        priority = priority_of(purpose)
+        user_id = self.user_resolver() if self.user_resolver else None
+        with self._lock:
+            self._sequence += 1
+            waiter = _Waiter(priority, user_id, self._sequence, wake)
+            self._waiting.append(waiter)
+            self._dispatch()
+            if waiter.granted is not None:
+                return waiter
+
+            if len(self._waiting) > self.max_queue:
+                self._waiting.remove(waiter)
+                self._shed('queue_full', priority)
+            expected = self._expected_wait(priority, user_id)
+            if expected is not None and expected > self.max_wait[priority]:
+                self._waiting.remove(waiter)
+                self._shed('expected_wait', priority)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            return waiter
+
+    def _settle(self, waiter):
+        """Shed a waiter that was not granted a slot within its deadline."""
+        with self._lock:
+            if waiter.granted is not None:
+                return
+            self._waiting.remove(waiter)
+            self._shed('timeout', waiter.priority)
+
+    def _release(self, waiter):
+        with self._lock:
+            self._running -= 1
+            key = (waiter.user_id, waiter.priority)
+            self._running_per_user[key] -= 1
+            if self._running_per_user[key] <= 0:
+                del self._running_per_user[key]
+            duration = time.monotonic() - waiter.granted
+            if self._duration is None:
+                self._duration = duration
+            else:
+                self._duration += DURATION_SMOOTHING * (duration - self._duration)
+            self._dispatch()
+
+    def _has_room(self, waiter):
+        if self._running >= self.max_in_flight:
+            return False
+        # Calls not made for a user only count against the global limit
+        return (waiter.user_id is None
+                or self._running_per_user[waiter.user_id, waiter.priority] < self.max_per_user[waiter.priority])
+
+    def _grant(self, waiter):
+        waiter.granted = time.monotonic()
+        self._running += 1
+        self._running_per_user[waiter.user_id, waiter.priority] += 1
+        self.granted[waiter.priority] += 1
+        self.waited_seconds[waiter.priority] += waiter.granted - waiter.enqueued
+
+    def _dispatch(self):
+        """Grant free slots to waiting calls, most deserving first."""
+        while self._waiting and self._running < self.max_in_flight:
+            eligible = [waiter for waiter in self._waiting if self._has_room(waiter)]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda w: (w.priority, self._running_per_user[w.user_id, w.priority], w.sequence))
+            self._waiting.remove(waiter)
+            self._grant(waiter)
+            waiter.wake()
+
+    def _expected_wait(self, priority, user_id=None):
+        """
+        Estimate how long the newest queued call of a priority will wait, or None before any call has finished.
+
+        The call waits for the calls ahead of it in the process, and for its
+        user's own calls of the same priority ahead of it in turn for the
+        per-user slots; whichever is longer.
+        """
+        if self._duration is None:
+            return None
+        ahead = sum(1 for waiter in self._waiting if waiter.priority <= priority)
+        expected = ahead / self.max_in_flight * self._duration
+        if user_id is not None:
+            own = sum(1 for waiter in self._waiting if waiter.priority == priority and waiter.user_id == user_id)
+            expected = max(expected, own / self.max_per_user[priority] * self._duration)
+        return expected
+
+    def _shed(self, reason, priority):
+        self.shed[f"{PRIORITY_NAMES[priority]}_{reason}"] += 1
+        logger.warning(f"Shedding {PRIORITY_NAMES[priority]} model call: {reason}")
+        raise OverloadedError("The AI model is busy right now. Please try again in a moment.")
+
+def install_scheduler(client=llm_client, scheduler=None):
+    """
+    Make a client wait for scheduler slots before each call.
+
+    Args:
+        client: The api.llm.LLMClient to schedule
+        scheduler: The LLMScheduler to use, by default a new one with the environment's limits
+
+    Returns:
+        The LLMScheduler
+    """
+    client.scheduler = scheduler or LLMScheduler()
+    return client.scheduler
@@ -0,0 +1,255 @@
+"""
+Full-text search over the transcript library.
+
+Transcript bodies are stored compressed, so they are indexed separately:
+
+    PostgreSQL  transcript_search table holding a tsvector per transcript,
+                with a GIN index; queries use websearch_to_tsquery and are
+                ranked with ts_rank_cd
+    SQLite      contentless FTS5 table transcript_fts keyed by transcript
+                id, with the porter tokenizer; queries are ranked with bm25
+
+The owner is indexed as a token of its own in FTS5, so a user's search
+intersects posting lists instead of filtering every matching transcript.
+install_search_index() adds each new transcript to the index in the same
+transaction that inserts it; rows saved before the index existed are added
+by `flask --app api.app index-transcripts`. The app never deletes
+transcripts, so neither does the index.
+
+Hits are returned a page at a time, each with the [MM:SS] lines that best
+match the query.
+"""
+import os
+import re
+import logging
+from functools import lru_cache
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import undefer
+from api.models import db, Transcript
+from api.segments import load_segments, format_timestamp
+from api.retrieval import tokenize
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Search settings, overridable from the environment
+SEARCH_SNIPPETS = int(os.environ.get('SEARCH_SNIPPETS', 3))  # Matching lines returned per hit
+SEARCH_MAX_PAGES = int(os.environ.get('SEARCH_MAX_PAGES', 20))  # Deeper result pages are refused
+
+POSTGRES_TABLE = 'transcript_search'
+SQLITE_TABLE = 'transcript_fts'
+
+_timestamp_pattern = re.compile(r'^\[\d+:\d{2}\] ?', re.MULTILINE)
+_query_pattern = re.compile(r'"([^"]*)"|(\S+)')
+_suffix_pattern = re.compile(r"(?:'s|ingly|edly|ing|ed|ly|es|(?<![su])s)$")
+
+# Backend name per database URL, once its index table has been found
+_backends = {}
+
+class SearchUnavailableError(Exception):
+    """Raised when the database has no full-text index to search."""
+
+def create_search_index():
+    """Create the full-text index table for the current database, if the database supports one."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+            "transcript_id INTEGER PRIMARY KEY REFERENCES transcript (id) ON DELETE CASCADE, "
+            "user_id INTEGER NOT NULL, "
+            "document TSVECTOR NOT NULL)"
+        ))
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{POSTGRES_TABLE}_document ON {POSTGRES_TABLE} USING GIN (document)"
+        ))
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{POSTGRES_TABLE}_user ON {POSTGRES_TABLE} (user_id)"
+        ))
+    elif dialect == 'sqlite':
+        try:
+            db.session.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+                "body, owner, content='', tokenize='porter unicode61')"
+            ))
+        except Exception as e:
+            # SQLite builds without FTS5 run without search
+            logger.warning(f"Full-text search unavailable, FTS5 could not be enabled: {str(e)}")
+    else:
+        logger.warning(f"Full-text search is not supported on {dialect}")
+    _backends.clear()
+
+def search_backend(connection=None):
+    """Return 'postgresql' or 'sqlite' when the database has a full-text index, else None."""
+    connection = connection or db.session.connection()
+    url = str(connection.engine.url)
+    if url not in _backends:
+        dialect = connection.dialect.name
+        table = {'postgresql': POSTGRES_TABLE, 'sqlite': SQLITE_TABLE}.get(dialect)
+        _backends[url] = dialect if table and inspect(connection).has_table(table) else None
+    return _backends[url]
+
+def searchable_text(content):
+    """Return a transcript's text without its [MM:SS] markers."""
+    return _timestamp_pattern.sub('', content)
+
+def index_transcript(connection, transcript_id, user_id, content):
+    """
+    Add one transcript to the full-text index.
+
+    Args:
+        connection: The connection of the transaction that saves the transcript
+        transcript_id: The transcript's ID
+        user_id: Owner of the transcript
+        content: The transcript text in "[MM:SS] text" lines
+    """
+    backend = search_backend(connection)
+    if backend == 'postgresql':
+        connection.execute(text(
+            f"INSERT INTO {POSTGRES_TABLE} (transcript_id, user_id, document) "
+            "VALUES (:id, :user_id, to_tsvector('english', :body)) ON CONFLICT (transcript_id) DO NOTHING"
+        ), {'id': transcript_id, 'user_id': user_id, 'body': searchable_text(content)})
+    elif backend == 'sqlite':
+        connection.execute(text(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, body, owner) VALUES (:id, :body, :owner)"
+        ), {'id': transcript_id, 'body': searchable_text(content), 'owner': f"u{user_id}"})
+
+def unindexed_transcript_ids(after_id, limit):
+    """Return IDs of transcripts missing from the index, in order, after a given ID."""
+    backend = search_backend()
+    if backend is None:
+        raise SearchUnavailableError("This database has no full-text index")
+    indexed = (f"SELECT transcript_id FROM {POSTGRES_TABLE}" if backend == 'postgresql'
+               else f"SELECT rowid FROM {SQLITE_TABLE}")
+    rows = db.session.execute(text(
+        f"SELECT id FROM transcript WHERE id > :after AND id NOT IN ({indexed}) ORDER BY id LIMIT :limit"
+    ), {'after': after_id, 'limit': limit})
+    return [row[0] for row in rows]
+
+def install_search_index():
+    """Add every transcript inserted from now on to the full-text index, in the inserting transaction."""
+    if not event.contains(Transcript, 'after_insert', _index_new_transcript):
+        event.listen(Transcript, 'after_insert', _index_new_transcript)
+
+def _index_new_transcript(mapper, connection, target):
+    index_transcript(connection, target.id, target.user_id, target.content)
+
+def fts5_query(query):
+    """
+    Turn a search box query into an FTS5 expression of quoted terms and phrases, all required.
+
+    Returns None when the query holds no searchable words.
+    """
+    parts = []
+    for phrase, word in _query_pattern.findall(query):
+        terms = tokenize(phrase or word)
+        if not terms:
+            continue
+        # Tokens are [a-z0-9'] only, so quoting them can't break the expression
+        parts.append('"' + ' '.join(terms) + '"')
+    return ' AND '.join(parts) or None
+
+@lru_cache(maxsize=65536)
+def stem(term):
+    """Strip common English suffixes so snippet lines match inflected query words."""
+    stemmed = _suffix_pattern.sub('', term)
+    if len(stemmed) < 3:
+        return term
+    # running -> runn -> run
+    if len(stemmed) > 3 and stemmed[-1] == stemmed[-2] and stemmed[-1] not in 'lsz':
+        stemmed = stemmed[:-1]
+    return stemmed
+
+def find_snippets(segments, terms, limit=SEARCH_SNIPPETS):
+    """
+    Pick the transcript lines that match the most query terms.
+
+    Args:
+        segments: The transcript's Segments
+        terms: Stemmed query terms
+        limit: Lines to return
+
+    Returns:
+        Up to limit {'start', 'timestamp', 'text'} dictionaries in time order
+    """
+    scored = []
+    for index in range(len(segments)):
+        line = segments.text_at(index)
+        lowered = line.lower()
+        # Stems are prefixes of the words they match, so most lines are ruled out without tokenizing
+        if not any(term in lowered for term in terms):
+            continue
+        matched = len(terms.intersection(stem(token) for token in tokenize(lowered)))
+        if matched:
+            scored.append((-matched, index, line))
+    scored.sort()
+    snippets = []
+    for _, index, line in sorted(scored[:limit], key=lambda item: item[1]):
+        start = segments.starts[index] / 1000
+        snippets.append({'start': start, 'timestamp': format_timestamp(int(start)).strip(), 'text': line})
+    return snippets
+
+def search_transcripts(user_id, query, page=1, limit=20):
+    """
+    Search a user's transcripts.
+
+    Args:
+        user_id: Owner of the transcripts to search
+        query: Words to find, all required; "quoted words" must appear together
+        page: 1-based page of results
+        limit: Results per page
+
+    Returns:
+        (hits, has_more): hits are dictionaries with the transcript's metadata,
+        its rank (higher is better) and its matching snippets, best first
+
+    Raises:
+        SearchUnavailableError: The database has no full-text index
+    """
+    backend = search_backend()
+    if backend is None:
+        raise SearchUnavailableError("Search is not available on this database")
+    page = min(max(page, 1), SEARCH_MAX_PAGES)
+    offset = (page - 1) * limit
+
+    if backend == 'postgresql':
+        rows = db.session.execute(text(
+            f"SELECT s.transcript_id, ts_rank_cd(s.document, q) AS rank "
+            f"FROM {POSTGRES_TABLE} s, websearch_to_tsquery('english', :query) q "
+            "WHERE s.user_id = :user_id AND s.document @@ q "
+            "ORDER BY rank DESC, s.transcript_id DESC LIMIT :limit OFFSET :offset"
+        ), {'query': query, 'user_id': user_id, 'limit': limit + 1, 'offset': offset}).all()
+    else:
+        expression = fts5_query(query)
+        if expression is None:
+            return [], False
+        # The owner column only filters, so it gets no weight in the ranking
+        rows = db.session.execute(text(
+            f"SELECT rowid, -bm25({SQLITE_TABLE}, 1.0, 0.0) AS rank FROM {SQLITE_TABLE} "
+            f"WHERE {SQLITE_TABLE} MATCH :match "
+            "ORDER BY rank DESC, rowid DESC LIMIT :limit OFFSET :offset"
+        ), {'match': f'owner:"u{user_id}" AND ({expression})', 'limit': limit + 1, 'offset': offset}).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], False
+
+    transcripts = {t.id: t for t in (Transcript.query
+                                     .options(undefer(Transcript.segments))
+                                     .filter(Transcript.id.in_([row[0] for row in rows]),
+                                             Transcript.user_id == user_id))}
+    terms = {stem(term) for term in tokenize(query)}
+    hits = []
+    for transcript_id, rank in rows:
+        transcript = transcripts.get(transcript_id)
+        if transcript is None:
+            continue
+        hits.append({
+            'id': transcript.id,
+            'video_url': transcript.video_url,
+            'video_id': transcript.video_id,
+            'created_at': transcript.created_at.isoformat() if transcript.created_at else None,
+            'rank': round(float(rank), 4),
+            'snippets': find_snippets(load_segments(transcript), terms)
+        })
+    return hits, has_more
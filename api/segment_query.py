@@ -0,0 +1,136 @@
+"""
+Time-window and keyword lookups within one transcript.
+
+Transcript pages load a long transcript a page of lines at a time instead
+of downloading it whole, and search it on the server. Both lookups use
+structures stored when the transcript was saved:
+
+    time        binary search on the packed segment start times
+                (api.segments)
+    keyword     the per-chunk postings of the chat index (api.retrieval)
+                name the chunks holding every query word; only the lines of
+                those chunks are read
+
+A line matches a keyword when every word of the keyword starts a word of
+the line, so results follow the search box while the user is still typing.
+Keywords made only of stopwords are not in the index and fall back to a
+substring scan of the requested window.
+"""
+import os
+from itertools import islice
+from api.segments import load_segments, format_timestamp
+from api.retrieval import load_index, tokenize
+
+# Segment page sizes, overridable from the environment
+SEGMENTS_PAGE_SIZE = int(os.environ.get('SEGMENTS_PAGE_SIZE', 200))
+SEGMENTS_MAX_PAGE_SIZE = int(os.environ.get('SEGMENTS_MAX_PAGE_SIZE', 1000))
+
+def segment_page_size(value):
+    """Clamp a requested number of lines, falling back to SEGMENTS_PAGE_SIZE."""
+    return min(max(value or SEGMENTS_PAGE_SIZE, 1), SEGMENTS_MAX_PAGE_SIZE)
+
+def candidate_chunks(index, terms):
+    """
+    Find the chunks that may hold a line matching every term.
+
+    Args:
+        index: The transcript's RetrievalIndex
+        terms: Query terms, each matching index words it is a prefix of
+
+    Returns:
+        Chunk ids in transcript order
+    """
+    chunks = None
+    for term in terms:
+        found = set()
+        for word, posting in index.postings.items():
+            if word.startswith(term):
+                found.update(posting[0::2])
+        chunks = found if chunks is None else chunks & found
+        if not chunks:
+            return []
+    return sorted(chunks)
+
+def _line_matches(line, terms):
+    lowered = line.lower()
+    # Most lines of a candidate chunk are ruled out without tokenizing
+    if not all(term in lowered for term in terms):
+        return False
+    words = tokenize(lowered)
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+def matching_indices(transcript, segments, keyword, lo, hi):
+    """
+    Yield the indices of the lines in lo..hi that match a keyword, in order.
+
+    Args:
+        transcript: The Transcript, whose chat index is loaded if the keyword has index terms
+        segments: The transcript's Segments
+        keyword: The text searched for
+        lo: First line index to consider
+        hi: Line index to stop before
+    """
+    terms = list(dict.fromkeys(tokenize(keyword)))
+    if not terms:
+        needle = keyword.lower()
+        for position in range(lo, hi):
+            if needle in segments.text_at(position).lower():
+                yield position
+        return
+
+    index = load_index(transcript, segments)
+    for chunk_id in candidate_chunks(index, terms):
+        chunk_lo, chunk_hi = index.chunks[chunk_id]
+        if chunk_hi <= lo:
+            continue
+        if chunk_lo >= hi:
+            break
+        for position in range(max(chunk_lo, lo), min(chunk_hi, hi)):
+            if _line_matches(segments.text_at(position), terms):
+                yield position
+
+def query_segments(transcript, from_seconds=None, to_seconds=None, keyword=None, from_index=None,
+                   limit=SEGMENTS_PAGE_SIZE):
+    """
+    Return one page of a transcript's lines within a time window, optionally matching a keyword.
+
+    Args:
+        transcript: The Transcript
+        from_seconds: Start of the window, or None for the beginning
+        to_seconds: End of the window, or None for the end
+        keyword: Text the lines must match, or None for every line
+        from_index: Index of the first line to return, continuing an earlier page
+        limit: Lines per page
+
+    Returns:
+        Dictionary with the transcript's total_segments and duration, the
+        page's segments ({'index', 'start', 'duration', 'timestamp', 'text'})
+        and next_index, the from_index of the next page, or None on the last page
+    """
+    segments = load_segments(transcript)
+    count = len(segments)
+    duration = (segments.starts[-1] + segments.durations[-1]) / 1000 if count else 0
+
+    lo, hi = 0, count
+    if from_seconds is not None or to_seconds is not None:
+        lo, hi = segments.window(from_seconds or 0, duration if to_seconds is None else to_seconds)
+    # Continuing by line index rather than time, since captions often overlap or share a start
+    if from_index is not None:
+        lo = max(lo, from_index)
+
+    positions = matching_indices(transcript, segments, keyword, lo, hi) if keyword else iter(range(lo, hi))
+    # One line more than the page tells whether another page follows
+    page = list(islice(positions, limit + 1))
+    next_index = page[limit] if len(page) > limit else None
+
+    lines = []
+    for position in page[:limit]:
+        start_ms = segments.starts[position]
+        lines.append({
+            'index': position,
+            'start': start_ms / 1000,
+            'duration': segments.durations[position] / 1000,
+            'timestamp': format_timestamp(start_ms // 1000).strip(),
+            'text': segments.text_at(position)
+        })
+    return {'total_segments': count, 'duration': duration, 'segments': lines, 'next_index': next_index}
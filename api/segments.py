@@ -0,0 +1,208 @@
+"""
+Compact structured storage for transcript segments.
+
+A transcript is stored as parallel arrays of start times, durations and
+byte offsets (milliseconds, unsigned 32-bit, little-endian) followed by one
+UTF-8 text buffer. Unpacking copies the arrays without parsing any text,
+time lookups are binary searches on the start array, and the "[MM:SS] text"
+format kept in Transcript.content is rendered on demand.
+"""
+import re
+import sys
+import struct
+from array import array
+from bisect import bisect_right
+
+SEGMENTS_MAGIC = b'TSG1'
+_header = struct.Struct('<4sI')
+_content_line_pattern = re.compile(r'^\[(\d+):(\d{2})\] ?(.*)$')
+_time_part_pattern = re.compile(r'[0-9]+')
+_seconds_pattern = re.compile(r'[0-9]+(\.[0-9]+)?')
+
+def format_timestamp(seconds):
+    """Format whole seconds as the "[MM:SS] " prefix used in transcript text."""
+    minutes = seconds // 60
+    seconds = seconds % 60
+    return f"[{minutes:02d}:{seconds:02d}] "
+
+def parse_timestamp(value):
+    """
+    Parse a time given as seconds ("754.5") or as "MM:SS" / "HH:MM:SS", brackets allowed.
+
+    Every component must be plain digits; only the seconds may have a fraction.
+
+    Returns:
+        The time in seconds, or None if the value is missing or malformed
+    """
+    if not value:
+        return None
+    parts = value.strip().strip('[]').split(':')
+    if len(parts) > 3:
+        return None
+    if not all(_time_part_pattern.fullmatch(part) for part in parts[:-1]):
+        return None
+    if not _seconds_pattern.fullmatch(parts[-1]):
+        return None
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def _uint32_array(values=()):
+    # 'I' is a 4-byte unsigned int on every platform we deploy to
+    return array('I', values)
+
+class Segments:
+    """
+    Immutable sequence of transcript segments backed by parallel arrays.
+
+    Args:
+        starts: Array of start times in milliseconds, sorted ascending
+        durations: Array of durations in milliseconds
+        offsets: Array of len(starts) + 1 byte offsets into text
+        text: UTF-8 encoded segment texts, concatenated
+    """
+    __slots__ = ('starts', 'durations', 'offsets', 'text')
+
+    def __init__(self, starts, durations, offsets, text):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build segments from {'text', 'start', 'duration'} dictionaries."""
+        starts = _uint32_array()
+        durations = _uint32_array()
+        offsets = _uint32_array([0])
+        parts = []
+        position = 0
+        for entry in sorted(entries, key=lambda entry: entry['start']):
+            starts.append(max(0, int(entry['start'] * 1000)))
+            durations.append(max(0, int((entry.get('duration') or 0) * 1000)))
+            encoded = entry['text'].encode('utf-8')
+            parts.append(encoded)
+            position += len(encoded)
+            offsets.append(position)
+        return cls(starts, durations, offsets, b''.join(parts))
+
+    @classmethod
+    def from_content(cls, content):
+        """
+        Parse "[MM:SS] text" transcript content, for rows stored before segments existed.
+
+        Durations are inferred from the next segment's start.
+        """
+        entries = []
+        for line in content.splitlines():
+            match = _content_line_pattern.match(line)
+            if match:
+                minutes, seconds, text = match.groups()
+                entries.append({'start': int(minutes) * 60 + int(seconds), 'duration': 0, 'text': text})
+            elif entries:
+                entries[-1]['text'] += '\n' + line
+            elif line:
+                entries.append({'start': 0, 'duration': 0, 'text': line})
+
+        for current, following in zip(entries, entries[1:]):
+            current['duration'] = following['start'] - current['start']
+        return cls.from_entries(entries)
+
+    @classmethod
+    def unpack(cls, data):
+        """Load segments from bytes produced by pack()."""
+        data = bytes(data)
+        magic, count = _header.unpack_from(data, 0)
+        if magic != SEGMENTS_MAGIC:
+            raise ValueError("Not a packed transcript segments blob")
+
+        position = _header.size
+        arrays = []
+        for length in (count, count, count + 1):
+            arr = _uint32_array()
+            arr.frombytes(data[position:position + length * 4])
+            if sys.byteorder == 'big':
+                arr.byteswap()
+            arrays.append(arr)
+            position += length * 4
+
+        starts, durations, offsets = arrays
+        return cls(starts, durations, offsets, data[position:])
+
+    def pack(self):
+        """Serialize the segments to bytes for the Transcript.segments column."""
+        chunks = [_header.pack(SEGMENTS_MAGIC, len(self))]
+        for arr in (self.starts, self.durations, self.offsets):
+            if sys.byteorder == 'big':
+                arr = array(arr.typecode, arr)
+                arr.byteswap()
+            chunks.append(arr.tobytes())
+        chunks.append(self.text)
+        return b''.join(chunks)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return {
+            'start': self.starts[index] / 1000,
+            'duration': self.durations[index] / 1000,
+            'text': self.text_at(index)
+        }
+
+    def text_at(self, index):
+        """Return the text of one segment."""
+        return self.text[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def index_at(self, seconds):
+        """Return the index of the segment playing at the given time."""
+        return max(0, bisect_right(self.starts, int(seconds * 1000)) - 1)
+
+    def window(self, from_seconds, to_seconds):
+        """
+        Find the segments overlapping a time window.
+
+        Args:
+            from_seconds: Start of the window
+            to_seconds: End of the window
+
+        Returns:
+            (lo, hi) slice bounds into the segments
+        """
+        from_ms = int(from_seconds * 1000)
+        to_ms = int(to_seconds * 1000)
+        lo = bisect_right(self.starts, from_ms) - 1
+        if lo < 0:
+            lo = 0
+        elif self.starts[lo] + self.durations[lo] <= from_ms and self.starts[lo] < from_ms:
+            lo += 1
+        hi = bisect_right(self.starts, to_ms)
+        return lo, max(lo, hi)
+
+    def to_entries(self, lo=0, hi=None):
+        """Return segments lo..hi as {'text', 'start', 'duration'} dictionaries."""
+        hi = len(self) if hi is None else hi
+        return [self[index] for index in range(lo, hi)]
+
+    def render(self, lo=0, hi=None):
+        """Render segments lo..hi in the "[MM:SS] text" transcript format."""
+        hi = len(self) if hi is None else hi
+        return "\n".join(
+            f"{format_timestamp(self.starts[index] // 1000)}{self.text_at(index)}"
+            for index in range(lo, hi)
+        )
+
+def load_segments(transcript):
+    """
+    Return the Segments for a Transcript row.
+
+    Rows saved before segments were stored fall back to parsing the content.
+    """
+    if transcript.segments:
+        return Segments.unpack(transcript.segments)
+    return Segments.from_content(transcript.content)
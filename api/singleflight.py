@@ -0,0 +1,243 @@
+"""
+Single-flight coalescing of concurrent upstream calls.
+
+When many requests need the same transcript or summary at once, only one
+of them calls YouTube or Mistral and the rest share its result. Threads in
+one process coalesce on an in-memory flight. Processes coalesce on a
+FlightLease row: the process holding the lease runs the call and leaves the
+JSON result on the row for the others to pick up. A holder renews its
+lease while the call runs, so a short lease is enough to notice a holder
+that died without cutting off a slow one that is still working.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from api.models import db, FlightLease
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Lease tuning, overridable from the environment
+FLIGHT_POLL_INTERVAL = float(os.environ.get('FLIGHT_POLL_INTERVAL', 0.25))
+FLIGHT_RESULT_TTL = int(os.environ.get('FLIGHT_RESULT_TTL', 30))
+
+class _Call:
+    """An in-progress call that other threads can wait on."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution per process.
+
+    The first caller for a key runs fn(); callers arriving while it runs
+    block and receive the same result, or the same exception.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn):
+        """
+        Run fn() unless a call for key is already in flight, then return its result.
+
+        Args:
+            key: Identifies calls that can share a result
+            fn: Zero-argument callable doing the work
+
+        Returns:
+            The result of the single execution of fn()
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Return how many calls ran and how many were coalesced onto them."""
+        with self._lock:
+            return {'leaders': self.leaders, 'followers': self.followers, 'in_flight': len(self._calls)}
+
+class LeasedSingleFlight(SingleFlight):
+    """
+    Single-flight that also coalesces across worker processes.
+
+    Results must be JSON serializable. If the lease holder fails, its row is
+    removed and the waiting processes race to run the call themselves. If the
+    database is unavailable the call simply runs uncoordinated.
+
+    The holder renews its lease every third of lease_seconds until the call
+    has run for max_seconds, after which the lease lapses so a holder stuck
+    in a call is eventually taken over.
+
+    Args:
+        lease_seconds: How long a holder may go unrenewed before others assume it died
+        max_seconds: How long a holder keeps renewing its lease; by default
+            it does not, and the lease lasts lease_seconds
+    """
+    def __init__(self, lease_seconds, max_seconds=None):
+        super().__init__()
+        self.lease_seconds = lease_seconds
+        self.max_seconds = max(lease_seconds, max_seconds or lease_seconds)
+
+    @property
+    def holder(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def do(self, key, fn):
+        return super().do(key, lambda: self._run_leased(key, fn))
+
+    def _run_leased(self, key, fn):
+        # A live holder renews its lease for up to max_seconds
+        deadline = time.monotonic() + self.max_seconds + self.lease_seconds * 2
+        while time.monotonic() < deadline:
+            try:
+                state, result = self._try_acquire(key)
+            except Exception as e:
+                logger.error(f"Flight lease unavailable for {key}: {str(e)}")
+                db.session.rollback()
+                return fn()
+
+            if state == 'acquired':
+                return self._run_as_holder(key, fn)
+            if state == 'finished':
+                return result
+            time.sleep(FLIGHT_POLL_INTERVAL)
+
+        logger.warning(f"Flight lease for {key} never cleared, running uncoordinated")
+        return fn()
+
+    def _try_acquire(self, key):
+        """Return ('acquired', None), ('finished', result) or ('waiting', None)."""
+        now = datetime.utcnow()
+        try:
+            row = FlightLease.query.filter_by(key=key).populate_existing().first()
+
+            if row is not None and row.finished_at is not None:
+                if row.finished_at >= now - timedelta(seconds=FLIGHT_RESULT_TTL):
+                    result = json.loads(row.result)
+                    db.session.commit()
+                    return 'finished', result
+
+            if row is not None and row.finished_at is None and row.expires_at > now:
+                # End the read transaction so the next poll sees fresh data
+                db.session.commit()
+                return 'waiting', None
+
+            expires_at = now + timedelta(seconds=self.lease_seconds)
+            if row is None:
+                db.session.add(FlightLease(key=key, holder=self.holder, expires_at=expires_at))
+            else:
+                # Stale result or a holder that died: take the lease over
+                taken = (FlightLease.query
+                         .filter(FlightLease.id == row.id,
+                                 FlightLease.holder == row.holder,
+                                 FlightLease.expires_at == row.expires_at)
+                         .update({'holder': self.holder, 'expires_at': expires_at,
+                                  'finished_at': None, 'result': None},
+                                 synchronize_session=False))
+                if not taken:
+                    db.session.commit()
+                    return 'waiting', None
+
+            db.session.commit()
+            return 'acquired', None
+        except IntegrityError:
+            # Another process inserted the lease first
+            db.session.rollback()
+            return 'waiting', None
+
+    @contextmanager
+    def _renewing(self, key):
+        """Keep extending the lease on key from a background thread until max_seconds have passed."""
+        if self.max_seconds <= self.lease_seconds:
+            yield
+            return
+        engine = db.engine
+        holder = self.holder
+        interval = self.lease_seconds / 3
+        stop_at = time.monotonic() + self.max_seconds - self.lease_seconds
+        stopped = threading.Event()
+
+        def renew():
+            while not stopped.wait(interval) and time.monotonic() < stop_at:
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(update(FlightLease)
+                                           .where(FlightLease.key == key, FlightLease.holder == holder,
+                                                  FlightLease.finished_at.is_(None))
+                                           .values(expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds)))
+                except Exception as e:
+                    logger.warning(f"Could not renew the flight lease for {key}: {str(e)}")
+
+        heartbeat = threading.Thread(target=renew, name=f"flight-lease-{key}", daemon=True)
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            heartbeat.join()
+
+    def _run_as_holder(self, key, fn):
+        try:
+            with self._renewing(key):
+                result = fn()
+        except Exception:
+            self._release(key)
+            raise
+
+        try:
+            now = datetime.utcnow()
+            FlightLease.query.filter_by(key=key, holder=self.holder).update(
+                {'finished_at': now, 'result': json.dumps(result)},
+                synchronize_session=False
+            )
+            # Results are only useful to callers already waiting, drop old ones
+            cutoff = now - timedelta(seconds=FLIGHT_RESULT_TTL)
+            FlightLease.query.filter(FlightLease.finished_at < cutoff).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error publishing flight result for {key}: {str(e)}")
+            db.session.rollback()
+        return result
+
+    def _release(self, key):
+        try:
+            FlightLease.query.filter_by(key=key, holder=self.holder).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error releasing flight lease for {key}: {str(e)}")
+            db.session.rollback()
@@ -0,0 +1,268 @@
+"""
+Transcript sources for TranscriptHub.
+
+A TranscriptSource lists a video's caption tracks and downloads one of them.
+Every upstream call goes through the same policy: a token bucket shared by
+all threads of the process, a cap on concurrent calls, and jittered
+exponential retry on transient failures. YouTubeSource talks to YouTube;
+FixtureSource reads JSON files so extraction can be benchmarked and
+exercised without network access.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+import requests
+from youtube_transcript_api import YouTubeTranscriptApi
+from youtube_transcript_api import _errors as transcript_errors
+from youtube_transcript_api._errors import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upstream call policy, overridable from the environment
+SOURCE_RATE_PER_SECOND = float(os.environ.get('SOURCE_RATE_PER_SECOND', 5))
+SOURCE_BURST = int(os.environ.get('SOURCE_BURST', 10))
+SOURCE_MAX_CONCURRENCY = int(os.environ.get('SOURCE_MAX_CONCURRENCY', 4))
+SOURCE_MAX_ATTEMPTS = int(os.environ.get('SOURCE_MAX_ATTEMPTS', 3))
+SOURCE_RETRY_BASE_SECONDS = float(os.environ.get('SOURCE_RETRY_BASE_SECONDS', 0.5))
+
+# Failures worth retrying. The library renamed its throttling errors
+# between 0.6 (TooManyRequests) and 1.x (RequestBlocked, IpBlocked).
+TRANSIENT_ERRORS = tuple(
+    getattr(transcript_errors, name)
+    for name in ('TooManyRequests', 'RequestBlocked', 'IpBlocked', 'YouTubeRequestFailed')
+    if hasattr(transcript_errors, name)
+) + (requests.ConnectionError, requests.Timeout)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Args:
+        rate: Tokens added per second; 0 disables limiting
+        burst: Maximum number of tokens that can accumulate
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+class Track:
+    """
+    A caption track available for a video.
+
+    Args:
+        video_id: The YouTube video ID
+        language_code: The track's language code, e.g. "en" or "en-GB"
+        is_generated: True for automatically generated captions
+        handle: Source-specific object used to download the track
+    """
+    __slots__ = ('video_id', 'language_code', 'is_generated', 'handle')
+
+    def __init__(self, video_id, language_code, is_generated, handle=None):
+        self.video_id = video_id
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self.handle = handle
+
+class TranscriptSource:
+    """
+    Base class applying rate limiting, a concurrency cap and retry to upstream calls.
+
+    Subclasses implement _list_tracks(video_id) and _fetch_track(track).
+
+    Args:
+        rate: Upstream calls allowed per second across all threads
+        burst: Calls allowed back to back before the rate applies
+        max_concurrency: Maximum number of upstream calls in flight
+        max_attempts: Attempts per call, including the first
+        retry_base: Delay in seconds before the first retry, doubled after each
+    """
+    def __init__(self, rate=SOURCE_RATE_PER_SECOND, burst=SOURCE_BURST,
+                 max_concurrency=SOURCE_MAX_CONCURRENCY, max_attempts=SOURCE_MAX_ATTEMPTS,
+                 retry_base=SOURCE_RETRY_BASE_SECONDS):
+        self.limiter = TokenBucket(rate, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def list_tracks(self, video_id):
+        """
+        List the caption tracks available for a video.
+
+        Args:
+            video_id: The YouTube video ID
+
+        Returns:
+            List of Track objects
+        """
+        return self._call(self._list_tracks, video_id)
+
+    def fetch_track(self, track):
+        """
+        Download a caption track.
+
+        Args:
+            track: A Track returned by list_tracks()
+
+        Returns:
+            List of {'text', 'start', 'duration'} dictionaries
+        """
+        return self._call(self._fetch_track, track)
+
+    def stats(self):
+        """Return call, retry and rate limiter counters as a dictionary."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures,
+                'rate_limit_wait_seconds': round(self.limiter.waited_seconds, 3),
+                'max_concurrency': self.max_concurrency
+            }
+
+    def _list_tracks(self, video_id):
+        raise NotImplementedError
+
+    def _fetch_track(self, track):
+        raise NotImplementedError
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _call(self, fn, *args):
+        attempt = 1
+        while True:
+            self.limiter.acquire()
+            try:
+                with self._slots:
+                    self._count('calls')
+                    return fn(*args)
+            except TRANSIENT_ERRORS as e:
+                if attempt >= self.max_attempts:
+                    self._count('failures')
+                    raise
+                delay = self.retry_base * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+                logger.warning(f"Transient transcript source error, retrying in {delay:.2f}s: {type(e).__name__}")
+                self._count('retries')
+                attempt += 1
+                time.sleep(delay)
+
+class YouTubeSource(TranscriptSource):
+    """Transcript source backed by youtube-transcript-api, 0.6 or 1.x."""
+
+    def _list_tracks(self, video_id):
+        # youtube-transcript-api 1.x replaced the static helpers with instance methods
+        if hasattr(YouTubeTranscriptApi, 'list_transcripts'):
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        else:
+            transcript_list = YouTubeTranscriptApi().list(video_id)
+        return [
+            Track(video_id, transcript.language_code, transcript.is_generated, transcript)
+            for transcript in transcript_list
+        ]
+
+    def _fetch_track(self, track):
+        fetched = track.handle.fetch()
+        # 0.6 returns dictionaries, 1.x a FetchedTranscript of snippets
+        if hasattr(fetched, 'to_raw_data'):
+            fetched = fetched.to_raw_data()
+        return [
+            {'text': entry['text'], 'start': entry['start'], 'duration': entry.get('duration', 0)}
+            for entry in fetched
+        ]
+
+class FixtureSource(TranscriptSource):
+    """
+    Transcript source reading <directory>/<video_id>.json instead of YouTube.
+
+    A fixture is either {"tracks": [{"language_code", "is_generated", "entries"}]}
+    or {"error": "no_transcript" | "disabled" | "unavailable"}. A missing file
+    behaves like a video without transcripts.
+
+    Args:
+        directory: Directory holding the fixture files
+        latency: Seconds each call sleeps, to stand in for network time
+        **policy: TranscriptSource rate, concurrency and retry settings
+    """
+    def __init__(self, directory, latency=0.0, **policy):
+        super().__init__(**policy)
+        self.directory = directory
+        self.latency = latency
+
+    def _load(self, video_id):
+        if self.latency:
+            time.sleep(self.latency)
+        path = os.path.join(self.directory, f"{os.path.basename(video_id)}.json")
+        try:
+            with open(path, encoding='utf-8') as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            raise NoTranscriptFound(video_id, [], None)
+
+        error = fixture.get('error')
+        if error == 'disabled':
+            raise TranscriptsDisabled(video_id)
+        if error == 'unavailable':
+            raise VideoUnavailable(video_id)
+        if error or not fixture.get('tracks'):
+            raise NoTranscriptFound(video_id, [], None)
+        return fixture['tracks']
+
+    def _list_tracks(self, video_id):
+        return [
+            Track(video_id, track['language_code'], track.get('is_generated', False), index)
+            for index, track in enumerate(self._load(video_id))
+        ]
+
+    def _fetch_track(self, track):
+        entries = self._load(track.video_id)[track.handle]['entries']
+        return [
+            {'text': entry['text'], 'start': entry['start'], 'duration': entry.get('duration', 0)}
+            for entry in entries
+        ]
+
+def create_source():
+    """
+    Build the transcript source selected by TRANSCRIPT_SOURCE.
+
+    Returns:
+        A FixtureSource when TRANSCRIPT_SOURCE=fixture, otherwise a YouTubeSource
+    """
+    if os.environ.get('TRANSCRIPT_SOURCE', 'youtube') == 'fixture':
+        return FixtureSource(
+            os.environ.get('TRANSCRIPT_FIXTURE_DIR', 'fixtures/transcripts'),
+            latency=float(os.environ.get('TRANSCRIPT_FIXTURE_LATENCY_MS', 0)) / 1000
+        )
+    return YouTubeSource()
+
+# Shared instance used for every extraction in this process
+transcript_source = create_source()
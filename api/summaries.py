@@ -0,0 +1,251 @@
+"""
+Transcript summaries for TranscriptHub.
+
+Wraps summarize_transcript() so that each transcript content is summarized
+once per model: summaries are stored by content hash and reused for every
+user who extracts the same video, and concurrent requests to summarize the
+same content share one model call.
+
+Transcripts above a token threshold are summarized map-reduce style: split
+on segment boundaries into token-budgeted parts, each part summarized in
+parallel, then the part summaries combined into the final summary.
+"""
+import os
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from api.models import db, Summary
+from api.segments import Segments, load_segments, format_timestamp
+from api.llm import estimate_tokens, CHARS_PER_TOKEN
+from api.utils import summarize_transcript, summarize_transcript_part, combine_transcript_summaries
+from api.singleflight import LeasedSingleFlight
+from api.telemetry import carry_attribution
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds an in-progress summary's lease lasts unrenewed before another worker takes it over,
+# and how long its worker keeps renewing it
+SUMMARY_LEASE_SECONDS = int(os.environ.get('SUMMARY_LEASE_SECONDS', 60))
+SUMMARY_MAX_SECONDS = int(os.environ.get('SUMMARY_MAX_SECONDS', 1200))
+
+SUMMARY_MODEL = "mistral-large-latest"
+
+# Chunked summarization, overridable from the environment
+SUMMARY_CHUNK_THRESHOLD_TOKENS = int(os.environ.get('SUMMARY_CHUNK_THRESHOLD_TOKENS', 12000))
+SUMMARY_CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', 6000))
+SUMMARY_CONCURRENCY = int(os.environ.get('SUMMARY_CONCURRENCY', 4))
+
+class SummaryError(Exception):
+    """Raised inside a flight so a failed summary is never shared as a result."""
+
+# Coalesces concurrent summaries of the same content
+summary_flight = LeasedSingleFlight(SUMMARY_LEASE_SECONDS, SUMMARY_MAX_SECONDS)
+
+def content_hash(content):
+    """Return the SHA-256 hex digest identifying a transcript's content."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def split_transcript(segments, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """
+    Split a transcript into parts of at most max_tokens, on segment boundaries.
+
+    A single segment longer than the budget becomes a part of its own.
+
+    Args:
+        segments: The transcript's Segments
+        max_tokens: Token budget per part
+
+    Returns:
+        List of "[MM:SS] text" transcript content strings, in order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    parts = []
+    lo = 0
+    size = 0
+    for index in range(len(segments)):
+        # The rendered line in characters, as the token estimate counts them, plus its newline
+        segment_size = len(format_timestamp(segments.starts[index] // 1000)) + len(segments.text_at(index)) + 1
+        if size and size + segment_size > max_chars:
+            parts.append(segments.render(lo, index))
+            lo, size = index, 0
+        size += segment_size
+    if lo < len(segments):
+        parts.append(segments.render(lo, len(segments)))
+    return parts
+
+def _group_by_budget(texts, max_tokens):
+    groups = [[]]
+    size = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if groups[-1] and size + tokens > max_tokens:
+            groups.append([])
+            size = 0
+        groups[-1].append(text)
+        size += tokens
+    return groups
+
+def _checked(summary):
+    if summary.startswith('Error:'):
+        raise SummaryError(summary)
+    return summary
+
+def summarize_chunked(segments, model=SUMMARY_MODEL, max_tokens=SUMMARY_CHUNK_TOKENS,
+                      concurrency=SUMMARY_CONCURRENCY):
+    """
+    Summarize a long transcript by summarizing its parts in parallel, then combining them.
+
+    If the part summaries together are still over the budget they are
+    combined in rounds, a budget-sized group at a time (or in pairs, when
+    no two fit the budget together), before the final call.
+
+    Args:
+        segments: The Segments of the transcript to summarize
+        model: The Mistral model to use
+        max_tokens: Token budget per model call
+        concurrency: Maximum number of model calls running at once
+
+    Returns:
+        The summary
+
+    Raises:
+        SummaryError: A part could not be summarized
+    """
+    parts = split_transcript(segments, max_tokens)
+    if len(parts) == 1:
+        return _checked(summarize_transcript(parts[0], model))
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        # Model calls in the pool threads are still made for the requesting user
+        summaries = list(executor.map(
+            carry_attribution(
+                lambda numbered: _checked(summarize_transcript_part(numbered[1], numbered[0], len(parts), model))
+            ),
+            enumerate(parts, 1)
+        ))
+
+        # Combine until the summaries fit one call. When every summary is over
+        # half the budget no group holds two, so neighbours are paired anyway:
+        # each round then merges at least two summaries and the count shrinks
+        groups = _group_by_budget(summaries, max_tokens)
+        while len(groups) > 1:
+            if all(len(group) == 1 for group in groups):
+                groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+            summaries = list(executor.map(
+                carry_attribution(lambda group: _checked(combine_transcript_summaries(group, final=False, model=model))),
+                groups
+            ))
+            groups = _group_by_budget(summaries, max_tokens)
+
+    return _checked(combine_transcript_summaries(summaries, final=True, model=model))
+
+def summarize_content(transcript_content, model=SUMMARY_MODEL, segments=None):
+    """
+    Summarize a transcript in one call, or chunked when it is above the threshold.
+
+    Args:
+        transcript_content: The transcript text to summarize
+        model: The Mistral model to use
+        segments: The transcript's stored Segments, if the caller has them;
+            otherwise they are parsed from the content when chunking
+
+    Returns:
+        The summary
+
+    Raises:
+        SummaryError: The model call failed
+    """
+    if estimate_tokens(transcript_content) > SUMMARY_CHUNK_THRESHOLD_TOKENS:
+        return summarize_chunked(segments or Segments.from_content(transcript_content), model)
+    return _checked(summarize_transcript(transcript_content, model))
+
+def find_summary(digest, model=SUMMARY_MODEL):
+    """
+    Look up a stored summary.
+
+    Args:
+        digest: content_hash() of the transcript content
+        model: The Mistral model the summary was made with
+
+    Returns:
+        The summary text, or None if this content has not been summarized
+    """
+    try:
+        row = (Summary.query
+               .with_entities(Summary.content)
+               .filter_by(content_hash=digest, model=model)
+               .first())
+    except Exception as e:
+        logger.error(f"Error reading stored summary: {str(e)}")
+        db.session.rollback()
+        return None
+    return row.content if row else None
+
+def store_summary(digest, model, summary):
+    """Save a summary for reuse; a concurrent save of the same summary is not an error."""
+    try:
+        db.session.add(Summary(content_hash=digest, model=model, content=summary))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+    except Exception as e:
+        logger.error(f"Error storing summary: {str(e)}")
+        db.session.rollback()
+
+def get_summary(transcript_content, model=SUMMARY_MODEL, digest=None, segments=None):
+    """
+    Summarize a transcript, reusing a stored summary of identical content.
+
+    Args:
+        transcript_content: The transcript text to summarize
+        model: The Mistral model to use
+        digest: content_hash() of transcript_content, if the caller already has it
+        segments: The transcript's stored Segments, if the caller has them
+
+    Returns:
+        The summary, or an "Error: ..." message like summarize_transcript()
+    """
+    digest = digest or content_hash(transcript_content)
+    summary = find_summary(digest, model)
+    if summary is not None:
+        return summary
+
+    def summarize():
+        # Another worker may have finished the summary while we waited for the lease
+        stored = find_summary(digest, model)
+        if stored is not None:
+            return stored
+        summary = summarize_content(transcript_content, model, segments)
+        store_summary(digest, model, summary)
+        return summary
+
+    key = f"summary:{model}:{digest}"
+    try:
+        return summary_flight.do(key, summarize)
+    except SummaryError as e:
+        return str(e)
+
+def get_transcript_summary(transcript, model=SUMMARY_MODEL):
+    """
+    Return the summary for a Transcript row, generating it if needed.
+
+    The stored summary is found by the row's content hash without loading
+    the transcript body; rows saved before hashes existed get one here.
+
+    Args:
+        transcript: The Transcript
+        model: The Mistral model to use
+
+    Returns:
+        The summary, or an "Error: ..." message like summarize_transcript()
+    """
+    if transcript.content_hash:
+        summary = find_summary(transcript.content_hash, model)
+        if summary is not None:
+            return summary
+    else:
+        transcript.content_hash = content_hash(transcript.content)
+        db.session.commit()
+    return get_summary(transcript.content, model, transcript.content_hash, load_segments(transcript))
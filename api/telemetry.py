@@ -0,0 +1,124 @@
+"""
+Telemetry for model calls.
+
+install_telemetry() makes the shared api.llm client report every call it
+finishes: the call is logged as one structured JSON line and stored as an
+LLMCall row, attributed to the user it was made for. usage_report() sums
+those rows per day for the usage endpoint.
+"""
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import func, case
+from api.models import db, LLMCall
+from api.llm import llm_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# User that model calls in this context are made for, when not the request's user
+_call_user = ContextVar('llm_call_user', default=None)
+
+def call_user_id():
+    """Return the ID of the user model calls are currently attributed to, or None."""
+    user_id = _call_user.get()
+    if user_id is None and has_request_context():
+        try:
+            if current_user.is_authenticated:
+                user_id = current_user.id
+        except Exception as e:
+            # e.g. the user row was detached when the request's session closed
+            logger.warning(f"Could not attribute LLM call to the request's user: {str(e)}")
+    return user_id
+
+@contextmanager
+def attributed_to(user_id):
+    """Attribute model calls made inside the block to a user, e.g. in a background job."""
+    token = _call_user.set(user_id)
+    try:
+        yield
+    finally:
+        _call_user.reset(token)
+
+def carry_attribution(function):
+    """
+    Wrap a function to run in another thread with the caller's attribution.
+
+    Args:
+        function: The function to hand to a thread pool
+
+    Returns:
+        A wrapper that makes its calls for the user current at wrapping time
+    """
+    user_id = call_user_id()
+
+    def run(*args, **kwargs):
+        with attributed_to(user_id):
+            return function(*args, **kwargs)
+    return run
+
+def install_telemetry(app, client=llm_client):
+    """
+    Record every call finished by a client.
+
+    Args:
+        app: The Flask app, for database access from any thread
+        client: The api.llm.LLMClient to instrument
+    """
+    def record_call(record):
+        record['user_id'] = call_user_id()
+        record.pop('budget', None)
+        logger.info(f"llm_call {json.dumps(record, sort_keys=True)}")
+        try:
+            # A separate app context gets its own session, leaving the caller's transaction alone
+            with app.app_context():
+                db.session.add(LLMCall(**record))
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error storing LLM call telemetry: {str(e)}")
+
+    client.recorder = record_call
+
+def usage_report(user_id, days=7):
+    """
+    Sum a user's model calls per day and model.
+
+    Args:
+        user_id: The user to report on
+        days: Number of days back to include, today included
+
+    Returns:
+        List of dictionaries, newest day first
+    """
+    since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    day = func.date(LLMCall.created_at)
+    rows = (
+        db.session.query(
+            day.label('day'),
+            LLMCall.model,
+            func.count(LLMCall.id),
+            func.sum(LLMCall.prompt_tokens),
+            func.sum(LLMCall.completion_tokens),
+            func.sum(case((LLMCall.outcome == 'ok', 0), else_=1)),
+            func.sum(case((LLMCall.attempts > 1, LLMCall.attempts - 1), else_=0)),
+            func.avg(LLMCall.latency_ms)
+        )
+        .filter(LLMCall.user_id == user_id, LLMCall.created_at >= since)
+        .group_by(day, LLMCall.model)
+        .order_by(day.desc(), LLMCall.model)
+        .all()
+    )
+    return [{
+        'day': str(row[0]),
+        'model': row[1],
+        'calls': row[2],
+        'prompt_tokens': int(row[3] or 0),
+        'completion_tokens': int(row[4] or 0),
+        'failed_calls': int(row[5] or 0),
+        'retries': int(row[6] or 0),
+        'avg_latency_ms': round(row[7] or 0)
+    } for row in rows]
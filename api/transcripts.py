@@ -0,0 +1,367 @@
+"""
+Transcript fetching and formatting helpers for TranscriptHub.
+"""
+import os
+import re
+import logging
+import requests
+from urllib.parse import urlsplit, parse_qs
+from youtube_transcript_api._errors import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+from api.models import Transcript
+from api.cache import transcript_cache, negative_cache, manifest_cache
+from api.segments import Segments
+from api import sources
+from api.singleflight import LeasedSingleFlight
+from api.summaries import content_hash
+from api.retrieval import RetrievalIndex
+from api.pagination import keyset_page, PAGE_SIZE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default caption language preference, most preferred first
+TRANSCRIPT_LANGUAGES = [code.strip() for code in os.environ.get('TRANSCRIPT_LANGUAGES', 'en').split(',') if code.strip()]
+
+# Seconds another worker waits on an in-progress fetch before taking it over
+FETCH_LEASE_SECONDS = int(os.environ.get('FETCH_LEASE_SECONDS', 60))
+
+video_id_pattern = re.compile(r'^[A-Za-z0-9_-]{11}$')
+youtube_hosts = frozenset({
+    'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+    'youtube-nocookie.com', 'www.youtube-nocookie.com'
+})
+# Path prefixes followed by the video ID, e.g. /shorts/VIDEO_ID
+youtube_id_paths = frozenset({'embed', 'v', 'e', 'shorts', 'live'})
+language_code_pattern = re.compile(r'^[A-Za-z]{2,3}(-[A-Za-z0-9]{2,8})?$')
+playlist_url = "https://www.youtube.com/playlist"
+playlist_video_pattern = re.compile(r'"videoId":"([A-Za-z0-9_-]{11})"')
+
+# Coalesces concurrent fetches of the same video
+fetch_flight = LeasedSingleFlight(FETCH_LEASE_SECONDS)
+
+def extract_video_id(url):
+    """
+    Extract the YouTube video ID from various YouTube URL formats.
+
+    Supports:
+    - Standard and mobile URLs: https://www.youtube.com/watch?v=VIDEO_ID, https://m.youtube.com/watch?v=VIDEO_ID
+    - Short URLs: https://youtu.be/VIDEO_ID
+    - Embed and legacy URLs: /embed/VIDEO_ID, /v/VIDEO_ID, /e/VIDEO_ID, including youtube-nocookie.com
+    - Shorts and live URLs: /shorts/VIDEO_ID, /live/VIDEO_ID
+    - Playlist and timestamped URLs: extra query parameters are ignored
+    - URLs pasted without a scheme, e.g. youtu.be/VIDEO_ID
+
+    Args:
+        url: The URL as submitted
+
+    Returns:
+        The 11-character video ID, or None if the URL is not a YouTube video URL
+    """
+    if not url:
+        return None
+
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    try:
+        parsed_url = urlsplit(url)
+        host = (parsed_url.hostname or '').lower()
+    except ValueError:
+        return None
+
+    video_id = None
+    parts = [part for part in parsed_url.path.split('/') if part]
+    if host == 'youtu.be':
+        video_id = parts[0] if parts else None
+    elif host in youtube_hosts:
+        if parts == ['watch']:
+            video_id = parse_qs(parsed_url.query).get('v', [None])[0]
+        elif len(parts) >= 2 and parts[0] in youtube_id_paths:
+            video_id = parts[1]
+
+    if video_id and video_id_pattern.match(video_id):
+        return video_id
+    return None
+
+def parse_languages(value):
+    """
+    Parse a comma-separated language preference list such as "en,de".
+
+    Args:
+        value: The submitted preference, or None for the configured default
+
+    Returns:
+        List of language codes, most preferred first
+    """
+    languages = []
+    for code in (value or '').split(','):
+        code = code.strip()
+        if not language_code_pattern.match(code) or code in languages:
+            continue
+        # The joined list keys the transcript cache, whose language column is 32 characters
+        if len(','.join(languages + [code])) > 32:
+            break
+        languages.append(code)
+    return languages or list(TRANSCRIPT_LANGUAGES)
+
+def choose_track(tracks, languages):
+    """
+    Pick the best caption track for a language preference list.
+
+    Each preferred language is tried in order, taking a manually created
+    track over a generated one; a region variant such as en-GB matches "en".
+    With no match, the first manual track wins, then the first generated one.
+
+    Args:
+        tracks: Track objects from the transcript source
+        languages: Language codes, most preferred first
+
+    Returns:
+        The chosen Track, or None if the video has no tracks
+    """
+    def matches(track, code):
+        return track.language_code == code or track.language_code.split('-')[0] == code
+
+    ordered = sorted(tracks, key=lambda track: track.is_generated)
+    for code in languages:
+        for track in ordered:
+            if matches(track, code):
+                return track
+    return ordered[0] if ordered else None
+
+def fetch_transcript_entries(video_id, languages=None):
+    """
+    Fetch the transcript entries for a video from the configured source.
+
+    The video's track list is cached, so a fetch costs two upstream requests
+    (list, then download the chosen track) and one while the list is cached.
+
+    Args:
+        video_id: The YouTube video ID
+        languages: Language codes, most preferred first
+
+    Returns:
+        List of {'text', 'start', 'duration'} dictionaries
+    """
+    languages = languages or list(TRANSCRIPT_LANGUAGES)
+
+    tracks = manifest_cache.get(video_id)
+    cached = tracks is not None
+    if not cached:
+        tracks = sources.transcript_source.list_tracks(video_id)
+        manifest_cache.set(video_id, tracks)
+
+    track = choose_track(tracks, languages)
+    if track is None:
+        raise NoTranscriptFound(video_id, languages, None)
+
+    try:
+        return sources.transcript_source.fetch_track(track)
+    except Exception as e:
+        if not cached:
+            raise
+        # Track URLs are signed and may have expired; list once more and retry
+        logger.info(f"Refreshing caption tracks for {video_id} after fetch failed: {str(e)}")
+        manifest_cache.delete(video_id)
+        return fetch_transcript_entries(video_id, languages)
+
+def failure_kind(error):
+    """
+    Classify a fetch failure that retrying soon would not fix.
+
+    Args:
+        error: The exception raised while fetching
+
+    Returns:
+        'no_transcript', 'disabled' or 'unavailable', or None for transient errors
+    """
+    if isinstance(error, TranscriptsDisabled):
+        return 'disabled'
+    if isinstance(error, NoTranscriptFound):
+        return 'no_transcript'
+    if isinstance(error, VideoUnavailable):
+        return 'unavailable'
+    return None
+
+def failure_error(video_id, kind):
+    """Rebuild the exception for a remembered failure so callers handle it as before."""
+    if kind == 'disabled':
+        return TranscriptsDisabled(video_id)
+    if kind == 'unavailable':
+        return VideoUnavailable(video_id)
+    return NoTranscriptFound(video_id, list(TRANSCRIPT_LANGUAGES), None)
+
+def get_transcript_entries(video_id, languages=None):
+    """
+    Return transcript entries for a video, reusing a fetch made for any user.
+
+    Concurrent requests for the same uncached video share a single upstream
+    fetch, both across threads and across worker processes. Videos recently
+    found to have no transcript fail straight from the negative cache.
+
+    Args:
+        video_id: The YouTube video ID
+        languages: Language codes, most preferred first
+
+    Returns:
+        List of {'text', 'start', 'duration'} dictionaries
+    """
+    languages = languages or list(TRANSCRIPT_LANGUAGES)
+    preference = ','.join(languages)
+
+    entries = transcript_cache.get(video_id, preference)
+    if entries is not None:
+        return entries
+
+    kind = negative_cache.get(video_id)
+    if kind is not None:
+        raise failure_error(video_id, kind)
+
+    def fetch_and_cache():
+        # The previous flight may have filled either cache while we queued
+        cached = transcript_cache.get(video_id, preference)
+        if cached is not None:
+            return cached
+        kind = negative_cache.get(video_id)
+        if kind is not None:
+            raise failure_error(video_id, kind)
+
+        try:
+            fetched = fetch_transcript_entries(video_id, languages)
+        except Exception as e:
+            kind = failure_kind(e)
+            if kind is not None:
+                negative_cache.record(video_id, kind)
+            raise
+        transcript_cache.set(video_id, preference, fetched)
+        return fetched
+
+    return fetch_flight.do(f"transcript:{video_id}:{preference}", fetch_and_cache)
+
+def find_existing_transcript(user_id, video_id):
+    """
+    Return the user's most recent transcript of a video, so re-extraction reuses it.
+
+    Args:
+        user_id: Owner of the transcript
+        video_id: The YouTube video ID
+
+    Returns:
+        The Transcript, or None if the user has not extracted this video
+    """
+    return (Transcript.query
+            .filter_by(user_id=user_id, video_id=video_id)
+            .order_by(Transcript.created_at.desc())
+            .first())
+
+def list_transcripts(user_id, cursor=None, limit=PAGE_SIZE):
+    """
+    Return one page of a user's transcripts, newest first, without their bodies.
+
+    Only the columns the library list shows are selected, so no transcript
+    row is loaded as an object and no body or index is read.
+
+    Args:
+        user_id: Owner of the transcripts
+        cursor: (created_at, id) of the last transcript already shown, or None
+        limit: Transcripts per page
+
+    Returns:
+        (rows with id, video_url, video_id and created_at, next_cursor)
+    """
+    query = (Transcript.query
+             .with_entities(Transcript.id, Transcript.video_url, Transcript.video_id, Transcript.created_at)
+             .filter(Transcript.user_id == user_id))
+    return keyset_page(query, Transcript.created_at, Transcript.id, cursor, limit)
+
+def build_transcript(user_id, video_url, entries, video_id=None):
+    """
+    Create a Transcript row holding the packed segments, the rendered text and its chat index.
+
+    Args:
+        user_id: Owner of the transcript
+        video_url: The URL as submitted
+        entries: List of {'text', 'start', 'duration'} dictionaries
+        video_id: The YouTube video ID, parsed from video_url if not given
+
+    Returns:
+        The new Transcript, not yet added to the session
+    """
+    segments = Segments.from_entries(entries)
+    content = segments.render()
+    return Transcript(
+        video_url=video_url,
+        video_id=video_id or extract_video_id(video_url),
+        content=content,
+        content_hash=content_hash(content),
+        segments=segments.pack(),
+        search_index=RetrievalIndex.build(segments).pack(),
+        user_id=user_id
+    )
+
+def extract_result(transcript_id, video_id, existing, summary_url):
+    """
+    Return the JSON body answering a completed extraction.
+
+    The Flask and ASGI /extract endpoints answer JSON clients with the
+    same fields.
+
+    Args:
+        transcript_id: ID of the user's Transcript
+        video_id: The YouTube video ID
+        existing: The user had already extracted this video
+        summary_url: Where the transcript's summary is fetched from
+
+    Returns:
+        Dictionary with status 'done' and the arguments
+    """
+    return {
+        'status': 'done',
+        'transcript_id': transcript_id,
+        'video_id': video_id,
+        'existing': existing,
+        'summary_url': summary_url
+    }
+
+def describe_fetch_error(error):
+    """
+    Return the user-facing message for a transcript fetch failure.
+
+    Args:
+        error: The exception raised while fetching
+
+    Returns:
+        A message suitable for flashing or returning in JSON
+    """
+    if isinstance(error, TranscriptsDisabled):
+        return 'Transcripts are disabled for this video.'
+    if isinstance(error, NoTranscriptFound):
+        return 'No transcript found for this video.'
+    if isinstance(error, VideoUnavailable):
+        return 'This video is unavailable.'
+    return f'An error occurred: {str(error)}'
+
+def fetch_playlist_video_ids(playlist_id, limit):
+    """
+    List the video IDs in a public YouTube playlist.
+
+    The IDs are read from the playlist page, which embeds the first 100
+    videos; longer playlists are truncated to those.
+
+    Args:
+        playlist_id: The YouTube playlist ID
+        limit: Maximum number of video IDs to return
+
+    Returns:
+        List of video IDs in playlist order
+    """
+    response = requests.get(
+        playlist_url,
+        params={'list': playlist_id},
+        headers={'Accept-Language': 'en-US,en;q=0.9'},
+        timeout=15
+    )
+    response.raise_for_status()
+
+    video_ids = dict.fromkeys(playlist_video_pattern.findall(response.text))
+    return list(video_ids)[:limit]
@@ -1,36 +1,40 @@
 """
 Utility functions for TranscriptHub application.
 """
-import os
-import requests
-import json
+import logging
 from dotenv import load_dotenv
+from api.llm import llm_client
 
 # Load environment variables
 load_dotenv()
 
-# Get API key from environment variable
-api_key = os.environ.get("MISTRAL_API_KEY", "nCmZyPuNmY8PfYzg8NyjAE8BpQQKAftB")  # Fallback to hardcoded key if not set
-api_url = "https://api.mistral.ai/v1/chat/completions"
+# Configure logging
+logger = logging.getLogger(__name__)
 
-def get_chat_response(messages, transcript_content, model="mistral-large-latest"):
+def build_chat_messages(messages, transcript_content, excerpted=False, history_summary=None):
     """
-    Get a response from the Mistral AI model based on user messages and transcript context.
+    Build the Mistral message list for a chat about a transcript.
     
     Args:
         messages: List of message objects with 'role' and 'content'
         transcript_content: The transcript text to use as context
-        model: The Mistral model to use
+        excerpted: transcript_content holds only the passages most relevant to the question
+        history_summary: Summary of earlier messages that are no longer sent
         
     Returns:
-        Response from the AI model
+        The system prompt followed by the conversation messages
     """
+    excerpt_note = ""
+    if excerpted:
+        excerpt_note = ("Only the passages of the transcript most relevant to the question are included below, "
+                        "in video order and separated by \"...\".\n\n")
+    
     # Create system prompt with the transcript content as context
     system_prompt = f"""You are a helpful assistant that answers questions based on the YouTube transcript provided below.
 Use this transcript as your knowledge base to provide accurate, relevant information.
 If the answer cannot be found in the transcript, politely say so and suggest what might help.
 
-TRANSCRIPT:
+{excerpt_note}TRANSCRIPT:
 {transcript_content}
 
 When responding:
@@ -38,6 +42,12 @@ When responding:
 2. Be concise but comprehensive
 3. Include timestamps [MM:SS] when referencing specific parts of the video
 4. If the transcript doesn't contain the answer, be honest about it
+"""
+    
+    if history_summary:
+        system_prompt += f"""
+SUMMARY OF THE EARLIER CONVERSATION:
+{history_summary}
 """
     
     # Format messages for Mistral API
@@ -50,30 +60,87 @@ When responding:
             "content": msg["content"]
         })
     
-    # Prepare the payload
-    payload = {
-        "model": model,
-        "messages": formatted_messages
-    }
+    return formatted_messages
+
+def get_chat_response(messages, transcript_content, model="mistral-large-latest", excerpted=False,
+                      history_summary=None):
+    """
+    Get a response from the Mistral AI model based on user messages and transcript context.
     
-    # Set headers
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    Args:
+        messages: List of message objects with 'role' and 'content'
+        transcript_content: The transcript text to use as context
+        model: The Mistral model to use
+        excerpted: transcript_content holds only retrieved passages
+        history_summary: Summary of earlier messages that are no longer sent
+        
+    Returns:
+        Response from the AI model
+    """
+    formatted_messages = build_chat_messages(messages, transcript_content, excerpted, history_summary)
     
-    # Make the API request
+    # Make the API request through the shared pooled client
     try:
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        
-        # Parse the response
-        response_data = response.json()
-        return response_data["choices"][0]["message"]["content"]
+        return llm_client.chat(formatted_messages, model, purpose='chat')
     except Exception as e:
-        print(f"Error calling Mistral AI API: {str(e)}")
+        logger.error(f"Error calling Mistral AI API: {str(e)}")
         return f"Error: Unable to get a response from the AI model. {str(e)}"
 
+def stream_chat_response(messages, transcript_content, model="mistral-large-latest", excerpted=False,
+                         history_summary=None):
+    """
+    Stream a response from the Mistral AI model, token by token.
+    
+    Unlike get_chat_response(), failures are raised rather than returned as
+    text, so the caller can tell a complete reply from a partial one.
+    
+    Args:
+        messages: List of message objects with 'role' and 'content'
+        transcript_content: The transcript text to use as context
+        model: The Mistral model to use
+        excerpted: transcript_content holds only retrieved passages
+        history_summary: Summary of earlier messages that are no longer sent
+        
+    Yields:
+        Pieces of the response text in order
+    """
+    formatted_messages = build_chat_messages(messages, transcript_content, excerpted, history_summary)
+    yield from llm_client.stream_chat(formatted_messages, model, purpose='chat')
+
+def summarize_chat_history(previous_summary, messages, model="mistral-large-latest"):
+    """
+    Fold older chat messages into the rolling summary of a conversation.
+    
+    Failures are raised rather than returned as text, so an error message
+    never replaces the stored summary.
+    
+    Args:
+        previous_summary: The current summary, or None
+        messages: The messages to fold in, oldest first, with 'role' and 'content'
+        model: The Mistral model to use
+        
+    Returns:
+        The updated summary
+    """
+    system_prompt = """You maintain a running summary of a conversation between a user and an assistant about a YouTube video.
+The summary replaces the older messages, so keep every question, answer, fact and [MM:SS] timestamp needed to continue the conversation.
+"""
+    
+    conversation = "\n\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in messages)
+    user_prompt = f"""CURRENT SUMMARY:
+{previous_summary or "(none yet)"}
+
+NEW MESSAGES:
+{conversation}
+
+Write the updated summary as concise bullet points, at most 300 words.
+"""
+    
+    return llm_client.chat([
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ], model, purpose='history')
+
 def summarize_transcript(transcript_content, model="mistral-large-latest"):
     """
     Generate a concise summary of the transcript content.
@@ -105,26 +172,89 @@ Create a title for this content based on the transcript, and provide a 2-3 sente
         {"role": "user", "content": user_prompt}
     ]
     
-    # Prepare the payload
-    payload = {
-        "model": model,
-        "messages": messages
-    }
+    # Make the API request through the shared pooled client
+    try:
+        return llm_client.chat(messages, model, purpose='summary')
+    except Exception as e:
+        logger.error(f"Error calling Mistral AI API: {str(e)}")
+        return f"Error: Unable to summarize the transcript. {str(e)}"
+
+def summarize_transcript_part(part_content, part_number, part_count, model="mistral-large-latest"):
+    """
+    Summarize one part of a long transcript, as the map step of a chunked summary.
+    
+    Args:
+        part_content: The transcript text of this part
+        part_number: 1-based position of the part
+        part_count: Total number of parts
+        model: The Mistral model to use
+        
+    Returns:
+        Notes on this part, or an "Error: ..." message
+    """
+    system_prompt = """You are a helpful assistant that takes notes on one part of a long YouTube video transcript.
+Your notes will be combined with notes on the other parts into a summary of the whole video.
+"""
+    
+    user_prompt = f"""This is part {part_number} of {part_count} of a YouTube transcript:
+
+{part_content}
+
+List the key topics, points and facts from this part as concise bullet points.
+Keep the [MM:SS] timestamp where each topic starts. Do not add a title or an overview.
+"""
     
-    # Set headers
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
     
-    # Make the API request
     try:
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()  # Raise an exception for HTTP errors
+        return llm_client.chat(messages, model, purpose='summary_part')
+    except Exception as e:
+        logger.error(f"Error calling Mistral AI API: {str(e)}")
+        return f"Error: Unable to summarize part {part_number} of the transcript. {str(e)}"
+
+def combine_transcript_summaries(part_summaries, final=True, model="mistral-large-latest"):
+    """
+    Combine notes on consecutive transcript parts, as the reduce step of a chunked summary.
+    
+    Args:
+        part_summaries: Notes on each part, in video order
+        final: Produce the title, overview and bullet format of summarize_transcript();
+            otherwise produce merged notes for a further round of combining
+        model: The Mistral model to use
         
-        # Parse the response
-        response_data = response.json()
-        return response_data["choices"][0]["message"]["content"]
+    Returns:
+        The combined summary, or an "Error: ..." message
+    """
+    system_prompt = """You are a helpful assistant that creates concise, informative summaries of YouTube video transcripts.
+You are given notes on consecutive parts of one video, in order.
+"""
+    
+    notes = "\n\n".join(
+        f"Notes on part {number}:\n{summary}" for number, summary in enumerate(part_summaries, 1)
+    )
+    
+    if final:
+        instructions = """Create a title for this content based on the notes, and provide a 2-3 sentence overview followed by 
+5-7 bullet points covering the key topics and main points discussed in the video."""
+    else:
+        instructions = """Merge these notes into one concise list of bullet points covering the key topics,
+keeping the [MM:SS] timestamp where each topic starts."""
+    
+    user_prompt = f"""{notes}
+
+{instructions}
+"""
+    
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    
+    try:
+        return llm_client.chat(messages, model, purpose='summary_combine')
     except Exception as e:
-        print(f"Error calling Mistral AI API: {str(e)}")
-        return f"Error: Unable to summarize the transcript. {str(e)}"
\ No newline at end of file
+        logger.error(f"Error calling Mistral AI API: {str(e)}")
+        return f"Error: Unable to summarize the transcript. {str(e)}"
@@ -0,0 +1,99 @@
+"""
+Background worker that drains the extraction and summary job queue.
+
+Run any number of these next to the web workers:
+    python -m api.worker
+
+Deployments without one (EXTRACT_MODE=inline) run queued summaries on a
+few threads of the web process instead, with run_jobs_locally().
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.app import app, db
+from api.jobs import claim_job, run_job
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds to sleep when the queue is empty
+POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+
+# Threads of a web process that run queued jobs when no worker is deployed
+LOCAL_JOB_THREADS = int(os.environ.get('LOCAL_JOB_THREADS', 2))
+
+running = True
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+def stop(signum, frame):
+    """Finish the current job, then exit"""
+    global running
+    logger.info(f"Received signal {signum}, stopping after the current job")
+    running = False
+
+def run_next_job(worker_id):
+    """
+    Claim and run one runnable job.
+
+    Args:
+        worker_id: Identifier recorded in Job.locked_by
+
+    Returns:
+        True if a job was run, False if there was none or the worker failed
+    """
+    with app.app_context():
+        try:
+            job = claim_job(worker_id)
+            if job is None:
+                return False
+            logger.info(f"Worker {worker_id} running job {job.id} from stage {job.stage}")
+            run_job(job)
+            logger.info(f"Job {job.id} finished with status {job.status}")
+            return True
+        except Exception as e:
+            import traceback
+            logger.error(f"Worker error: {str(e)}")
+            logger.error(traceback.format_exc())
+            return False
+        finally:
+            db.session.remove()
+
+def run_jobs_locally():
+    """Drain the queue on a thread of this process, for deployments that run no worker."""
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = ThreadPoolExecutor(max_workers=max(1, LOCAL_JOB_THREADS), thread_name_prefix='local-job')
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:local"
+    _local_pool.submit(lambda: run_next_job(worker_id))
+
+def main():
+    """Claim and run jobs until stopped"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Worker {worker_id} started")
+
+    while running:
+        if not run_next_job(worker_id):
+            time.sleep(POLL_INTERVAL)
+
+    logger.info(f"Worker {worker_id} stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark concurrent chat turns on sync WSGI workers versus the asyncio path.
+
+Starts a local mock chat completions server that answers after a fixed
+delay, then fires bursts of concurrent POST /api/send_message requests at
+two servers of the same app over a throwaway SQLite database:
+
+    sync   the Flask app on a WSGI server with a fixed pool of worker
+           threads, like gunicorn --threads N
+    async  api.asgi:app on uvicorn, with its default thread pools
+
+Each request is the first question of its own chat, so every turn makes
+one model call. Requires httpx and uvicorn.
+
+Usage:
+    python benchmarks/bench_async_chat.py [sync_threads] [upstream_ms] [concurrency,concurrency,...]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its database URL at import time
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+# Enough pooled model connections for every sync worker thread
+os.environ.setdefault('LLM_POOL_SIZE', '64')
+
+import logging
+import httpx
+import uvicorn
+
+REPLY = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': 'An answer.'}}],
+                    'usage': {'prompt_tokens': 100, 'completion_tokens': 3}}).encode('utf-8')
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion after server.latency seconds"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server handling requests on a fixed number of threads"""
+    request_queue_size = 1024
+
+    def __init__(self, *args, threads=16, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def seed(flask_app, chats):
+    from api.models import db, User, Chat
+    from api.transcripts import build_transcript
+    with flask_app.app_context():
+        user = User(username='bench', password='x')
+        db.session.add(user)
+        db.session.commit()
+        transcript = build_transcript(user.id, 'https://youtu.be/abcdefghijk', [
+            {'start': i * 4.0, 'duration': 4.0, 'text': f'part {i} of a short benchmark video'} for i in range(40)
+        ], 'abcdefghijk')
+        db.session.add(transcript)
+        db.session.commit()
+        db.session.add_all([Chat(title='bench', user_id=user.id, transcript_id=transcript.id) for _ in range(chats)])
+        db.session.commit()
+        serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        return serializer.dumps({'_user_id': str(user.id), '_fresh': True})
+
+async def burst(base_url, cookie, chat_ids, label):
+    limits = httpx.Limits(max_connections=len(chat_ids), max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300,
+                                 cookies={'session': cookie}, trust_env=False) as client:
+        async def one(chat_id):
+            started = time.perf_counter()
+            response = await client.post('/api/send_message', json={
+                'chat_id': chat_id, 'message': f'{label} question number {chat_id}'
+            })
+            response.raise_for_status()
+            assert not response.json()['ai_message']['content'].startswith('Error:'), response.text
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(one(chat_id) for chat_id in chat_ids)))
+        elapsed = time.perf_counter() - started
+    return elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+def main():
+    sync_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    upstream_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    levels = [int(level) for level in sys.argv[3].split(',')] if len(sys.argv) > 3 else [50, 200, 400]
+
+    mock = MockServer(('127.0.0.1', 0), MockHandler)
+    mock.latency = upstream_ms / 1000
+    threading.Thread(target=mock.serve_forever, daemon=True).start()
+
+    from api.llm import llm_client
+    llm_client.url = f'http://127.0.0.1:{mock.server_address[1]}/v1/chat/completions'
+    llm_client.session.trust_env = False
+    # The async client follows the shared client's URL when the server starts it
+    from api.asgi import app as asgi_app, flask_app, ASYNC_BLOCKING_THREADS
+    logging.getLogger().setLevel(logging.WARNING)
+
+    cookie = seed(flask_app, 2 * sum(levels))
+
+    sync_server = make_server('127.0.0.1', 0, flask_app, server_class=PooledWSGIServer, handler_class=QuietHandler)
+    sync_server.pool = ThreadPoolExecutor(max_workers=sync_threads)
+    threading.Thread(target=sync_server.serve_forever, daemon=True).start()
+
+    async_server = uvicorn.Server(uvicorn.Config(asgi_app, host='127.0.0.1', port=0, log_level='warning',
+                                                 backlog=2048, lifespan='on'))
+    threading.Thread(target=async_server.run, daemon=True).start()
+    while not async_server.started:
+        time.sleep(0.05)
+    async_port = async_server.servers[0].sockets[0].getsockname()[1]
+
+    print(f"Mock model answers in {upstream_ms:.0f} ms; sync server has {sync_threads} worker threads, "
+          f"async server has {ASYNC_BLOCKING_THREADS} blocking-work threads")
+    print(f"{'path':<6} {'concurrent':>10} {'wall s':>8} {'turns/s':>8} {'p50 s':>7} {'p95 s':>7}")
+    next_chat = 1
+    for level in levels:
+        for label, base_url in (('sync', f'http://127.0.0.1:{sync_server.server_address[1]}'),
+                                ('async', f'http://127.0.0.1:{async_port}')):
+            chat_ids = list(range(next_chat, next_chat + level))
+            next_chat += level
+            elapsed, p50, p95 = asyncio.run(burst(base_url, cookie, chat_ids, label))
+            print(f"{label:<6} {level:>10} {elapsed:>8.2f} {level / elapsed:>8.1f} {p50:>7.2f} {p95:>7.2f}")
+
+    async_server.should_exit = True
+    sync_server.shutdown()
+    mock.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark bulk extraction throughput against a local stub transcript source.
+
+Runs api.bulk.bulk_extract() over a batch of fake videos whose transcripts
+are "fetched" with a simulated network delay, and reports videos/second for
+each concurrency level plus the cost of per-video versus batched commits.
+
+Usage:
+    python benchmarks/bench_bulk_extract.py [videos] [latency_ms]
+"""
+import os
+import sys
+import time
+import random
+from flask import Flask
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.models import db, User
+from api.bulk import bulk_extract
+
+def make_app():
+    """Create a throwaway app backed by an in-memory SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', password='bench'))
+        db.session.commit()
+    return app
+
+def make_stub_source(latency_ms, segments=300):
+    """Return a fetch function that sleeps like a network call and returns fake entries"""
+    def fetch(video_id):
+        time.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+        return [
+            {'text': f'{video_id} segment {i}', 'start': i * 4.0, 'duration': 4.0}
+            for i in range(segments)
+        ]
+    return fetch
+
+def run(app, video_count, concurrency, fetch, batch_size):
+    items = [(f'https://youtu.be/vid{i:08d}', f'vid{i:08d}') for i in range(video_count)]
+    with app.app_context():
+        started = time.perf_counter()
+        result = bulk_extract(1, items, concurrency=concurrency, fetch=fetch, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+    assert result['failed'] == 0, result
+    return elapsed
+
+def main():
+    video_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 100
+    app = make_app()
+    fetch = make_stub_source(latency_ms)
+
+    print(f"Bulk extraction of {video_count} videos, stub latency ~{latency_ms:.0f} ms")
+    print(f"{'concurrency':>12} {'seconds':>9} {'videos/s':>9}")
+    for concurrency in (1, 2, 4, 8, 16, 32):
+        elapsed = run(app, video_count, concurrency, fetch, batch_size=50)
+        print(f"{concurrency:>12} {elapsed:>9.2f} {video_count / elapsed:>9.1f}")
+
+    instant = make_stub_source(0)
+    print()
+    print("Insert cost with an instant source")
+    print(f"{'batch size':>12} {'seconds':>9} {'videos/s':>9}")
+    for batch_size in (1, 10, 50):
+        elapsed = run(app, video_count, 8, instant, batch_size=batch_size)
+        print(f"{batch_size:>12} {elapsed:>9.2f} {video_count / elapsed:>9.1f}")
+
+if __name__ == "__main__":
+    main()
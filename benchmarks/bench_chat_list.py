@@ -0,0 +1,166 @@
+"""
+Benchmark the chat list page and check that it stays one query per page.
+
+Seeds a throwaway SQLite database with one user holding many chats, each
+with a conversation of long-ish messages, then compares:
+
+    lazy        the previous chats(): every chat loaded, then the template
+                reads chat.messages for each one (one more query per chat,
+                every message body decompressed)
+    page 1      api.chat.list_chats() for the first page
+    last page   list_chats() for the oldest page, reached by cursor
+    GET /chats  the whole request for page 1, signed in
+
+Reports statements executed, time (median of several) and KB of HTML, plus
+the message bodies read for the lazy page.
+Exits with an error if list_chats() runs more than one statement for a
+page, whatever the page size, so the per-chat queries can't come back.
+
+Usage:
+    python benchmarks/bench_chat_list.py [chats] [messages_per_chat] [repeats]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its database URL at import time
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+import logging
+from flask import render_template
+from sqlalchemy import event
+from api.app import app
+import api.routes
+from api.models import db, User, Transcript, Chat, Message
+from api.chat import list_chats
+from api.pagination import decode_cursor
+
+WORDS = ("the a to and of we this that you is it in for so on with what like just know going really think "
+         "about right now data model video people one can thing way time because kind actually").split()
+
+class StatementCounter:
+    """Counts statements sent to the database while active"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._executed)
+
+    def _executed(self, *args):
+        self.count += 1
+
+def seed(chats, messages_per_chat):
+    rng = random.Random(3)
+    user = User(username='talker', password='x')
+    db.session.add(user)
+    db.session.commit()
+    transcript = Transcript(video_url='https://youtu.be/abcdefghijk', video_id='abcdefghijk',
+                            content='[00:00] hello', user_id=user.id)
+    db.session.add(transcript)
+    db.session.commit()
+    started = datetime(2024, 1, 1)
+    for i in range(chats):
+        chat = Chat(title=f'Chat about video {i}', user_id=user.id, transcript_id=transcript.id,
+                    created_at=started + timedelta(hours=i))
+        db.session.add(chat)
+        db.session.flush()
+        db.session.add_all([Message(
+            content=' '.join(rng.choice(WORDS) for _ in range(120)),
+            role='user' if j % 2 == 0 else 'assistant',
+            chat_id=chat.id,
+            timestamp=chat.created_at + timedelta(minutes=j)
+        ) for j in range(messages_per_chat)])
+    db.session.commit()
+    return user.id
+
+def measure(counter, function, repeats):
+    times, statements, size = [], 0, 0
+    for _ in range(repeats):
+        db.session.expire_all()
+        counter.count = 0
+        started = time.perf_counter()
+        size = function()
+        times.append(time.perf_counter() - started)
+        statements = counter.count
+    return statistics.median(times) * 1000, statements, size
+
+def main():
+    chat_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    messages_per_chat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        user_id = seed(chat_count, messages_per_chat)
+        counter = StatementCounter(db.engine)
+
+        # One statement per page, for every page size
+        failures = []
+        for limit in (1, 10, 50, 200):
+            counter.count = 0
+            list_chats(user_id, None, limit)
+            if counter.count != 1:
+                failures.append(f"list_chats(limit={limit}) ran {counter.count} statements")
+
+        cursor = None
+        while True:
+            _, next_cursor = list_chats(user_id, decode_cursor(cursor))
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+
+        def lazy():
+            with app.test_request_context():
+                chats = Chat.query.filter_by(user_id=user_id).order_by(Chat.created_at.desc()).all()
+                # What the previous template read for each chat
+                html = render_template('chats.html', chats=chats, next_cursor=None, paged=False)
+                return len(html.encode('utf-8')) + sum(len(m.content) for chat in chats for m in chat.messages)
+
+        def first_page():
+            with app.test_request_context():
+                chats, next_cursor = list_chats(user_id)
+                return len(render_template('chats.html', chats=chats, next_cursor=next_cursor,
+                                           paged=False).encode('utf-8'))
+
+        def last_page():
+            with app.test_request_context():
+                chats, next_cursor = list_chats(user_id, decode_cursor(cursor))
+                return len(render_template('chats.html', chats=chats, next_cursor=next_cursor,
+                                           paged=True).encode('utf-8'))
+
+        print(f"{chat_count} chats of {messages_per_chat} messages; medians of {repeats}")
+        print(f"{'variant':<11} {'ms':>8} {'statements':>10} {'KB':>8}")
+        for label, function in (('lazy', lazy), ('page 1', first_page), ('last page', last_page)):
+            ms, statements, size = measure(counter, function, repeats)
+            print(f"{label:<11} {ms:>8.1f} {statements:>10} {size / 1024:>8.0f}")
+
+    # Requests run outside the app context above, so each loads its own user
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    times = []
+    for _ in range(repeats):
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.get('/chats')
+        times.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    # The statements include loading the signed-in user
+    print(f"{'GET /chats':<11} {statistics.median(times) * 1000:>8.1f} {counter.count:>10} "
+          f"{len(response.data) / 1024:>8.0f}")
+
+    if failures:
+        sys.exit('\n'.join(failures))
+    print("list_chats() ran one statement for every page size")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark time-to-first-token of streamed versus buffered chat replies.
+
+Starts a local mock chat completions server that generates a reply of N
+tokens at a fixed interval, in both the buffered JSON mode used by
+/api/send_message and the streaming mode used by /api/stream_message, and
+reports when the first text reaches the caller through api.llm.LLMClient.
+
+Usage:
+    python benchmarks/bench_chat_streaming.py [tokens] [ms_per_token] [first_token_ms]
+"""
+import os
+import sys
+import json
+import time
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.llm import LLMClient
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Generates server.tokens tokens, streamed as SSE chunks when the payload asks for it"""
+    protocol_version = 'HTTP/1.1'
+    # Chunks are small writes; without this, Nagle plus delayed ACK holds them back
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        server = self.server
+        tokens = [f' token{i}' for i in range(server.tokens)]
+
+        if not payload.get('stream'):
+            time.sleep(server.first_token + server.per_token * len(tokens))
+            body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': ''.join(tokens)}}]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(server.first_token)
+        for token in tokens:
+            self._chunk(f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n".encode('utf-8'))
+            time.sleep(server.per_token)
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_token_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    first_token_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 300
+    runs = 5
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+    server.daemon_threads = True
+    server.tokens = tokens
+    server.per_token = per_token_ms / 1000
+    server.first_token = first_token_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = LLMClient(url=f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions', key='x')
+    client.session.trust_env = False
+
+    buffered_first, buffered_total, streamed_first, streamed_total = [], [], [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        client.chat([], 'm')
+        elapsed = time.perf_counter() - started
+        buffered_first.append(elapsed)
+        buffered_total.append(elapsed)
+
+        started = time.perf_counter()
+        first = None
+        for _ in client.stream_chat([], 'm'):
+            if first is None:
+                first = time.perf_counter() - started
+        streamed_first.append(first)
+        streamed_total.append(time.perf_counter() - started)
+
+    print(f"Reply of {tokens} tokens, {first_token_ms:.0f} ms to first token, {per_token_ms:.0f} ms per token "
+          f"(median of {runs})")
+    print(f"{'mode':<12} {'first text ms':>14} {'complete ms':>12}")
+    print(f"{'buffered':<12} {statistics.median(buffered_first) * 1000:>14.0f} {statistics.median(buffered_total) * 1000:>12.0f}")
+    print(f"{'streamed':<12} {statistics.median(streamed_first) * 1000:>14.0f} {statistics.median(streamed_total) * 1000:>12.0f}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark single-call versus chunked (map-reduce) summarization by transcript length.
+
+Starts a local mock chat completions server whose response time grows with
+the prompt size (prefill) plus a fixed generation time, points the shared
+api.llm client at it, and times api.summaries.summarize_content() with and
+without chunking for transcripts of increasing duration.
+
+Usage:
+    python benchmarks/bench_chunked_summary.py [prefill_ms_per_1k_tokens] [generation_ms]
+"""
+import os
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.llm import llm_client
+from api import summaries
+from api.segments import Segments
+
+VOCABULARY = ("the a to and of we this that you is it in for so on with what like just "
+              "know going really think about right now data model video people one can").split()
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Sleeps in proportion to the prompt size, then returns a short reply"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        prompt_tokens = sum(len(message['content']) for message in payload['messages']) / 4
+        time.sleep(prompt_tokens / 1000 * self.server.prefill + self.server.generation)
+
+        body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': '- notes ' * 60}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def synthetic_transcript(minutes, rng):
+    entries = []
+    start = 0.0
+    while start < minutes * 60:
+        duration = rng.uniform(2.0, 5.0)
+        entries.append({'start': start, 'duration': duration,
+                        'text': ' '.join(rng.choices(VOCABULARY, k=rng.randint(8, 14)))})
+        start += duration
+    return Segments.from_entries(entries)
+
+def main():
+    prefill_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    generation_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 1500
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+    server.daemon_threads = True
+    server.prefill = prefill_ms / 1000
+    server.generation = generation_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm_client.url = f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+    llm_client.session.trust_env = False
+
+    rng = random.Random(7)
+    print(f"Mock model: {prefill_ms:.0f} ms per 1k prompt tokens + {generation_ms:.0f} ms generation; "
+          f"parts of {summaries.SUMMARY_CHUNK_TOKENS} tokens, {summaries.SUMMARY_CONCURRENCY} in parallel")
+    print(f"{'video':>8} {'tokens':>8} {'parts':>6} {'single s':>9} {'chunked s':>10}")
+    for minutes in (15, 30, 60, 120, 240):
+        segments = synthetic_transcript(minutes, rng)
+        content = segments.render()
+        parts = len(summaries.split_transcript(segments))
+
+        started = time.perf_counter()
+        summaries._checked(summaries.summarize_transcript(content))
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        summaries.summarize_chunked(segments)
+        chunked = time.perf_counter() - started
+
+        print(f"{minutes:>6}m {summaries.estimate_tokens(content):>8} {parts:>6} {single:>9.2f} {chunked:>10.2f}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
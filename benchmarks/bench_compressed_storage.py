@@ -0,0 +1,143 @@
+"""
+Benchmark compressed, deferred transcript storage against plain text columns.
+
+Builds the same synthetic transcript library twice in temporary SQLite
+databases: once with the original eager db.Text content column, once with
+the current models (CompressedText, deferred). Reports file size and the
+time of the dashboard listing query for each. The plain baseline is read
+with Core, which skips ORM object construction, so the comparison
+understates the gain.
+
+Usage:
+    python benchmarks/bench_compressed_storage.py [transcripts] [segments_per_transcript]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Text, DateTime, select
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.models import db, User, Transcript
+from api.segments import Segments
+
+VOCABULARY = ("the a to and of we this that you is it in for so on with what like just "
+              "know going really think about right now data model video people one can "
+              "get time here make there thing actually because first then look see").split()
+
+def synthetic_entries(rng, segment_count):
+    entries = []
+    start = 0.0
+    for _ in range(segment_count):
+        duration = rng.uniform(1.5, 6.0)
+        words = rng.choices(VOCABULARY, k=rng.randint(6, 14))
+        entries.append({'start': start, 'duration': duration, 'text': ' '.join(words)})
+        start += duration
+    return entries
+
+def build_rows(count, segment_count):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        content = Segments.from_entries(synthetic_entries(rng, segment_count)).render()
+        rows.append({
+            'video_url': f'https://www.youtube.com/watch?v=vid{i:08d}',
+            'content': content,
+            'created_at': now - timedelta(minutes=i),
+            'user_id': 1
+        })
+    return rows
+
+def timed(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_plain(path, rows):
+    """The original schema: content is an eager TEXT column."""
+    engine = create_engine(f'sqlite:///{path}')
+    metadata = MetaData()
+    transcript = Table(
+        'transcript', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('video_url', String(255), nullable=False),
+        Column('content', Text, nullable=False),
+        Column('created_at', DateTime),
+        Column('user_id', Integer, nullable=False)
+    )
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(transcript.insert(), rows)
+
+    query = select(transcript).where(transcript.c.user_id == 1).order_by(transcript.c.created_at.desc())
+    with engine.connect() as connection:
+        elapsed, result = timed(lambda: connection.execute(query).all())
+    engine.dispose()
+    return os.path.getsize(path), elapsed, len(result)
+
+def bench_compressed(path, rows):
+    """The current models: CompressedText content, deferred on Transcript."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username='bench', password='bench'))
+        db.session.execute(Transcript.__table__.insert(), [
+            {'video_url': row['video_url'], 'content': row['content'],
+             'created_at': row['created_at'], 'user_id': row['user_id']}
+            for row in rows
+        ])
+        db.session.commit()
+
+        def list_query():
+            db.session.expunge_all()
+            return Transcript.query.filter_by(user_id=1).order_by(Transcript.created_at.desc()).all()
+
+        def list_with_bodies():
+            db.session.expunge_all()
+            return (Transcript.query.options(db.undefer(Transcript.content))
+                    .filter_by(user_id=1).order_by(Transcript.created_at.desc()).all())
+
+        list_elapsed, result = timed(list_query)
+        bodies_elapsed, _ = timed(list_with_bodies)
+        db.session.remove()
+        db.engine.dispose()
+    return os.path.getsize(path), list_elapsed, bodies_elapsed, len(result)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    segment_count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    print(f"Building {count} synthetic transcripts with {segment_count} segments each...")
+    rows = build_rows(count, segment_count)
+    raw_bytes = sum(len(row['content'].encode('utf-8')) for row in rows)
+    print(f"Raw transcript text: {raw_bytes / 1e6:.1f} MB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain_size, plain_elapsed, plain_rows = bench_plain(os.path.join(directory, 'plain.db'), rows)
+        compressed_size, list_elapsed, bodies_elapsed, compressed_rows = bench_compressed(
+            os.path.join(directory, 'compressed.db'), rows
+        )
+
+    print()
+    print(f"{'':<38} {'db size':>10} {'query':>10} {'rows':>7}")
+    print(f"{'before: eager TEXT content':<38} {plain_size / 1e6:>8.1f}MB {plain_elapsed * 1000:>8.1f}ms {plain_rows:>7}")
+    print(f"{'after: dashboard list, content deferred':<38} {compressed_size / 1e6:>8.1f}MB {list_elapsed * 1000:>8.1f}ms {compressed_rows:>7}")
+    print(f"{'after: every body undeferred + inflated':<38} {'':>10} {bodies_elapsed * 1000:>8.1f}ms {compressed_rows:>7}")
+    print()
+    print(f"Storage saved: {(plain_size - compressed_size) / 1e6:.1f} MB ({plain_size / compressed_size:.1f}x smaller)")
+
+if __name__ == "__main__":
+    main()
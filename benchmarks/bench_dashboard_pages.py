@@ -0,0 +1,131 @@
+"""
+Benchmark the transcript library page against library size.
+
+Seeds users with libraries of increasing size over a throwaway SQLite
+database, each transcript carrying a typical half-hour body, then compares
+for each library:
+
+    all rows    the previous dashboard: every transcript of the user loaded
+                as an ORM object and rendered on one page
+    +bodies     the same page with every body inlined in hidden <pre> blocks,
+                as the dashboard shipped before bodies were fetched lazily
+    page 1      GET /dashboard: the first keyset page of metadata
+    last page   GET /dashboard?before=...: the oldest page, reached by cursor
+
+Reports server time per request (median of several) and HTML bytes sent.
+
+Usage:
+    python benchmarks/bench_dashboard_pages.py [library_size,library_size,...] [repeats]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its database URL at import time
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+import logging
+from flask import render_template
+from api.app import app
+import api.routes
+from api.models import db, User, Transcript
+from api.transcripts import build_transcript, list_transcripts
+from api.pagination import decode_cursor
+
+WORDS = ("the a to and of we this that you is it in for so on with what like just know going really think "
+         "about right now data model video people one can thing way time because kind actually").split()
+
+def make_entries(count=450):
+    """About half an hour of captions, one line every four seconds"""
+    rng = random.Random(7)
+    return [{'start': i * 4.0, 'duration': 4.0, 'text': ' '.join(rng.choice(WORDS) for _ in range(12))}
+            for i in range(count)]
+
+def seed(size, template):
+    user = User(username=f'library{size}', password='x')
+    db.session.add(user)
+    db.session.commit()
+    started = datetime(2024, 1, 1)
+    db.session.add_all([Transcript(
+        video_url=f'https://www.youtube.com/watch?v=v{size:05d}{i:05d}',
+        video_id=f'v{size:05d}{i:05d}',
+        content=template.content,
+        content_hash=template.content_hash,
+        segments=template.segments,
+        search_index=template.search_index,
+        created_at=started + timedelta(minutes=i),
+        user_id=user.id
+    ) for i in range(size)])
+    db.session.commit()
+    return user.id
+
+def timed(function, repeats):
+    times, size = [], 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        size = function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000, size
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(',')] if len(sys.argv) > 1 else [100, 500, 2000]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        template = build_transcript(0, 'https://youtu.be/abcdefghijk', make_entries())
+        body_bytes = len(template.content.encode('utf-8'))
+        users = {size: seed(size, template) for size in sizes}
+
+    print(f"Each transcript body is {body_bytes / 1024:.0f} KB; times are server-side medians of {repeats}")
+    print(f"{'library':>8} {'variant':<10} {'ms':>9} {'HTML KB':>10}")
+    for size in sizes:
+        user_id = users[size]
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+        def all_rows():
+            with app.test_request_context():
+                db.session.expire_all()
+                transcripts = Transcript.query.filter_by(user_id=user_id).order_by(Transcript.created_at.desc()).all()
+                return len(render_template('dashboard.html', transcripts=transcripts).encode('utf-8'))
+
+        def with_bodies():
+            # Bodies are read like the original template did, one per transcript
+            with app.test_request_context():
+                db.session.expire_all()
+                transcripts = Transcript.query.filter_by(user_id=user_id).order_by(Transcript.created_at.desc()).all()
+                html = render_template('dashboard.html', transcripts=transcripts).encode('utf-8')
+                return len(html) + sum(len(t.content.encode('utf-8')) for t in transcripts)
+
+        def first_page():
+            return len(client.get('/dashboard').data)
+
+        with app.app_context():
+            cursor = None
+            while True:
+                _, next_cursor = list_transcripts(user_id, decode_cursor(cursor))
+                if next_cursor is None:
+                    break
+                cursor = next_cursor
+
+        def last_page():
+            return len(client.get('/dashboard', query_string={'before': cursor} if cursor else None).data)
+
+        for label, function in (('all rows', all_rows), ('+bodies', with_bodies),
+                                ('page 1', first_page), ('last page', last_page)):
+            ms, size_bytes = timed(function, repeats)
+            print(f"{size:>8} {label:<10} {ms:>9.1f} {size_bytes / 1024:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark the full extraction path offline with the fixture transcript source.
+
+Writes JSON fixtures for a batch of fake videos (some without transcripts),
+points api.sources at a FixtureSource with simulated latency, and runs
+api.bulk.bulk_extract() through the real cache, negative cache, track
+selection and rate limiter. Reports videos/second and time spent waiting on
+the token bucket for several rate limits.
+
+Usage:
+    python benchmarks/bench_fixture_extract.py [videos] [latency_ms]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+from flask import Flask
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.models import db, User
+from api.bulk import bulk_extract
+from api import sources
+
+def make_app(directory):
+    """Create a throwaway app backed by a SQLite file, shared by the fetch threads"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', password='bench'))
+        db.session.commit()
+    return app
+
+def write_fixtures(directory, prefix, count, segments=300):
+    """Write one fixture per video; every tenth video has transcripts disabled"""
+    video_ids = []
+    for i in range(count):
+        video_id = f'{prefix}{i:07d}'
+        if i % 10 == 9:
+            fixture = {'error': 'disabled'}
+        else:
+            fixture = {'tracks': [
+                {'language_code': 'en', 'is_generated': True, 'entries': [
+                    {'text': f'{video_id} generated {n}', 'start': n * 4.0, 'duration': 4.0}
+                    for n in range(segments)
+                ]},
+                {'language_code': 'en-GB', 'is_generated': False, 'entries': [
+                    {'text': f'{video_id} manual {n}', 'start': n * 4.0, 'duration': 4.0}
+                    for n in range(segments)
+                ]}
+            ]}
+        with open(os.path.join(directory, f'{video_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(fixture, f)
+        video_ids.append(video_id)
+    return video_ids
+
+def run(app, video_ids, rate, latency):
+    source = sources.FixtureSource(app.config['FIXTURE_DIR'], latency=latency, rate=rate,
+                                   burst=10, max_concurrency=8)
+    sources.transcript_source = source
+    items = [(f'https://youtu.be/{video_id}', video_id) for video_id in video_ids]
+    with app.app_context():
+        started = time.perf_counter()
+        result = bulk_extract(1, items, concurrency=8)
+        elapsed = time.perf_counter() - started
+    return elapsed, result, source.stats()
+
+def main():
+    video_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"Fixture extraction of {video_count} videos, source latency {latency_ms:.0f} ms per call")
+    print(f"{'rate/s':>8} {'seconds':>9} {'videos/s':>9} {'ok':>5} {'failed':>7} {'calls':>6} {'limiter wait':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        app.config['FIXTURE_DIR'] = directory
+        for run_number, rate in enumerate((0, 100, 20)):
+            # Fresh video IDs per run so the transcript caches start cold
+            video_ids = write_fixtures(directory, f'r{run_number}v', video_count)
+            elapsed, result, stats = run(app, video_ids, rate, latency_ms / 1000)
+            label = 'none' if rate == 0 else str(rate)
+            print(f"{label:>8} {elapsed:>9.2f} {video_count / elapsed:>9.1f} {result['succeeded']:>5} "
+                  f"{result['failed']:>7} {stats['calls']:>6} {stats['rate_limit_wait_seconds']:>12.1f}s")
+        with app.app_context():
+            db.engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark the pooled LLM client against bare requests.post() calls.
+
+Starts a local mock chat completions server over HTTPS (a throwaway
+self-signed certificate is generated with the openssl CLI) and reports the
+latency of sequential and concurrent calls made with a fresh connection
+per call, as utils.py used to, versus api.llm.LLMClient's pooled
+keep-alive session. Then shows Retry-After handling and the circuit
+breaker failing fast while the mock server returns 503.
+
+Usage:
+    python benchmarks/bench_llm_client.py [calls] [server_latency_ms]
+"""
+import os
+import sys
+import ssl
+import json
+import time
+import tempfile
+import threading
+import subprocess
+import statistics
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.llm import LLMClient, CircuitBreaker, LLMError, CircuitOpenError
+
+REPLY = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': 'ok'}}]}).encode('utf-8')
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Chat completions stand-in; the server's mode attribute selects its behavior"""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, Nagle plus delayed ACK adds ~40 ms per keep-alive reply
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        server.requests += 1
+        time.sleep(server.latency)
+
+        if server.mode == 'down':
+            self.send_response(503)
+            body = b'{"error": "unavailable"}'
+        elif server.mode == 'throttle' and server.requests % 2 == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0.2')
+            body = b'{"error": "rate limited"}'
+        else:
+            self.send_response(200)
+            body = REPLY
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(directory, latency):
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.mode = 'ok'
+    server.requests = 0
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'https://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+
+def bare_call(url):
+    """What utils.py did before: a new connection and TLS handshake per call"""
+    response = requests.post(url, json={'model': 'm', 'messages': []}, verify=False,
+                             headers={'Authorization': 'Bearer x'})
+    response.raise_for_status()
+    return response.json()
+
+def measure(call, count, concurrency):
+    latencies = []
+
+    def timed_call(_):
+        started = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_call, range(count)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], count / elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+
+    with tempfile.TemporaryDirectory() as directory:
+        server, url = start_server(directory, latency_ms / 1000)
+
+    client = LLMClient(url=url, key='x', pool_size=16, retry_base=0.05)
+    # trust_env would let REQUESTS_CA_BUNDLE override verify=False for the self-signed certificate
+    client.session.verify = False
+    client.session.trust_env = False
+
+    print(f"{count} calls to a local HTTPS mock with {latency_ms:.0f} ms server time")
+    print(f"{'client':<28} {'threads':>7} {'p50 ms':>8} {'p95 ms':>8} {'calls/s':>8}")
+    for concurrency in (1, 8):
+        for label, call in (('bare requests.post', lambda: bare_call(url)),
+                            ('pooled LLMClient', lambda: client.chat([], 'm'))):
+            p50, p95, rate = measure(call, count, concurrency)
+            print(f"{label:<28} {concurrency:>7} {p50:>8.2f} {p95:>8.2f} {rate:>8.1f}")
+
+    print()
+    server.mode = 'throttle'
+    server.requests = 0
+    started = time.perf_counter()
+    client.chat([], 'm')
+    print(f"429 with Retry-After: 0.2 -> succeeded after {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"and {server.requests} requests")
+
+    server.mode = 'down'
+    server.requests = 0
+    down_client = LLMClient(url=url, key='x', max_attempts=2, retry_base=0.05,
+                            breaker=CircuitBreaker(failure_threshold=3, reset_seconds=60))
+    down_client.session.verify = False
+    down_client.session.trust_env = False
+    outcomes = []
+    for _ in range(10):
+        started = time.perf_counter()
+        try:
+            down_client.chat([], 'm')
+        except CircuitOpenError:
+            outcomes.append(('rejected', time.perf_counter() - started))
+        except LLMError:
+            outcomes.append(('failed', time.perf_counter() - started))
+    failed = [elapsed for outcome, elapsed in outcomes if outcome == 'failed']
+    rejected = [elapsed for outcome, elapsed in outcomes if outcome == 'rejected']
+    print(f"Server down, 10 calls: {len(failed)} failed after retrying "
+          f"(~{statistics.mean(failed) * 1000:.0f} ms each), {len(rejected)} rejected by the open breaker "
+          f"(~{statistics.mean(rejected) * 1000:.2f} ms each), {server.requests} requests reached the server")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
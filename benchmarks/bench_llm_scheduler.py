@@ -0,0 +1,215 @@
+"""
+Benchmark the model call scheduler against a rate-limited mock Mistral.
+
+Starts a local mock chat completions server that answers after a fixed
+delay but returns 429 with Retry-After whenever more than a set number of
+requests are in flight, like a per-key concurrency limit. Against it, one
+user's batch of transcript summaries (background purpose) is started, and
+while it runs several users send chat questions (interactive purpose).
+The same load runs twice through api.llm.LLMClient: without a scheduler,
+and with an api.scheduler.LLMScheduler whose in-flight limit matches the
+mock's capacity.
+
+Reports upstream 429s, chat latency, and failed or refused calls.
+
+Before the load runs, checks that a user's own chunked summary, whose
+parts run as that user, neither keeps their chat call from a slot nor is
+held below SUMMARY_CONCURRENCY parts at once, and exits with an error if
+it does.
+
+Usage:
+    python benchmarks/bench_llm_scheduler.py [capacity] [upstream_ms] [summaries] [chat_users]
+"""
+import os
+import sys
+import json
+import time
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from api.llm import LLMClient, LLMError, OverloadedError
+from api.scheduler import LLMScheduler, INTERACTIVE, BACKGROUND
+from api.summaries import SUMMARY_CONCURRENCY
+from api.telemetry import attributed_to
+
+REPLY = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': 'An answer.'}}]}).encode('utf-8')
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Answers after server.latency seconds, or 429 when over server.capacity requests at once"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.received += 1
+            admitted = server.in_flight < server.capacity
+            if admitted:
+                server.in_flight += 1
+            else:
+                server.rejected += 1
+        if not admitted:
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        try:
+            time.sleep(server.latency)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def check_chat_beside_own_summary(scheduler, parts):
+    """
+    Start a user's summary parts, holding their slots, then make a chat call as the same user.
+
+    Returns:
+        Descriptions of what went wrong, empty if the chat got a slot at once
+        and every part either runs or waits only for the per-user limit
+    """
+    release = threading.Event()
+    failures = []
+
+    def part():
+        try:
+            with scheduler.slot('summary_part'):
+                release.wait()
+        except OverloadedError:
+            failures.append("a summary part was refused")
+
+    threads = [threading.Thread(target=part, daemon=True) for _ in range(parts)]
+    for thread in threads:
+        thread.start()
+    expected = min(parts, scheduler.max_per_user[BACKGROUND], scheduler.max_in_flight)
+    deadline = time.monotonic() + 5
+    while scheduler.stats()['in_flight'] < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    running = scheduler.stats()['in_flight']
+    if running < expected:
+        failures.append(f"only {running} of {expected} summary parts got a slot")
+
+    try:
+        with scheduler.slot('chat') as waited:
+            if waited > 0.1:
+                failures.append(f"the chat call waited {waited:.2f}s beside its user's summary")
+    except OverloadedError:
+        failures.append(f"the chat call was refused with {scheduler.max_in_flight - running} "
+                        f"of {scheduler.max_in_flight} slots free")
+    release.set()
+    for thread in threads:
+        thread.join()
+    return failures
+
+def check_scheduler():
+    failures = []
+    short_waits = {INTERACTIVE: 1, BACKGROUND: 5}
+    for label, scheduler in (
+        ('max_per_user=2', LLMScheduler(max_in_flight=8, max_per_user=2, max_wait=short_waits,
+                                        user_resolver=lambda: 1)),
+        ('default limits', LLMScheduler(max_in_flight=8, max_wait=short_waits, user_resolver=lambda: 1))
+    ):
+        failures += [f"{label}: {failure}" for failure in check_chat_beside_own_summary(scheduler, 4)]
+    defaults = LLMScheduler()
+    if defaults.max_per_user[BACKGROUND] < SUMMARY_CONCURRENCY:
+        failures.append(f"one user may run {defaults.max_per_user[BACKGROUND]} background calls, "
+                        f"fewer than the {SUMMARY_CONCURRENCY} parts a summary runs at once")
+    return failures
+
+def run(label, url, server, scheduler, summaries, chat_users, upstream_ms):
+    client = LLMClient(url=url, pool_size=summaries + chat_users, max_attempts=3, retry_base=0.5,
+                       deadline=60, scheduler=scheduler)
+    client.session.trust_env = False
+    server.received = server.rejected = 0
+    outcomes = {f'{kind}_{result}': 0 for kind in ('chat', 'summary') for result in ('ok', 'failed', 'refused')}
+    chat_latencies = []
+    lock = threading.Lock()
+
+    def call(user_id, purpose):
+        started = time.perf_counter()
+        kind = 'chat' if purpose == 'chat' else 'summary'
+        try:
+            with attributed_to(user_id):
+                client.chat([{'role': 'user', 'content': 'Question?'}], 'mock-model', purpose=purpose)
+            result = 'ok'
+        except OverloadedError:
+            result = 'refused'
+        except LLMError:
+            result = 'failed'
+        with lock:
+            outcomes[f'{kind}_{result}'] += 1
+            if kind == 'chat' and result == 'ok':
+                chat_latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=summaries + chat_users) as pool:
+        # One user's batch of summary parts lands first, then the chat questions arrive
+        futures = [pool.submit(call, 1, 'summary_part') for _ in range(summaries)]
+        time.sleep(upstream_ms / 1000 / 2)
+        futures += [pool.submit(call, 100 + user, 'chat') for user in range(chat_users)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    chat_latencies.sort()
+    p95 = chat_latencies[max(0, int(len(chat_latencies) * 0.95) - 1)] if chat_latencies else 0
+    print(f"{label:<10} {elapsed:>7.2f} {server.received:>9} {server.rejected:>5} "
+          f"{statistics.median(chat_latencies) if chat_latencies else 0:>9.2f} {p95:>9.2f} "
+          f"{outcomes['chat_ok']:>7}/{chat_users:<3} {outcomes['chat_failed'] + outcomes['chat_refused']:>6} "
+          f"{outcomes['summary_ok']:>7}/{summaries:<3}")
+    if scheduler is not None:
+        stats = scheduler.stats()
+        print(f"{'':<10} scheduler: max queue depth {stats['max_queue_depth']}, "
+              f"avg wait {stats['avg_wait_ms']}, shed {stats['shed']}")
+
+def main():
+    capacity = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    upstream_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 500
+    summaries = int(sys.argv[3]) if len(sys.argv) > 3 else 24
+    chat_users = int(sys.argv[4]) if len(sys.argv) > 4 else 6
+    logging.getLogger().setLevel(logging.ERROR)
+
+    failures = check_scheduler()
+    if failures:
+        sys.exit('\n'.join(failures))
+    print("A user's chat gets a slot while their own summary parts run")
+
+    server = MockServer(('127.0.0.1', 0), MockHandler)
+    server.lock = threading.Lock()
+    server.capacity = capacity
+    server.latency = upstream_ms / 1000
+    server.in_flight = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+
+    print(f"Mock model: {capacity} requests at once, {upstream_ms:.0f} ms each; "
+          f"{summaries} summary parts from one user, then {chat_users} chat users")
+    print(f"{'run':<10} {'wall s':>7} {'requests':>9} {'429s':>5} {'chat p50':>9} {'chat p95':>9} "
+          f"{'chat ok':>11} {'failed':>6} {'summary ok':>11}")
+    run('none', url, server, None, summaries, chat_users, upstream_ms)
+    # One user may take half the capacity, leaving room for everyone else
+    scheduler = LLMScheduler(max_in_flight=capacity, max_per_user=max(1, capacity // 2))
+    run('scheduler', url, server, scheduler, summaries, chat_users, upstream_ms)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Check that the hot pages' queries are answered from indexes, and time them.
+
+Seeds a throwaway database with a large synthetic dataset (many users,
+each with transcripts, a chat per transcript and a conversation in each
+chat), then requests as one user:
+
+    dashboard       GET /dashboard
+    chats           GET /chats
+    chat            GET /chat/<id>
+    send_message    POST /api/send_message, answered by a local mock model
+
+Every SELECT each request sends is run again under EXPLAIN (EXPLAIN QUERY
+PLAN on SQLite). A full scan of the transcript, chat, message or user
+table, SQLite's "SCAN <table>" or PostgreSQL's "Seq Scan on <table>", is
+a failure: the script prints the statement and its plan and exits with an
+error. It also reports each page's median time and statement count, to
+compare across releases.
+
+Set QUERY_PLAN_DATABASE_URL to run against an empty scratch PostgreSQL
+database instead of SQLite. --without-indexes drops the chat and message
+indexes first, to show what the check catches.
+
+Usage:
+    python benchmarks/bench_query_plans.py [users] [transcripts_per_user] [messages_per_chat] [repeats] [--without-indexes]
+"""
+import os
+import re
+import sys
+import json
+import time
+import tempfile
+import threading
+import statistics
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its database URL at import time
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = os.environ.get('QUERY_PLAN_DATABASE_URL',
+                                            f"sqlite:///{os.path.join(directory, 'bench.db')}")
+
+import logging
+from sqlalchemy import event, insert, text
+from api.app import app
+import api.routes
+from api.models import db, User, Transcript, Chat, Message
+from api.llm import llm_client
+
+HOT_TABLES = ('transcript', 'chat', 'message', 'user')
+DROPPABLE_INDEXES = ('ix_chat_user_created', 'ix_chat_transcript', 'ix_message_chat_timestamp')
+BATCH = 5000
+
+_sqlite_scan = re.compile(r'^SCAN "?(%s)"?\b' % '|'.join(HOT_TABLES))
+_postgres_scan = re.compile(r'Seq Scan on "?(%s)"?\b' % '|'.join(HOT_TABLES))
+
+REPLY = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': 'An answer.'}}]}).encode('utf-8')
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion at once"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, format, *args):
+        pass
+
+class StatementLog:
+    """Records the SELECT statements sent to the database while recording is on"""
+
+    def __init__(self, engine):
+        self.recording = False
+        self.statements = []
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._executed)
+
+    def _executed(self, connection, cursor, statement, parameters, context, executemany):
+        if not self.recording:
+            return
+        self.count += 1
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')) and not executemany:
+            self.statements.append((statement, parameters))
+
+    def start(self):
+        self.recording = True
+        self.statements = []
+        self.count = 0
+
+    def stop(self):
+        self.recording = False
+
+def seed(users, transcripts_per_user, messages_per_chat):
+    started = datetime(2024, 1, 1)
+    db.session.execute(insert(User), [{'username': f'user{i}', 'password': 'x'} for i in range(users)])
+    db.session.commit()
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+
+    rows = []
+    for n in range(transcripts_per_user):
+        for user_id in user_ids:
+            rows.append({'video_url': f'https://youtu.be/v{user_id:05d}{n:05d}', 'video_id': f'v{user_id:05d}{n:05d}',
+                         'content': '[00:00] A short transcript about indexes.', 'user_id': user_id,
+                         'created_at': started + timedelta(minutes=len(rows))})
+    for position in range(0, len(rows), BATCH):
+        db.session.execute(insert(Transcript), rows[position:position + BATCH])
+    db.session.commit()
+
+    transcripts = db.session.query(Transcript.id, Transcript.user_id, Transcript.created_at).order_by(Transcript.id).all()
+    for position in range(0, len(transcripts), BATCH):
+        db.session.execute(insert(Chat), [{'title': f'Chat about transcript {t.id}', 'user_id': t.user_id,
+                                           'transcript_id': t.id, 'created_at': t.created_at}
+                                          for t in transcripts[position:position + BATCH]])
+    db.session.commit()
+
+    chats = db.session.query(Chat.id, Chat.created_at).order_by(Chat.id).all()
+    batch = []
+    for chat in chats:
+        for j in range(messages_per_chat):
+            batch.append({'content': f'Message {j} of the conversation, long enough to look like one.',
+                          'role': 'user' if j % 2 == 0 else 'assistant', 'chat_id': chat.id,
+                          'timestamp': chat.created_at + timedelta(seconds=j)})
+        if len(batch) >= BATCH:
+            db.session.execute(insert(Message), batch)
+            batch = []
+            print(f"\rSeeded messages of {chat.id} of {len(chats)} chats", end='', flush=True)
+    if batch:
+        db.session.execute(insert(Message), batch)
+    db.session.commit()
+    print()
+    return user_ids[0]
+
+def full_scans(statement, parameters):
+    """Return the plan lines of a statement that scan a hot table in full, and the whole plan."""
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        plan = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+        return [line for line in plan if _sqlite_scan.match(line)], plan
+    plan = [row[0] for row in connection.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+    return [line for line in plan if _postgres_scan.search(line)], plan
+
+def main():
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--')]
+    without_indexes = '--without-indexes' in sys.argv
+    users = int(arguments[0]) if len(arguments) > 0 else 200
+    transcripts_per_user = int(arguments[1]) if len(arguments) > 1 else 50
+    messages_per_chat = int(arguments[2]) if len(arguments) > 2 else 20
+    repeats = int(arguments[3]) if len(arguments) > 3 else 5
+    logging.getLogger().setLevel(logging.WARNING)
+
+    mock = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+    mock.daemon_threads = True
+    threading.Thread(target=mock.serve_forever, daemon=True).start()
+    llm_client.url = f'http://127.0.0.1:{mock.server_address[1]}/v1/chat/completions'
+    llm_client.session.trust_env = False
+
+    with app.app_context():
+        user_id = seed(users, transcripts_per_user, messages_per_chat)
+        if without_indexes:
+            for index in DROPPABLE_INDEXES:
+                db.session.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            db.session.commit()
+        # Fresh statistics, as a long-running database would have
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        chat_id = db.session.query(Chat.id).filter(Chat.user_id == user_id).order_by(Chat.id.desc()).first()[0]
+        dialect = db.engine.dialect.name
+        log = StatementLog(db.engine)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    pages = [
+        ('dashboard', lambda: client.get('/dashboard')),
+        ('chats', lambda: client.get('/chats')),
+        ('chat', lambda: client.get(f'/chat/{chat_id}')),
+        ('send_message', lambda: client.post('/api/send_message',
+                                             json={'chat_id': chat_id, 'message': 'What about the indexes?'}))
+    ]
+
+    print(f"{users} users x {transcripts_per_user} transcripts, a chat of {messages_per_chat} messages each; "
+          f"{dialect}{', chat and message indexes dropped' if without_indexes else ''}")
+    print(f"{'page':<13} {'ms':>8} {'statements':>10} {'full scans':>10}")
+    failures = []
+    for label, request in pages:
+        times = []
+        for _ in range(repeats):
+            log.start()
+            started = time.perf_counter()
+            response = request()
+            times.append(time.perf_counter() - started)
+            log.stop()
+            assert response.status_code == 200, (label, response.status_code)
+
+        scans = 0
+        with app.app_context():
+            for statement, parameters in log.statements:
+                lines, plan = full_scans(statement, parameters)
+                if lines:
+                    scans += 1
+                    failures.append((label, statement, plan))
+        print(f"{label:<13} {statistics.median(times) * 1000:>8.1f} {log.count:>10} {scans:>10}")
+
+    mock.shutdown()
+    if failures:
+        for label, statement, plan in failures:
+            print(f"\n{label}: full table scan in\n{statement.strip()}\nplan:")
+            print('\n'.join(f"    {line}" for line in plan))
+        sys.exit(f"\n{len(failures)} statement(s) scan a whole table")
+    print("Every statement is answered from an index")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark retrieval-based chat context against sending the full transcript.
+
+Builds synthetic long transcripts with a handful of planted facts, then for
+each planted question compares the prompt sent by /api/send_message in
+'full' mode with the one built by api.retrieval.chat_context(): prompt
+tokens, whether the passage holding the answer was included, index build
+and search time, and reply latency against a local mock chat completions
+server whose response time grows with the prompt size (prefill).
+
+Usage:
+    python benchmarks/bench_retrieval_context.py [prefill_ms_per_1k_tokens] [generation_ms]
+"""
+import os
+import sys
+import json
+import time
+import random
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.llm import llm_client, estimate_tokens
+from api.segments import Segments
+from api.retrieval import RetrievalIndex
+from api import retrieval
+from api.utils import build_chat_messages, get_chat_response
+
+VOCABULARY = ("the a to and of we this that you is it in for so on with what like just "
+              "know going really think about right now data model video people one can "
+              "thing way time because kind actually pretty much look here next part").split()
+
+# (planted sentence, question, word that must appear in the retrieved context)
+FACTS = [
+    ("the launch window for the probe opens on the fourteenth of march", "When does the probe launch window open?", "fourteenth"),
+    ("our sourdough starter needs rye flour and exactly seventy percent hydration", "What hydration does the sourdough starter need?", "seventy"),
+    ("the quarterly revenue grew by eighteen percent thanks to the subscription tier", "How much did quarterly revenue grow?", "eighteen"),
+    ("the violinist tunes the instrument a quarter tone flat for baroque repertoire", "How does the violinist tune for baroque repertoire?", "quarter"),
+    ("the bridge cables are inspected with magnetic flux sensors every six months", "How often are the bridge cables inspected?", "six"),
+    ("the recipe calls for smoked paprika cumin and two cloves of garlic", "Which spices does the recipe call for?", "paprika"),
+]
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Sleeps in proportion to the prompt size, then returns a short reply"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        prompt_tokens = sum(len(message['content']) for message in payload['messages']) / 4
+        time.sleep(prompt_tokens / 1000 * self.server.prefill + self.server.generation)
+
+        body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': 'answer'}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FixtureTranscript:
+    """Stand-in for a Transcript row as built by build_transcript(); chat_context() only reads these"""
+    def __init__(self, segments, index):
+        self.segments = segments.pack()
+        self.content = segments.render()
+        self.search_index = index.pack()
+
+def synthetic_segments(minutes, rng):
+    entries = []
+    start = 0.0
+    while start < minutes * 60:
+        duration = rng.uniform(2.0, 5.0)
+        entries.append({'start': start, 'duration': duration,
+                        'text': ' '.join(rng.choices(VOCABULARY, k=rng.randint(8, 14)))})
+        start += duration
+    # Plant each fact at a random point of the video
+    for fact, _, _ in FACTS:
+        entries[rng.randrange(len(entries))]['text'] = fact
+    return Segments.from_entries(entries)
+
+def main():
+    prefill_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    generation_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+    server.daemon_threads = True
+    server.prefill = prefill_ms / 1000
+    server.generation = generation_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm_client.url = f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+    llm_client.session.trust_env = False
+
+    rng = random.Random(11)
+    print(f"Mock model: {prefill_ms:.0f} ms per 1k prompt tokens + {generation_ms:.0f} ms generation; "
+          f"top {retrieval.RETRIEVAL_TOP_K} chunks of ~{retrieval.RETRIEVAL_CHUNK_TOKENS} tokens, "
+          f"{len(FACTS)} questions per video")
+    print(f"{'video':>6} {'full tok':>9} {'ctx tok':>8} {'recall':>7} {'build ms':>9} {'search ms':>10} "
+          f"{'full s':>7} {'ctx s':>6}")
+    for minutes in (10, 30, 60, 120):
+        segments = synthetic_segments(minutes, rng)
+
+        started = time.perf_counter()
+        index = RetrievalIndex.build(segments)
+        build_ms = (time.perf_counter() - started) * 1000
+        transcript = FixtureTranscript(segments, index)
+
+        started = time.perf_counter()
+        for _, question, _ in FACTS:
+            RetrievalIndex.unpack(transcript.search_index).search(question)
+        search_ms = (time.perf_counter() - started) * 1000 / len(FACTS)
+
+        full_tokens, context_tokens, found, full_times, context_times = [], [], 0, [], []
+        for _, question, answer in FACTS:
+            messages = [{'role': 'user', 'content': question}]
+            context, excerpted = retrieval.chat_context(transcript, messages)
+            if answer in context:
+                found += 1
+            full_tokens.append(sum(estimate_tokens(m['content']) for m in build_chat_messages(messages, transcript.content)))
+            context_tokens.append(sum(estimate_tokens(m['content']) for m in build_chat_messages(messages, context, excerpted)))
+
+            started = time.perf_counter()
+            get_chat_response(messages, transcript.content)
+            full_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            get_chat_response(messages, context, excerpted=excerpted)
+            context_times.append(time.perf_counter() - started)
+
+        print(f"{minutes:>5}m {statistics.mean(full_tokens):>9.0f} {statistics.mean(context_tokens):>8.0f} "
+              f"{found:>4}/{len(FACTS)} {build_ms:>9.1f} {search_ms:>10.2f} "
+              f"{statistics.mean(full_times):>7.2f} {statistics.mean(context_times):>6.2f}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark full-text transcript search on a synthetic corpus.
+
+Builds a throwaway SQLite database of synthetic transcripts (100,000 by
+default) whose words follow a Zipf distribution over a made-up
+vocabulary, spread over many users plus one power user with a large
+library. A few planted phrases give exact-match queries. Then reports:
+
+    insert      time per transcript saved through the ORM, with and
+                without the full-text index kept in sync
+    search      api.search.search_transcripts() for rare, medium and
+                common words, two words and a phrase, for the power user
+                and for a typical user, snippets included
+    scan        the same queries answered by decompressing and scanning
+                every transcript of the user, which is what searching the
+                library in the browser amounted to
+
+Usage:
+    python benchmarks/bench_transcript_search.py [transcripts] [lines_per_transcript] [power_user_transcripts]
+"""
+import os
+import re
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its database URL at import time
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+import logging
+from sqlalchemy import event
+from api.app import app
+from api.models import db, User, Transcript
+from api.segments import Segments
+from api import search
+
+VOCABULARY_SIZE = 20000
+USERS = 1000
+PHRASE = "quantum bakery"
+BATCH = 1000
+
+def make_vocabulary(rng):
+    syllables = ["ka", "lo", "mi", "ter", "van", "so", "ru", "pel", "dax", "en", "tor", "li", "bo", "zen",
+                 "fa", "qui", "mar", "des", "un", "go"]
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda word: rng.random())
+
+def make_content(rng, vocabulary, weights, lines, planted=False):
+    words = rng.choices(vocabulary, cum_weights=weights, k=lines * 10)
+    entries = [{'start': i * 4.0, 'duration': 4.0, 'text': ' '.join(words[i * 10:(i + 1) * 10])}
+               for i in range(lines)]
+    if planted:
+        entries[rng.randrange(lines)]['text'] += f" {PHRASE}"
+    segments = Segments.from_entries(entries)
+    return segments.render(), segments.pack()
+
+def timed(function, repeats):
+    times = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), result
+
+def scan(user_id, query):
+    """Answer a query by reading every transcript body of the user"""
+    if query.startswith('"'):
+        patterns = [re.compile(r'\b' + r'\s+'.join(map(re.escape, query.strip('"').split())) + r'\b')]
+    else:
+        patterns = [re.compile(r'\b' + re.escape(word) + r'\b') for word in query.lower().split()]
+    hits = 0
+    for (content,) in Transcript.query.with_entities(Transcript.content).filter(Transcript.user_id == user_id):
+        text = content.lower()
+        if all(pattern.search(text) for pattern in patterns):
+            hits += 1
+    return hits
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    power_size = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(11)
+    vocabulary = make_vocabulary(rng)
+    weights = []
+    running = 0.0
+    for rank in range(1, VOCABULARY_SIZE + 1):
+        running += 1.0 / rank
+        weights.append(running)
+
+    with app.app_context():
+        db.session.add_all([User(username=f'user{i}', password='x') for i in range(USERS + 1)])
+        db.session.commit()
+        power_user = 1
+        owners = [power_user] * power_size + [2 + i % USERS for i in range(total - power_size)]
+        rng.shuffle(owners)
+        started_at = datetime(2024, 1, 1)
+
+        insert_ms = {}
+        created = 0
+        for label, indexed, count in (('unindexed', False, min(BATCH * 5, total // 4)), ('indexed', True, None)):
+            if not indexed:
+                event.remove(Transcript, 'after_insert', search._index_new_transcript)
+            else:
+                search.install_search_index()
+            end = total if count is None else created + count
+            elapsed = 0.0
+            for batch_start in range(created, end, BATCH):
+                batch = []
+                for i in range(batch_start, min(batch_start + BATCH, end)):
+                    content, packed = make_content(rng, vocabulary, weights, lines,
+                                                   planted=owners[i] == power_user and rng.random() < 0.03)
+                    batch.append(Transcript(video_url=f'https://youtu.be/v{i:010d}', video_id=f'v{i:010d}',
+                                            content=content, segments=packed, user_id=owners[i],
+                                            created_at=started_at + timedelta(seconds=i)))
+                started = time.perf_counter()
+                db.session.add_all(batch)
+                db.session.commit()
+                elapsed += time.perf_counter() - started
+                print(f"\rSaved {min(batch_start + BATCH, end)} of {total} transcripts", end='', flush=True)
+            insert_ms[label] = elapsed * 1000 / (end - created)
+            created = end
+        print()
+
+        # Rows saved without the hook are indexed the way the backfill command does it
+        started = time.perf_counter()
+        connection = db.session.connection()
+        after = 0
+        while True:
+            ids = search.unindexed_transcript_ids(after, BATCH)
+            if not ids:
+                break
+            for transcript_id, user_id, content in (Transcript.query
+                                                    .with_entities(Transcript.id, Transcript.user_id, Transcript.content)
+                                                    .filter(Transcript.id.in_(ids))):
+                search.index_transcript(connection, transcript_id, user_id, content)
+            after = ids[-1]
+        db.session.commit()
+        backfill_s = time.perf_counter() - started
+
+        typical_user = owners[-1]
+        queries = [
+            ('rare word', vocabulary[12000]),
+            ('medium word', vocabulary[800]),
+            ('common word', vocabulary[5]),
+            ('two words', f"{vocabulary[300]} {vocabulary[900]}"),
+            ('phrase', f'"{PHRASE}"')
+        ]
+
+        print(f"{total} transcripts of {lines} lines, power user has {power_size}, typical user "
+              f"{owners.count(typical_user)}; database {os.path.getsize(os.path.join(directory, 'bench.db')) / 2**20:.0f} MB")
+        print(f"insert: {insert_ms['unindexed']:.2f} ms/transcript without index sync, "
+              f"{insert_ms['indexed']:.2f} ms with; backfill of the first {min(BATCH * 5, total // 4)} took {backfill_s:.1f} s")
+        print(f"{'query':<12} {'user':<8} {'hits p1':>7} {'search ms':>10} {'scan ms':>9} {'scan hits':>9}")
+        for label, query in queries:
+            for user_label, user_id in (('power', power_user), ('typical', typical_user)):
+                search_ms, (hits, _) = timed(lambda: search.search_transcripts(user_id, query), 9)
+                scan_ms, scan_hits = timed(lambda: scan(user_id, query), 3)
+                print(f"{label:<12} {user_label:<8} {len(hits):>7} {search_ms:>10.1f} {scan_ms:>9.1f} {scan_hits:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark loading and searching one long transcript through the segments endpoint.
+
+Saves a synthetic ten-hour transcript (a caption line every three seconds)
+to a throwaway SQLite database, then compares, server time and bytes sent:
+
+    full body       GET /api/transcripts/<id>, the whole transcript, as the
+                    result and chat pages embedded it (result.html three times)
+    first page      GET /api/transcripts/<id>/segments, the lines shown first
+    next page       the same with ?from_index=, as the page scrolls
+    jump            ?from=05:30:00&to=05:35:00, a window in the middle
+    rare word       ?q= a word planted in a few lines
+    common word     ?q= a word in most chunks, first page of matches
+    prefix          ?q= the first letters of a rare word, as typed
+    stopword        ?q= a stopword, answered by scanning instead of the index
+
+Usage:
+    python benchmarks/bench_transcript_segments.py [hours] [repeats]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+
+# Add the project root to the path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its database URL at import time
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+import logging
+from api.app import app
+import api.routes
+from api.models import db, User
+from api.transcripts import build_transcript
+
+WORDS = ("the a to and of we this that you is it in for so on with what like just know going really think "
+         "about right now data model video people one can thing way time because kind actually").split()
+
+def make_entries(hours):
+    rng = random.Random(5)
+    entries = [{'start': i * 3.0, 'duration': 3.5, 'text': ' '.join(rng.choice(WORDS) for _ in range(10))}
+               for i in range(int(hours * 1200))]
+    for entry in rng.sample(entries, 5):
+        entry['text'] += ' photosynthesis'
+    return entries
+
+def timed(function, repeats):
+    times, size = [], 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        size = function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000, size
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 9
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        user = User(username='viewer', password='x')
+        db.session.add(user)
+        db.session.commit()
+        transcript = build_transcript(user.id, 'https://youtu.be/abcdefghijk', make_entries(hours))
+        db.session.add(transcript)
+        db.session.commit()
+        transcript_id, user_id = transcript.id, user.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    segments_url = f'/api/transcripts/{transcript_id}/segments'
+    first = client.get(segments_url).get_json()
+    requests = [
+        ('full body', f'/api/transcripts/{transcript_id}', None),
+        ('first page', segments_url, None),
+        ('next page', segments_url, {'from_index': first['next_index']}),
+        ('jump', segments_url, {'from': '05:30:00', 'to': '05:35:00'}),
+        ('rare word', segments_url, {'q': 'photosynthesis'}),
+        ('common word', segments_url, {'q': 'model'}),
+        ('prefix', segments_url, {'q': 'photos'}),
+        ('stopword', segments_url, {'q': 'the'})
+    ]
+
+    print(f"{hours:g} hour transcript, {first['total_segments']} lines; server-side medians of {repeats}")
+    print(f"{'request':<12} {'ms':>8} {'KB':>9} {'lines':>6}")
+    for label, url, params in requests:
+        def request():
+            response = client.get(url, query_string=params)
+            assert response.status_code == 200, response.status_code
+            return len(response.data)
+        ms, size = timed(request, repeats)
+        data = client.get(url, query_string=params).get_json()
+        lines = len(data['segments']) if 'segments' in data else data['content'].count('\n') + 1
+        print(f"{label:<12} {ms:>8.1f} {size / 1024:>9.1f} {lines:>6}")
+
+if __name__ == "__main__":
+    main()